@@ -6,7 +6,7 @@ TIMING = False
 
 if __name__ == "__main__":
     if TIMING:
-        # dependendo do grafo
-        time(input_file='test.txt')
+        # em um mapa sintético
+        time()
     else:
         main()
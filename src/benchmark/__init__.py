@@ -0,0 +1,6 @@
+"""
+``benchmark``
+=============
+
+Benchmarks das estruturas e algoritmos do projeto
+"""
@@ -0,0 +1,168 @@
+"""
+``benchmark.generator``
+=======================
+
+Entradas sintéticas reproduzíveis, no formato de :func:`main.main`,
+para os benchmarks
+
+Os mapas são planares: uma grade de ruas nos dois sentidos
+(:func:`grid`) ou uma malha mais parecida com uma cidade
+(:func:`road`), com quarteirões irregulares, ruas de mão única,
+ruas sem saída e avenidas mais rápidas. A mesma semente gera
+sempre a mesma entrada.
+
+Uso: ``python -m benchmark.generator ARESTAS [grid | road] [SEMENTE] > ARQUIVO``
+"""
+
+from __future__ import annotations
+
+import sys
+import numpy as np
+from typing import IO, Any, Callable, Dict, Tuple
+
+__all__ = ["grid", "road", "KINDS", "generate", "write"]
+
+
+# nós e, para cada trecho, a origem, o alvo, a distância
+# e a velocidade máxima (zero para a padrão)
+Streets = Tuple[int, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+#: velocidade máxima padrão das entradas, em km/h
+DEFAULT_SPEED = 40.0
+#: distância entre as esquinas da grade, em km
+BLOCK = 0.1
+
+
+def _neighbors(side: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """pares de esquinas vizinhas da grade ``side x side``, cada um
+    uma vez, e se o par é horizontal"""
+    nodes = np.arange(side * side).reshape(side, side)
+    horizontal = np.stack((nodes[:, :-1].ravel(), nodes[:, 1:].ravel()), axis=1)
+    vertical = np.stack((nodes[:-1, :].ravel(), nodes[1:, :].ravel()), axis=1)
+    pairs = np.concatenate((horizontal, vertical))
+    is_horizontal = np.arange(len(pairs)) < len(horizontal)
+    return pairs[:, 0], pairs[:, 1], is_horizontal
+
+
+def grid(side: int, rng: np.random.Generator) -> Streets:
+    """Grade ``side x side`` com ruas nos dois sentidos entre esquinas
+    vizinhas, todas com a velocidade padrão
+
+    As distâncias variam 20% em torno de :data:`BLOCK`.
+    """
+    first, second, _ = _neighbors(side)
+    distance = BLOCK * rng.uniform(0.8, 1.2, len(first))
+
+    sources = np.concatenate((first, second))
+    targets = np.concatenate((second, first))
+    distance = np.concatenate((distance, distance))
+    return side * side, sources, targets, distance, np.zeros(len(sources))
+
+
+def road(side: int, rng: np.random.Generator, *, missing: float = 0.15,
+         oneway: float = 0.3, avenues: int = 8) -> Streets:
+    """Malha urbana sobre uma grade ``side x side`` de esquinas
+    deslocadas, o que mantém o mapa planar
+
+    :param missing: fração das ligações entre esquinas que não existem
+            (quarteirões maiores e ruas sem saída)
+    :param oneway: fração das ruas que são de mão única
+    :param avenues: uma a cada ``avenues`` linhas e colunas é uma
+            avenida, sempre de mão dupla e com velocidade maior
+    """
+    # esquinas deslocadas da grade, sem cruzar as vizinhas
+    points = np.indices((side, side)).reshape(2, -1).T.astype(np.float64)
+    points += rng.uniform(-0.3, 0.3, points.shape)
+
+    first, second, horizontal = _neighbors(side)
+    line = np.where(horizontal, first // side, first % side)
+    # as bordas também, para ligar as esquinas opostas
+    avenue = (line % avenues == 0) | (line == side - 1)
+
+    # avenidas sempre existem, para manter a malha conectada
+    kept = avenue | (rng.random(len(first)) >= missing)
+    first, second, avenue = first[kept], second[kept], avenue[kept]
+
+    distance = BLOCK * np.hypot(*(points[first] - points[second]).T)
+    speed = np.where(avenue, 60.0, np.where(rng.random(len(first)) < 0.5, 30.0, 0.0))
+
+    # mão única, em um dos sentidos
+    single = ~avenue & (rng.random(len(first)) < oneway)
+    forward = ~single | (rng.random(len(first)) < 0.5)
+    backward = ~single | ~forward
+
+    sources = np.concatenate((first[forward], second[backward]))
+    targets = np.concatenate((second[forward], first[backward]))
+    distance = np.concatenate((distance[forward], distance[backward]))
+    speed = np.concatenate((speed[forward], speed[backward]))
+    return side * side, sources, targets, distance, speed
+
+
+#: tipos de mapa de :func:`generate`, com as arestas por
+#: esquina, para escolher o tamanho da grade
+KINDS: Dict[str, Tuple[Callable[..., Streets], float]] = {
+    'grid': (grid, 4.0),
+    'road': (road, 2.8),
+}
+
+
+def generate(edges: int, kind: str = 'grid', *, density: float = 0.1,
+             closed: float = 0.01, speeds: int = 5, seed: int = 0) -> bytes:
+    """Entrada completa com aproximadamente ``edges`` trechos
+
+    A origem e o destino são esquinas opostas da grade.
+
+    :param kind: tipo de mapa, entre :data:`KINDS`
+    :param density: fração dos trechos com velocidades registradas
+    :param closed: fração dos trechos fechados, com só uma velocidade
+            registrada, nula
+    :param speeds: máximo de velocidades registradas por trecho
+    :param seed: semente do gerador aleatório
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown map kind: {kind}")
+    if density < 0 or closed < 0 or density + closed > 1:
+        raise ValueError("density and closed must be fractions of the edges")
+
+    build, per_node = KINDS[kind]
+    side = max(2, int(round(np.sqrt(edges / per_node))))
+    rng = np.random.default_rng(seed)
+    nodes, sources, targets, distance, max_speed = build(side, rng)
+    names = [f'n{node}' for node in range(nodes)]
+
+    lines = [f'{DEFAULT_SPEED}']
+    lines.extend(
+        f'{names[s]} {names[t]} {d:.3f} {v:.0f}' if v else f'{names[s]} {names[t]} {d:.3f}'
+        for s, t, d, v in zip(sources.tolist(), targets.tolist(),
+                              distance.tolist(), max_speed.tolist())
+    )
+    lines.append('')
+
+    # velocidades registradas, abaixo da máxima de cada trecho
+    count = len(sources)
+    draw = rng.random(count)
+    observed, shut = draw < density + closed, draw < closed
+    limit = np.where(max_speed > 0, max_speed, DEFAULT_SPEED)
+    for edge in np.flatnonzero(observed).tolist():
+        if shut[edge]:
+            values = '0'
+        else:
+            drawn = limit[edge] * rng.uniform(0.2, 1.0, rng.integers(1, speeds + 1))
+            values = ' '.join(f'{value:.1f}' for value in drawn.tolist())
+        lines.append(f'{names[sources[edge]]} {names[targets[edge]]} {values}')
+
+    # a origem termina a seção das velocidades
+    lines.extend((names[0], names[-1], ''))
+    return '\n'.join(lines).encode()
+
+
+def write(file: IO[bytes], edges: int, kind: str = 'grid', **options: Any) -> None:
+    """Grava a entrada de :func:`generate` no arquivo"""
+    file.write(generate(edges, kind, **options))
+
+
+if __name__ == "__main__":
+    edges = int(sys.argv[1])
+    kind = sys.argv[2] if len(sys.argv) > 2 else 'grid'
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    sys.stdout.buffer.write(generate(edges, kind, seed=seed))
@@ -0,0 +1,174 @@
+"""
+``benchmark.heap``
+==================
+
+Microbenchmark das filas de prioridade de :mod:`heap`, repetindo
+a sequência de operações (`push`, `pop` e `decrease-key`) de um
+Dijkstra em grafos grade
+
+Uso: ``python -m benchmark.heap [LADO ...]``
+"""
+
+from __future__ import annotations
+
+from graph import CompiledGraph, csr_dijkstra
+from heap import IndexedHeap, PairingHeap
+from protocols import KeyHeap
+
+import sys
+from array import array
+from random import Random
+from heapq import heappop, heappush
+from timeit import default_timer
+from typing import Callable, Dict, List, Optional, Tuple, Iterator
+
+__all__ = ["grid", "trace", "replay", "replay_heapq", "main"]
+
+
+# operações registradas
+PUSH, POP, DECREASE = range(3)
+Op = Tuple[int, int, float]
+
+
+def grid(side: int, *, seed: int = 0) -> Tuple[CompiledGraph[int], List[float]]:
+    """Grafo grade ``side x side`` com arestas nos dois sentidos
+    entre vizinhos e pesos aleatórios
+
+    :return: o grafo compilado e o peso de cada aresta
+    """
+    rng = Random(seed)
+
+    offsets = array('l', [0])
+    targets = array('l')
+    for node in range(side * side):
+        row, col = divmod(node, side)
+        for dr, dc in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+            r, c = row + dr, col + dc
+            if 0 <= r < side and 0 <= c < side:
+                targets.append(r * side + c)
+        offsets.append(len(targets))
+
+    weights = [rng.uniform(0.1, 1.0) for _ in targets]
+    return CompiledGraph(range(side * side), offsets, targets), weights
+
+
+class _Recorder:
+    """fila que registra as operações feitas nela"""
+    __slots__ = ['_heap', 'ops']
+
+    def __init__(self) -> None:
+        self._heap = IndexedHeap[int, float]()
+        self.ops: List[Op] = []
+
+    def push(self, item: int, priority: float) -> None:
+        self.ops.append((PUSH, item, priority))
+        self._heap.push(item, priority)
+
+    def pop(self) -> Tuple[float, int]:
+        self.ops.append((POP, -1, 0.0))
+        return self._heap.pop()
+
+    def peek(self) -> Tuple[float, int]:
+        return self._heap.peek()
+
+    def priority(self, item: int) -> float:
+        return self._heap.priority(item)
+
+    def decrease_key(self, item: int, priority: float) -> None:
+        self.ops.append((DECREASE, item, priority))
+        self._heap.decrease_key(item, priority)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, item: object) -> bool:
+        return item in self._heap
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._heap)
+
+
+def trace(graph: CompiledGraph[int], weights: List[float],
+          source: int, destination: int) -> List[Op]:
+    """Sequência de operações na fila de um Dijkstra"""
+    recorder: Optional[_Recorder] = None
+
+    def factory() -> _Recorder:
+        nonlocal recorder
+        recorder = _Recorder()
+        return recorder
+
+    csr_dijkstra(graph, weights, source, destination, heap=factory)
+    assert recorder is not None
+    return recorder.ops
+
+
+def replay(factory: Callable[[], KeyHeap[int, float]], ops: List[Op]) -> float:
+    """Tempo para repetir as operações em uma fila nova"""
+    queue = factory()
+    push, pop, decrease = queue.push, queue.pop, queue.decrease_key
+
+    start = default_timer()
+    for op, item, priority in ops:
+        if op == PUSH:
+            push(item, priority)
+        elif op == POP:
+            pop()
+        else:
+            decrease(item, priority)
+    return default_timer() - start
+
+
+def replay_heapq(ops: List[Op]) -> float:
+    """Tempo para repetir as operações com :mod:`heapq`, com entradas
+    duplicadas no lugar do `decrease-key`, como :func:`~graph.csr_dijkstra`
+    """
+    heap: List[Tuple[float, int]] = []
+    current: Dict[int, float] = {}
+
+    start = default_timer()
+    for op, item, priority in ops:
+        if op == POP:
+            # descarta as entradas desatualizadas
+            while True:
+                priority, item = heappop(heap)
+                if current.get(item) == priority:
+                    del current[item]
+                    break
+        else:
+            current[item] = priority
+            heappush(heap, (priority, item))
+    return default_timer() - start
+
+
+#: filas comparadas, além do :mod:`heapq`
+QUEUES: Dict[str, Callable[[], KeyHeap[int, float]]] = {
+    'binary': lambda: IndexedHeap(2),
+    '4-ary': lambda: IndexedHeap(4),
+    'pairing': PairingHeap,
+}
+
+
+def main(sides: Tuple[int, ...] = (32, 100, 316), *, seed: int = 0) -> None:
+    """Mostra a quantidade de cada operação e o tempo de cada fila
+    para grades de vários tamanhos"""
+
+    for side in sides:
+        graph, weights = grid(side, seed=seed)
+        ops = trace(graph, weights, 0, len(graph) - 1)
+        counts = [sum(1 for op in ops if op[0] == kind) for kind in (PUSH, POP, DECREASE)]
+
+        timings = {'heapq': replay_heapq(ops)}
+        for name, factory in QUEUES.items():
+            timings[name] = replay(factory, ops)
+
+        print(f'EDGES={graph.edge_count}',
+              *(f'{name.upper()}={count}' for name, count in zip(('PUSH', 'POP', 'DECREASE'), counts)))
+        print(*(f'{name}={timing:.4f}s' for name, timing in timings.items()))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(tuple(map(int, sys.argv[1:])))
+    else:
+        main()
@@ -0,0 +1,91 @@
+"""
+``benchmark.sampling``
+======================
+
+Erro das médias de tempo pela quantidade de execuções, para
+cada estratégia de amostragem de :mod:`sampling`
+
+O valor estimado é o tempo médio do melhor caminho, a média de
+todos os resultados de :func:`main.aggregate`. A referência vem
+de uma amostra independente grande.
+
+Uso: ``python -m benchmark.sampling ARQUIVO [EXECUÇÕES ...]``
+"""
+
+from __future__ import annotations
+
+from graph import csr_dijkstra
+from main import read_waze, read_latest_speeds
+from sampling import STRATEGIES, sample_times
+from waze import CompiledWaze
+
+import sys
+import numpy as np
+from typing import Dict, List, Tuple
+
+__all__ = ["estimate", "errors", "main"]
+
+
+def estimate(graph: CompiledWaze, source: int, dest: int, times: np.ndarray) -> float:
+    """Tempo médio do melhor caminho nas amostras, sem as que
+    não têm caminho"""
+    totals: List[float] = []
+    for sample in times:
+        result = csr_dijkstra(graph, sample.tolist(), source, dest)
+        if result:
+            totals.append(result[0])
+    return sum(totals) / len(totals) if totals else float('inf')
+
+
+def errors(graph: CompiledWaze, source: int, dest: int, reference: float,
+           runs: Tuple[int, ...], *, repeats: int = 16, seed: int = 0
+           ) -> Dict[str, List[float]]:
+    """Raiz do erro quadrático médio de cada estratégia, para cada
+    quantidade de execuções, repetindo a estimativa ``repeats`` vezes
+
+    :param reference: o valor de referência
+    """
+    rng = np.random.default_rng(seed)
+    curves: Dict[str, List[float]] = {}
+    for name in STRATEGIES:
+        curve = curves[name] = []
+        for count in runs:
+            estimates = [
+                estimate(graph, source, dest, sample_times(graph, count, rng=rng, strategy=name))
+                for _ in range(repeats)
+            ]
+            curve.append(float(np.sqrt(np.mean((np.array(estimates) - reference) ** 2))))
+    return curves
+
+
+def main(file: str, runs: Tuple[int, ...] = (4, 8, 16, 32, 64), *,
+         repeats: int = 16, reference: int = 2000, seed: int = 0) -> None:
+    """Mostra a curva de erro por execuções de cada estratégia e a
+    eficiência relativa à amostragem independente
+
+    :param file: arquivo de entrada, no formato de :func:`main.main`
+    :param reference: execuções da amostra de referência
+    """
+    with open(file) as infile:
+        waze = read_waze(file=infile)
+        source, dest = read_latest_speeds(waze, file=infile)
+    graph = waze.compile()
+    ids = graph.id(source), graph.id(dest)
+
+    rng = np.random.default_rng(seed)
+    value = estimate(graph, *ids, sample_times(graph, reference, rng=rng))
+    print(f'REFERENCE={value * 60.0:.4f}', f'RUNS={reference}')
+
+    curves = errors(graph, *ids, value, runs, repeats=repeats, seed=seed + 1)
+    print('RUNS', *runs)
+    for name, curve in curves.items():
+        efficiency = (np.array(curves['uniform']) / np.maximum(curve, 1e-300)) ** 2
+        print(name.upper(), *(f'{error * 60.0:.4f}' for error in curve),
+              'EFFICIENCY', *(f'{eff:.2f}' for eff in efficiency))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        main(sys.argv[1], tuple(map(int, sys.argv[2:])))
+    else:
+        main(sys.argv[1])
@@ -0,0 +1,246 @@
+"""
+``benchmark.suite``
+===================
+
+Tempo de cada fase da solução em entradas sintéticas
+(:mod:`benchmark.generator`), nos modos sequencial e paralelo
+de :func:`utils.run_many`
+
+As fases medidas são a leitura da entrada (com :func:`main.read_waze`
+e com :func:`parser.parse`), a compilação do grafo, o sorteio das
+velocidades, as buscas e a agregação dos resultados. Cada fase é
+repetida algumas vezes e fica o menor tempo. O resultado é gravado em
+JSON, com a versão do código, para comparar execuções em `commits`
+diferentes com :func:`compare`.
+
+Uso::
+
+    python -m benchmark.suite SAIDA.json [ARESTAS ...]
+    python -m benchmark.suite --compare ANTES.json DEPOIS.json
+"""
+
+from __future__ import annotations
+
+from benchmark.generator import generate
+from main import ENGINES, Result, read_waze, read_latest_speeds, compile_waze, run, aggregate
+from parser import parse
+from sampling import sample_times
+from utils import uncurry, run_many
+from waze import CompiledWaze
+
+import io
+import os
+import sys
+import json
+import platform
+import subprocess
+import numpy as np
+from timeit import default_timer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+__all__ = ["timed", "measure", "suite", "compare", "main"]
+
+
+#: versão do formato do JSON
+FORMAT = 1
+
+# tempos de cada fase, em segundos
+Timings = Dict[str, float]
+
+
+def timed(func: Callable[[], Any], repeats: int = 1) -> Tuple[float, Any]:
+    """Menor tempo de ``repeats`` chamadas e o resultado da última"""
+    best, result = float('inf'), None
+    for _ in range(max(repeats, 1)):
+        start = default_timer()
+        result = func()
+        best = min(best, default_timer() - start)
+    return best, result
+
+
+@uncurry
+def timed_run(waze: CompiledWaze, source: str, dest: str, engine: str
+              ) -> Tuple[Result, float, float]:
+    """Uma execução de :func:`main.run`, com o tempo do sorteio e
+    da busca, feita nos processos do modo paralelo"""
+    start = default_timer()
+    times = waze.weights()
+    sampled = default_timer()
+    result = run((waze, source, dest, times, engine))
+    return result, sampled - start, default_timer() - sampled
+
+
+def _runs(graph: CompiledWaze, source: str, dest: str, runs: int, engine: str,
+          parallel: bool) -> Timings:
+    """tempos das execuções em um modo, com o sorteio e as buscas
+    somados entre os processos"""
+    start = default_timer()
+    outputs = list(run_many(timed_run, (graph, source, dest, engine), runs,
+                            PARALLEL=parallel))
+    wall = default_timer() - start
+
+    aggregated, _ = timed(lambda: aggregate(result for result, *_ in outputs))
+    return {
+        'sample': sum(sample for _, sample, _ in outputs),
+        'search': sum(search for *_, search in outputs),
+        'runs': wall,
+        'aggregate': aggregated,
+    }
+
+
+def measure(data: bytes, runs: int = 10, *, engine: str = 'dijkstra',
+            repeats: int = 3, parallel: bool = True) -> Dict[str, Any]:
+    """Tempos das fases para uma entrada
+
+    :param data: a entrada completa, no formato de :func:`main.main`
+    :param runs: execuções em cada modo
+    :param engine: a busca de cada execução, entre :data:`main.ENGINES`
+    :param repeats: repetições de cada fase, fica o menor tempo
+    :param parallel: se também mede o modo paralelo
+    :return: o tamanho do grafo, os tempos das fases de preparação e
+            os tempos das execuções em cada modo
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown search engine: {engine}")
+
+    def read() -> Tuple[Any, str, str]:
+        file = io.StringIO(data.decode())
+        waze = read_waze(file=file)
+        return (waze, *read_latest_speeds(waze, file=file))
+
+    phases: Timings = {}
+    phases['parse'], (waze, source, dest) = timed(read, repeats)
+    phases['compile'], graph = timed(lambda: compile_waze(waze, engine), repeats)
+    phases['fastparse'], _ = timed(lambda: parse(data), repeats)
+    phases['sample_batch'], _ = timed(lambda: sample_times(graph, runs), repeats)
+
+    modes = {'sequential': False, 'parallel': True} if parallel else {'sequential': False}
+    timings: Dict[str, Timings] = {}
+    for mode, flag in modes.items():
+        trials = [_runs(graph, source, dest, runs, engine, flag)
+                  for _ in range(max(repeats, 1))]
+        timings[mode] = {phase: min(trial[phase] for trial in trials)
+                         for phase in trials[0]}
+
+    return {
+        'nodes': len(graph),
+        'edges': graph.edge_count,
+        'observed': len(graph.observed_edges()),
+        'phases': phases,
+        'modes': timings,
+    }
+
+
+def _commit() -> Optional[str]:
+    """`commit` atual do repositório, se houver"""
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def suite(sizes: Sequence[int] = (1000, 10000, 100000), kinds: Sequence[str] = ('grid', 'road'),
+          *, runs: int = 10, density: float = 0.1, closed: float = 0.01,
+          seed: int = 0, engine: str = 'dijkstra', repeats: int = 3,
+          parallel: bool = True, log: Optional[Callable[[str], Any]] = None
+          ) -> Dict[str, Any]:
+    """Mede todas as combinações de tamanho e tipo de mapa
+
+    :param sizes: quantidade aproximada de trechos de cada mapa
+    :param kinds: tipos de mapa, entre :data:`benchmark.generator.KINDS`
+    :param log: recebe uma linha de resumo de cada caso
+    :return: o documento JSON com a versão do código, do ambiente e
+            os resultados de cada caso
+    """
+    cases: List[Dict[str, Any]] = []
+    for kind in kinds:
+        for size in sizes:
+            generated, data = timed(lambda: generate(size, kind, density=density,
+                                                     closed=closed, seed=seed))
+            case: Dict[str, Any] = {
+                'kind': kind, 'size': size, 'seed': seed, 'density': density,
+                'closed': closed, 'runs': runs, 'engine': engine,
+            }
+            case.update(measure(data, runs, engine=engine, repeats=repeats,
+                                parallel=parallel))
+            case['phases']['generate'] = generated
+            cases.append(case)
+
+            if log is not None:
+                sequential = case['modes']['sequential']
+                log(f"{kind} EDGES={case['edges']} PARSE={case['phases']['parse']:.3f}s "
+                    f"SAMPLE={sequential['sample']:.3f}s SEARCH={sequential['search']:.3f}s")
+
+    return {
+        'format': FORMAT,
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'cases': cases,
+    }
+
+
+def _flatten(document: Dict[str, Any]) -> Dict[Tuple[str, ...], float]:
+    """tempos de cada fase de cada caso, por uma chave comparável"""
+    flat: Dict[Tuple[str, ...], float] = {}
+    for case in document['cases']:
+        key = (case['kind'], str(case['size']), str(case['seed']), str(case['runs']),
+               case['engine'])
+        for phase, value in case['phases'].items():
+            flat[key + ('', phase)] = value
+        for mode, timings in case['modes'].items():
+            for phase, value in timings.items():
+                flat[key + (mode, phase)] = value
+    return flat
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any], *, threshold: float = 1.1
+            ) -> List[Tuple[Tuple[str, ...], float, float, float]]:
+    """Razão entre os tempos de dois resultados de :func:`suite`, para
+    os casos e fases presentes nos dois
+
+    :param threshold: razão a partir da qual a diferença é uma piora
+    :return: a chave, os dois tempos e a razão de cada fase que piorou,
+            da maior razão para a menor
+    """
+    old, new = _flatten(before), _flatten(after)
+    regressions = []
+    for key in old.keys() & new.keys():
+        ratio = new[key] / old[key] if old[key] > 0 else float('inf')
+        if ratio >= threshold:
+            regressions.append((key, old[key], new[key], ratio))
+    regressions.sort(key=lambda item: -item[3])
+    return regressions
+
+
+def main(argv: Sequence[str]) -> None:
+    """Grava os resultados de :func:`suite` ou compara dois deles"""
+    if len(argv) == 3 and argv[0] == '--compare':
+        with open(argv[1]) as file:
+            before = json.load(file)
+        with open(argv[2]) as file:
+            after = json.load(file)
+        regressions = compare(before, after)
+        for (kind, size, *_, mode, phase), old, new, ratio in regressions:
+            print(f'{kind} SIZE={size} {mode or "setup"}.{phase} '
+                  f'{old:.4f}s -> {new:.4f}s RATIO={ratio:.2f}')
+        if regressions:
+            raise SystemExit(1)
+        return
+
+    if not argv:
+        raise SystemExit("usage: python -m benchmark.suite SAIDA.json [ARESTAS ...]")
+
+    sizes = tuple(map(int, argv[1:])) or (1000, 10000, 100000)
+    document = suite(sizes, log=lambda line: print(line, file=sys.stderr))
+    with open(argv[0], 'w') as file:
+        json.dump(document, file, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
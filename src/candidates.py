@@ -0,0 +1,132 @@
+"""
+``candidates.py``
+=================
+
+Avaliação vetorizada das execuções sobre alguns caminhos
+candidatos com `NumPy <https://numpy.org/>`_, sem uma busca
+para cada amostra
+"""
+
+from __future__ import annotations
+
+from graph.yen import csr_yen, path_edges
+from waze import CompiledWaze
+
+import numpy as np
+from typing import Sequence, Dict, List, Tuple
+
+__all__ = ["Candidates"]
+
+
+class Candidates:
+    """
+    Caminhos candidatos entre dois nós, com as arestas de cada um
+
+    A incidência caminho x aresta fica em CSR: as arestas do caminho
+    ``p`` são as de posição ``starts[p]`` até ``starts[p + 1]`` em
+    ``edges``. Nenhum caminho fora dos candidatos tem peso menor que
+    ``bound`` em qualquer amostra.
+
+    :param paths: os nós de cada caminho
+    :param edges: as arestas de cada caminho
+    :param bound: limite inferior do peso dos outros caminhos
+    """
+    __slots__ = ['_paths', '_edges', '_starts', '_bound']
+
+    def __init__(self, paths: Sequence[Tuple[int, ...]],
+                 edges: Sequence[Sequence[int]], bound: float):
+        self._paths = tuple(paths)
+        self._edges = np.array([edge for path in edges for edge in path], dtype=np.intp)
+        self._starts = np.cumsum([0] + [len(path) for path in edges[:-1]], dtype=np.intp)
+        self._bound = bound
+
+    @classmethod
+    def build(cls, graph: CompiledWaze, source: int, destination: int,
+              k: int = 8) -> Candidates:
+        """Enumera os candidatos com :func:`~graph.yen.csr_yen`
+
+        Os ``k`` melhores caminhos com os tempos otimistas
+        (:meth:`~waze.CompiledWaze.lower_bounds`) dão o limite: qualquer
+        outro caminho custa pelo menos o peso otimista do último deles.
+        Os ``k`` melhores com os tempos pessimistas
+        (:meth:`~waze.CompiledWaze.upper_bounds`) entram como candidatos
+        para as amostras mais lentas.
+
+        :param graph: o grafo compilado
+        :param source: nó inicial
+        :param destination: nó final
+        :param k: quantidade de caminhos de cada enumeração
+        """
+        lower = graph.lower_bounds()
+        optimistic = csr_yen(graph, lower, source, destination, k)
+        pessimistic = csr_yen(graph, graph.upper_bounds(), source, destination, k)
+
+        # com menos de k caminhos, todos foram enumerados
+        bound = optimistic[-1][0] if len(optimistic) == k else float('inf')
+
+        paths: Dict[Tuple[int, ...], List[int]] = {}
+        for _, path in optimistic + pessimistic:
+            if path not in paths:
+                paths[path] = path_edges(graph, lower, path)
+
+        return cls(list(paths), list(paths.values()), bound)
+
+    @property
+    def paths(self) -> Tuple[Tuple[int, ...], ...]:
+        """os nós de cada caminho"""
+        return self._paths
+
+    @property
+    def bound(self) -> float:
+        """limite inferior do peso dos caminhos fora dos candidatos"""
+        return self._bound
+
+    def costs(self, times: np.ndarray) -> np.ndarray:
+        """Peso de cada caminho em cada amostra
+
+        Equivale ao produto da matriz de incidência pelos tempos,
+        somando as arestas de cada caminho de uma vez.
+
+        :param times: matriz ``runs x E`` com os tempos das amostras
+        :return: matriz ``runs x len(self)``
+        """
+        if not self._paths:
+            return np.empty((len(times), 0))
+        return np.add.reduceat(times[:, self._edges], self._starts, axis=1)
+
+    def evaluate(self, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Melhor candidato em cada amostra e se ele é comprovadamente
+        o melhor caminho do grafo
+
+        A prova vale quando o melhor candidato é único e custa menos que
+        :attr:`bound`, ou quando não há caminho possível e todos os
+        caminhos foram enumerados. As outras amostras precisam de uma
+        busca de verdade.
+
+        :param times: matriz ``runs x E`` com os tempos das amostras
+        :return:    o índice do melhor caminho (``-1`` se não existe
+                    caminho), o peso dele e se a amostra foi resolvida
+        """
+        runs = len(times)
+        if not self._paths:
+            return (np.full(runs, -1, dtype=np.intp), np.full(runs, np.inf),
+                    np.full(runs, self._bound == np.inf))
+
+        costs = self.costs(times)
+        best = np.argmin(costs, axis=1)
+        cost = costs[np.arange(runs), best]
+
+        unique = np.ones(runs, dtype=bool)
+        if len(self._paths) > 1:
+            unique = np.partition(costs, 1, axis=1)[:, 1] > cost
+
+        finite = cost < np.inf
+        proven = (finite & unique & (cost < self._bound)) | (~finite & (self._bound == np.inf))
+        best[~finite] = -1
+        return best, cost, proven
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(paths={len(self)}, bound={self._bound})'
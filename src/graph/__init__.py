@@ -1,4 +1,10 @@
 from .graph import Node, Graph
-from .dijkstra import dijkstra
+from .compiled import CompiledGraph
+from .dijkstra import dijkstra, csr_dijkstra
+from .bidirectional import bidirectional_dijkstra, csr_bidirectional
 
-__all__ = ["Graph", "Node", "dijkstra"]
+__all__ = [
+    "Graph", "Node", "CompiledGraph",
+    "dijkstra", "csr_dijkstra",
+    "bidirectional_dijkstra", "csr_bidirectional"
+]
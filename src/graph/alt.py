@@ -0,0 +1,200 @@
+"""
+``alt.py``
+==========
+
+Busca A* com limites inferiores por marcos e desigualdade
+triangular (ALT)
+"""
+
+from __future__ import annotations
+
+from .dijkstra import csr_distances, hiearachy_path
+from protocols import Searchable
+
+from heapq import heappop, heappush
+from typing import (
+    Optional, Callable,
+    Sequence, Dict, Set, List, Tuple
+)
+
+__all__ = ["Landmarks", "csr_astar", "csr_alt"]
+
+
+# estimativa do peso restante de um nó até o destino
+Potential = Callable[[int], float]
+
+
+class Landmarks:
+    """
+    Tabelas de peso dos melhores caminhos de e para alguns nós
+    marco, calculadas com pesos que são limites inferiores
+
+    Pela desigualdade triangular, para qualquer marco ``L``, o
+    peso de ``v`` até ``t`` é pelo menos ``d(L, t) - d(L, v)`` e
+    ``d(v, L) - d(t, L)``. Com os limites inferiores, a estimativa
+    vale para qualquer peso maior ou igual a eles.
+
+    :param nodes: os marcos
+    :param from_tables: peso de cada marco até cada nó
+    :param to_tables: peso de cada nó até cada marco
+    """
+    __slots__ = ['_nodes', '_from', '_to']
+
+    def __init__(self, nodes: Sequence[int],
+                 from_tables: Sequence[Sequence[float]],
+                 to_tables: Sequence[Sequence[float]]):
+        self._nodes = tuple(nodes)
+        self._from = tuple(from_tables)
+        self._to = tuple(to_tables)
+
+    @classmethod
+    def build(cls, graph: Searchable, lower: Sequence[float],
+              count: int = 8) -> Landmarks:
+        """Escolhe os marcos e calcula as tabelas
+
+        O primeiro marco é o nó mais distante do nó ``0`` e cada
+        próximo é o nó mais distante dos marcos já escolhidos,
+        considerando só os nós alcançáveis.
+
+        :param graph: o grafo compilado
+        :param lower: limite inferior do peso de cada aresta
+        :param count: quantidade de marcos
+        """
+        nodes: List[int] = []
+        from_tables: List[List[float]] = []
+        to_tables: List[List[float]] = []
+        if not len(graph):
+            return cls(nodes, from_tables, to_tables)
+
+        inf = float('inf')
+        # menor distância (nos dois sentidos) até os marcos
+        closest = [inf] * len(graph)
+        start = csr_distances(graph, lower, 0)
+
+        for _ in range(min(count, len(graph))):
+            candidates = start if not nodes else closest
+            landmark = max((node for node in range(len(graph)) if node not in nodes),
+                           key=lambda node: candidates[node] if candidates[node] < inf else -1.0)
+
+            forward = csr_distances(graph, lower, landmark)
+            backward = csr_distances(graph, lower, landmark, reverse=True)
+            nodes.append(landmark)
+            from_tables.append(forward)
+            to_tables.append(backward)
+
+            for node in range(len(graph)):
+                closest[node] = min(closest[node], forward[node], backward[node])
+
+        return cls(nodes, from_tables, to_tables)
+
+    @property
+    def nodes(self) -> Tuple[int, ...]:
+        """os marcos"""
+        return self._nodes
+
+    def potential(self, destination: int) -> Potential:
+        """Limite inferior do peso de cada nó até ``destination``
+
+        Um nó que não alcança o destino tem estimativa infinita.
+        """
+        inf = float('inf')
+        # tabelas com o peso do destino em cada uma
+        forward = [(table, table[destination]) for table in self._from]
+        backward = [(table, table[destination]) for table in self._to]
+
+        def estimate(node: int) -> float:
+            best = 0.0
+            # d(L, t) - d(L, v)
+            for table, target in forward:
+                value = table[node]
+                if value < inf:
+                    if target == inf:
+                        return inf
+                    best = max(best, target - value)
+            # d(v, L) - d(t, L)
+            for table, target in backward:
+                if target < inf:
+                    value = table[node]
+                    if value == inf:
+                        return inf
+                    best = max(best, value - target)
+            return best
+
+        return estimate
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({list(self._nodes)})'
+
+
+def csr_astar(graph: Searchable, weights: Sequence[float],
+              source: int, destination: int, potential: Potential
+              ) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """Busca A* no grafo compilado
+
+    A estimativa deve ser consistente com os pesos, como as de
+    :meth:`Landmarks.potential` com pesos acima dos limites inferiores.
+    Recebe e retorna os mesmos valores de :func:`~graph.dijkstra.csr_dijkstra`.
+
+    :param potential: estimativa do peso de cada nó até o destino
+    """
+    offsets, targets = graph.offsets, graph.targets
+    inf = float('inf')
+
+    # o heap com o peso estimado pelo nó, o peso real e o nó
+    paths: List[Tuple[float, float, int]] = []
+    # conjunto de nós visitados
+    visited: Set[int] = {source}
+    # mapeamento de nós-pais no caminho
+    parent: Dict[int, int] = {}
+    # peso total até o nó
+    weights_to: Dict[int, float] = {}
+    # estimativas já calculadas
+    estimates: Dict[int, float] = {}
+
+    node, weight = source, 0.0
+    while True:
+        # relaxa a vizinhança do nó
+        for edge in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[edge]
+            if neighbor in visited:
+                continue
+
+            total = weight + weights[edge]
+            if total < weights_to.get(neighbor, inf):
+                remaining = estimates.get(neighbor)
+                if remaining is None:
+                    remaining = estimates[neighbor] = potential(neighbor)
+
+                estimate = total + remaining
+                if estimate < inf:
+                    weights_to[neighbor] = total
+                    parent[neighbor] = node
+                    heappush(paths, (estimate, total, neighbor))
+
+        # puxa o próximo nó ainda não visitado
+        while paths:
+            _, weight, node = heappop(paths)
+            if node not in visited:
+                break
+        else:
+            # não tem caminho até o nó
+            return None
+
+        if node == destination:
+            return weight, hiearachy_path(parent, node)
+        visited.add(node)
+
+
+def csr_alt(graph: Searchable, weights: Sequence[float],
+            source: int, destination: int, landmarks: Landmarks
+            ) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """Busca A* com a estimativa dos marcos, veja :func:`csr_astar`
+
+    :param landmarks: marcos calculados com limites inferiores
+            dos pesos ``weights``
+    """
+    return csr_astar(graph, weights, source, destination,
+                     landmarks.potential(destination))
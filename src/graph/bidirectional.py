@@ -0,0 +1,161 @@
+"""
+``bidirectional.py``
+====================
+
+Dijkstra bidirecional, com buscas saindo da origem
+e chegando no destino ao mesmo tempo
+"""
+
+from __future__ import annotations
+
+from . import Graph, Node
+from .dijkstra import hiearachy_path
+from protocols import Keyable, FloatWeightable, Searchable, Weighted
+
+from heapq import heappop, heappush
+from typing import (
+    TypeVar, Optional, Callable, Iterable,
+    Sequence, Dict, Set, List, Tuple, Union, overload
+)
+
+__all__ = ["bidirectional_dijkstra", "csr_bidirectional"]
+
+
+# tipos genéricos de chave, pesos e nós
+K = TypeVar('K', bound=Keyable)
+F = TypeVar('F', bound=FloatWeightable)
+N = TypeVar('N', bound=Keyable)
+
+# vizinhança de um nó, com o peso de cada aresta
+Adjacency = Callable[[N], Iterable[Tuple[float, N]]]
+
+
+def bidirectional(source: N, destination: N,
+                  forward: Adjacency[N], backward: Adjacency[N]
+                  ) -> Optional[Tuple[float, Tuple[N, ...]]]:
+    """Busca bidirecional genérica, com pesos em :class:`float`
+
+    As duas buscas avançam alternadamente pela fronteira de menor
+    peso e param quando a soma dos topos dos dois heaps alcança o
+    melhor caminho já encontrado entre elas.
+
+    :param source: nó inicial
+    :param destination: nó final
+    :param forward: arestas saindo de um nó
+    :param backward: arestas chegando em um nó
+    :return: o peso total e os nós do melhor caminho ou
+            :obj:`None`, se não existir
+    """
+    # como em dijkstra, a origem não é alcançada por ela mesma
+    if source == destination:
+        return None
+
+    # estado de cada sentido: heap, pesos, pais e visitados
+    heaps: Tuple[List[Tuple[float, N]], ...] = ([(0.0, source)], [(0.0, destination)])
+    weights: Tuple[Dict[N, float], ...] = ({source: 0.0}, {destination: 0.0})
+    parents: Tuple[Dict[N, N], ...] = ({}, {})
+    visited: Tuple[Set[N], ...] = (set(), set())
+    adjacency = (forward, backward)
+
+    best, meeting = float('inf'), None
+
+    while heaps[0] and heaps[1]:
+        # critério de parada
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+
+        # avança o sentido com a menor fronteira
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        heap, dist, parent = heaps[side], weights[side], parents[side]
+        other = weights[1 - side]
+
+        weight, node = heappop(heap)
+        if node in visited[side]:
+            continue
+        visited[side].add(node)
+
+        for edge_weight, neighbor in adjacency[side](node):
+            total = weight + edge_weight
+            if total < dist.get(neighbor, best):
+                dist[neighbor] = total
+                parent[neighbor] = node
+                heappush(heap, (total, neighbor))
+
+                # o caminho passa pelo vizinho, se o outro lado já chegou nele
+                if neighbor in other and total + other[neighbor] < best:
+                    best, meeting = total + other[neighbor], neighbor
+
+    if meeting is None:
+        return None
+
+    # junta as duas metades do caminho
+    first = hiearachy_path(parents[0], meeting)
+    second = hiearachy_path(parents[1], meeting)
+    return best, first + tuple(reversed(second[:-1]))
+
+
+def csr_bidirectional(graph: Searchable, weights: Sequence[float],
+                      source: int, destination: int
+                      ) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """Dijkstra bidirecional no grafo compilado, usando o índice
+    reverso de :meth:`~graph.compiled.CompiledGraph.reverse`
+
+    Recebe e retorna os mesmos valores de :func:`~graph.dijkstra.csr_dijkstra`.
+    """
+    offsets, targets = graph.offsets, graph.targets
+    rev_offsets, rev_edges, rev_sources = graph.reverse()
+
+    def forward(node: int) -> Iterable[Tuple[float, int]]:
+        start, end = offsets[node], offsets[node + 1]
+        return zip(weights[start:end], targets[start:end])
+
+    def backward(node: int) -> Iterable[Tuple[float, int]]:
+        start, end = rev_offsets[node], rev_offsets[node + 1]
+        return zip([weights[edge] for edge in rev_edges[start:end]], rev_sources[start:end])
+
+    return bidirectional(source, destination, forward, backward)
+
+
+@overload
+def bidirectional_dijkstra(graph: Weighted[K], source: K, destination: K
+                           ) -> Optional[Tuple[float, Tuple[K, ...]]]: ...
+@overload
+def bidirectional_dijkstra(graph: Graph[K, F], source: K, destination: K
+                           ) -> Optional[Tuple[float, Tuple[Node[K, F], ...]]]: ...
+
+def bidirectional_dijkstra(graph: Union[Graph[K, F], Weighted[K]],
+                           source: K, destination: K
+                           ) -> Union[Optional[Tuple[float, Tuple[K, ...]]],
+                                      Optional[Tuple[float, Tuple[Node[K, F], ...]]]]:
+    """Encontra o caminho ótimo entre dois nós com a busca bidirecional
+
+    Retorna o mesmo que :func:`~graph.dijkstra.dijkstra` com pesos em
+    :class:`float`. No grafo de objetos, as arestas chegando em cada
+    nó vêm de :meth:`~graph.graph.Graph.predecessors`.
+
+    :param graph: o grafo
+    :param source: nó inicial do caminho
+    :param destination: nó final
+    :return: o peso total e o melhor caminho entre os nós ou
+            :obj:`None`, se não for possível encontrar um caminho
+    """
+    if not isinstance(graph, Graph):
+        if source not in graph or destination not in graph:
+            return None
+
+        path = csr_bidirectional(graph, graph.weights(),
+                                 graph.id(source), graph.id(destination))
+        if not path:
+            return None
+        total, nodes = path
+        return total, tuple(map(graph.key, nodes))
+
+    def forward(node: Node[K, F]) -> Iterable[Tuple[float, Node[K, F]]]:
+        return ((float(weight), neighbor) for neighbor, weight in node.items())
+
+    def backward(node: Node[K, F]) -> Iterable[Tuple[float, Node[K, F]]]:
+        return ((float(weight), neighbor) for weight, neighbor in graph.predecessors(node.key))
+
+    if destination not in graph:
+        return None
+    return bidirectional(graph[source], graph[destination], forward, backward)
@@ -0,0 +1,13 @@
+"""
+``cch``
+=======
+
+Hierarquias de contração customizáveis: a hierarquia é montada
+uma vez para a topologia do grafo e customizada rapidamente para
+cada novo vetor de pesos, antes das buscas
+"""
+
+from .hierarchy import Hierarchy, contraction_order
+from .metric import Metric
+
+__all__ = ["Hierarchy", "Metric", "contraction_order"]
@@ -0,0 +1,301 @@
+"""
+``hierarchy.py``
+================
+
+Ordem de contração e hierarquia independentes
+dos pesos das arestas
+"""
+
+from __future__ import annotations
+
+from ..compiled import CompiledGraph
+from .metric import Metric
+from protocols import Keyable
+
+import numpy as np
+from array import array
+from typing import TypeVar, Sequence, Dict, List, Set, Tuple
+
+__all__ = ["Hierarchy", "contraction_order"]
+
+
+# tipo de chave dos nós
+K = TypeVar('K', bound=Keyable)
+
+
+#: tamanho das partes que não são mais divididas
+#: na dissecção aninhada
+LEAF_SIZE = 32
+
+
+def _levels(neighbors: Sequence[Set[int]], part: Set[int], start: int) -> List[List[int]]:
+    """níveis da busca em largura a partir de ``start``, só dentro de ``part``"""
+    seen = {start}
+    levels = [[start]]
+    while True:
+        level: List[int] = []
+        for node in levels[-1]:
+            for neighbor in neighbors[node]:
+                if neighbor in part and neighbor not in seen:
+                    seen.add(neighbor)
+                    level.append(neighbor)
+        if not level:
+            return levels
+        levels.append(level)
+
+
+def _dissect(neighbors: Sequence[Set[int]], part: Set[int], order: List[int]) -> None:
+    """ordena ``part`` por dissecção aninhada, com os separadores no final"""
+    # separa as componentes conexas
+    components: List[List[List[int]]] = []
+    remaining = set(part)
+    while remaining:
+        levels = _levels(neighbors, part, next(iter(remaining)))
+        # recomeça do nó mais distante, para níveis mais finos
+        levels = _levels(neighbors, part, levels[-1][0])
+        components.append(levels)
+        remaining.difference_update(node for level in levels for node in level)
+
+    for levels in components:
+        nodes = [node for level in levels for node in level]
+        if len(nodes) <= LEAF_SIZE or len(levels) < 3:
+            # parte pequena: menor grau primeiro
+            nodes.sort(key=lambda node: sum(n in part for n in neighbors[node]))
+            order.extend(nodes)
+            continue
+
+        # o nível que divide a componente ao meio é um separador
+        half, count, middle = len(nodes) // 2, 0, 1
+        for middle in range(1, len(levels) - 1):
+            count += len(levels[middle - 1])
+            if count + len(levels[middle]) > half:
+                break
+
+        first = {node for level in levels[:middle] for node in level}
+        second = {node for level in levels[middle + 1:] for node in level}
+        separator: List[int] = []
+        # nós do separador sem vizinhos na segunda parte ficam na primeira
+        for node in levels[middle]:
+            if any(neighbor in second for neighbor in neighbors[node]):
+                separator.append(node)
+            else:
+                first.add(node)
+
+        _dissect(neighbors, first, order)
+        _dissect(neighbors, second, order)
+        order.extend(separator)
+
+
+def contraction_order(graph: CompiledGraph[K]) -> Tuple[List[int], List[List[int]]]:
+    """Ordem de contração dos nós por dissecção aninhada, ignorando
+    o sentido e o peso das arestas
+
+    Cada parte do grafo é dividida por um nível da busca em largura,
+    que separa os níveis acima dos abaixo. As duas metades são ordenadas
+    primeiro e o separador por último, o que limita os atalhos criados
+    ao contrair os nós.
+
+    Ao contrair um nó, todos os seus vizinhos ainda não contraídos
+    passam a ser vizinhos entre si (o `fill-in`), o que garante que
+    qualquer caminho tenha um equivalente na hierarquia.
+
+    :param graph: o grafo compilado
+    :return:    os nós na ordem de contração e, para cada nó, os
+                vizinhos contraídos depois dele, em ordem de contração
+    """
+    nodes = len(graph)
+    # grafo não direcionado, sem laços
+    neighbors: List[Set[int]] = [set() for _ in range(nodes)]
+    for node in range(nodes):
+        for _, target in graph.neighbors(node):
+            if target != node:
+                neighbors[node].add(target)
+                neighbors[target].add(node)
+
+    order: List[int] = []
+    _dissect(neighbors, set(range(nodes)), order)
+
+    rank = [0] * nodes
+    for position, node in enumerate(order):
+        rank[node] = position
+
+    # contração na ordem: os vizinhos de cima de um nó também são
+    # vizinhos do mais baixo deles, que os repassa adiante
+    upward: List[List[int]] = [[] for _ in range(nodes)]
+    for node in order:
+        above = sorted((n for n in neighbors[node] if rank[n] > rank[node]),
+                       key=rank.__getitem__)
+        upward[node] = above
+        if above:
+            parent = above[0]
+            neighbors[parent].update(above[1:])
+
+    return order, upward
+
+
+class Hierarchy:
+    """
+    Hierarquia de contração customizável (CCH) de um grafo compilado
+
+    A hierarquia só depende da topologia: cada par de nós vizinhos
+    (depois do `fill-in`) vira um arco do nó de menor posição na ordem
+    para o de maior. Cada arco tem dois pesos, um em cada sentido, que
+    são calculados para cada vetor de pesos em :meth:`customize`.
+
+    Os triângulos inferiores ficam agrupados pela altura do nó de baixo
+    na árvore de eliminação. Os de mesma altura não dependem uns dos
+    outros e são customizados juntos, de forma vetorizada.
+
+    :param graph: o grafo compilado
+    """
+    __slots__ = [
+        '_rank', '_arc_offsets', '_arc_heads',
+        '_edge_arcs', '_edge_upward', '_triangles', '_levels'
+    ]
+
+    def __init__(self, graph: CompiledGraph[K]):
+        order, upward = contraction_order(graph)
+
+        self._rank = array('l', bytes(array('l').itemsize * len(graph)))
+        for position, node in enumerate(order):
+            self._rank[node] = position
+
+        # arcos subindo de cada nó, em CSR
+        self._arc_offsets = array('l', [0])
+        self._arc_heads = array('l')
+        for node in range(len(graph)):
+            self._arc_heads.extend(upward[node])
+            self._arc_offsets.append(len(self._arc_heads))
+        # índice de cada arco pelo nó de cima, para cada nó de baixo
+        arcs: List[Dict[int, int]] = [
+            {head: self._arc_offsets[node] + pos for pos, head in enumerate(upward[node])}
+            for node in range(len(graph))
+        ]
+
+        # arco de cada aresta e se ela sobe na hierarquia, laços ficam sem arco
+        edge_arcs: List[int] = []
+        edge_upward: List[bool] = []
+        for node in range(len(graph)):
+            for _, target in graph.neighbors(node):
+                up = self._rank[node] < self._rank[target]
+                edge_arcs.append(arcs[node].get(target, -1) if up else arcs[target].get(node, -1))
+                edge_upward.append(up)
+        self._edge_arcs = np.array(edge_arcs, dtype=np.intp)
+        self._edge_upward = np.array(edge_upward, dtype=bool)
+
+        # altura de cada nó na árvore de eliminação, onde o pai
+        # de um nó é o mais baixo dos seus vizinhos de cima
+        height = [0] * len(graph)
+        for node in order:
+            if upward[node]:
+                parent = upward[node][0]
+                height[parent] = max(height[parent], height[node] + 1)
+
+        # triângulos inferiores (v, u, w), com v abaixo de u abaixo de w,
+        # guardados como o nó v e os arcos v-u, v-w e u-w, em colunas
+        levels: List[List[int]] = [[] for _ in range(max(height, default=0) + 1)]
+        for node in order:
+            heads = upward[node]
+            first = self._arc_offsets[node]
+            level = levels[height[node]]
+            for i, low in enumerate(heads):
+                low_arcs = arcs[low]
+                for j in range(i + 1, len(heads)):
+                    level.extend((node, first + i, first + j, low_arcs[heads[j]]))
+
+        self._levels = array('l', [0])
+        for level in levels:
+            self._levels.append(self._levels[-1] + len(level) // 4)
+        self._triangles = np.array([value for level in levels for value in level],
+                                   dtype=np.intp).reshape(-1, 4).T.copy()
+
+    @property
+    def rank(self) -> Sequence[int]:
+        """posição de cada nó na ordem de contração"""
+        return self._rank
+
+    @property
+    def arc_count(self) -> int:
+        """quantidade de arcos na hierarquia"""
+        return len(self._arc_heads)
+
+    @property
+    def triangle_count(self) -> int:
+        """quantidade de triângulos inferiores"""
+        return self._triangles.shape[1]
+
+    def arc(self, low: int, high: int) -> int:
+        """Índice do arco entre dois nós, com ``low`` abaixo de ``high``
+
+        :raises KeyError: se o arco não existe
+        """
+        start, end = self._arc_offsets[low], self._arc_offsets[low + 1]
+        rank, heads = self._rank, self._arc_heads
+        # os arcos de cada nó estão em ordem de contração
+        lo, hi = start, end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if rank[heads[mid]] < rank[high]:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == end or heads[lo] != high:
+            raise KeyError((low, high))
+        return lo
+
+    def upward(self, node: int) -> range:
+        """Índices dos arcos subindo do nó"""
+        return range(self._arc_offsets[node], self._arc_offsets[node + 1])
+
+    def head(self, arc: int) -> int:
+        """Nó de cima do arco"""
+        return self._arc_heads[arc]
+
+    def customize(self, weights: Sequence[float]) -> Metric:
+        """Calcula os pesos dos arcos para um vetor de pesos
+        das arestas
+
+        Os arcos começam com o peso das arestas do grafo (ou infinito)
+        e cada triângulo inferior ``(v, u, w)`` tenta melhorar o arco
+        ``(u, w)`` passando por ``v``, dos nós mais baixos para os
+        mais altos.
+
+        :param weights: peso de cada aresta do grafo
+        """
+        arcs = self.arc_count
+        up = np.full(arcs, np.inf)
+        down = np.full(arcs, np.inf)
+        up_middle = np.full(arcs, -1, dtype=np.intp)
+        down_middle = np.full(arcs, -1, dtype=np.intp)
+
+        # arestas paralelas ficam com o menor peso
+        values = np.asarray(weights, dtype=np.float64)
+        valid = self._edge_arcs >= 0
+        upward, downward = valid & self._edge_upward, valid & ~self._edge_upward
+        np.minimum.at(up, self._edge_arcs[upward], values[upward])
+        np.minimum.at(down, self._edge_arcs[downward], values[downward])
+
+        for start, end in zip(self._levels, self._levels[1:]):
+            if start == end:
+                continue
+            node, vu, vw, uw = self._triangles[:, start:end]
+            # u -> v -> w
+            _relax(up, up_middle, uw, down[vu] + up[vw], node)
+            # w -> v -> u
+            _relax(down, down_middle, uw, down[vw] + up[vu], node)
+
+        return Metric(self, up.tolist(), down.tolist(),
+                      up_middle.tolist(), down_middle.tolist())
+
+    def __repr__(self) -> str:
+        name = type(self).__name__
+        return f'{name}(arcs={self.arc_count}, triangles={self.triangle_count})'
+
+
+def _relax(weights: np.ndarray, middle: np.ndarray, arcs: np.ndarray,
+           totals: np.ndarray, nodes: np.ndarray) -> None:
+    """melhora os arcos com os caminhos pelos nós do meio"""
+    previous = weights[arcs]
+    np.minimum.at(weights, arcs, totals)
+    improved = (totals < previous) & (totals == weights[arcs])
+    middle[arcs[improved]] = nodes[improved]
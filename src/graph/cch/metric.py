@@ -0,0 +1,147 @@
+"""
+``metric.py``
+=============
+
+Pesos customizados de uma hierarquia e a busca
+bidirecional subindo por ela
+"""
+
+from __future__ import annotations
+
+from heapq import heappop, heappush
+from typing import TYPE_CHECKING, Optional, Sequence, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    from .hierarchy import Hierarchy
+
+__all__ = ["Metric"]
+
+
+class Metric:
+    """
+    Pesos dos arcos de uma :class:`~graph.cch.hierarchy.Hierarchy`
+    para um vetor de pesos das arestas
+
+    Cada arco tem o peso subindo (do nó mais baixo para o mais alto) e
+    descendo. Um arco que não é aresta do grafo guarda o nó do meio
+    do atalho, usado para desempacotar o caminho, ou ``-1``.
+
+    :param hierarchy: a hierarquia customizada
+    :param up: peso de cada arco subindo
+    :param down: peso de cada arco descendo
+    :param up_middle: nó do meio de cada arco subindo
+    :param down_middle: nó do meio de cada arco descendo
+    """
+    __slots__ = ['_hierarchy', '_up', '_down', '_up_middle', '_down_middle']
+
+    def __init__(self, hierarchy: Hierarchy,
+                 up: Sequence[float], down: Sequence[float],
+                 up_middle: Sequence[int], down_middle: Sequence[int]):
+        self._hierarchy = hierarchy
+        self._up = up
+        self._down = down
+        self._up_middle = up_middle
+        self._down_middle = down_middle
+
+    @property
+    def hierarchy(self) -> Hierarchy:
+        """a hierarquia customizada"""
+        return self._hierarchy
+
+    def upward_search(self, node: int, backward: bool = False
+                      ) -> Tuple[Dict[int, float], Dict[int, int]]:
+        """Dijkstra só pelos arcos subindo a partir do nó
+
+        :param backward: usa os pesos descendo, ou seja, caminhos
+                chegando em ``node``
+        :return: peso até cada nó alcançado e o nó anterior no caminho
+        """
+        hierarchy = self._hierarchy
+        weights = self._down if backward else self._up
+        inf = float('inf')
+
+        dist: Dict[int, float] = {node: 0.0}
+        parent: Dict[int, int] = {}
+        heap: List[Tuple[float, int]] = [(0.0, node)]
+        while heap:
+            weight, node = heappop(heap)
+            if weight > dist[node]:
+                continue
+            for arc in hierarchy.upward(node):
+                total = weight + weights[arc]
+                head = hierarchy.head(arc)
+                if total < dist.get(head, inf):
+                    dist[head] = total
+                    parent[head] = node
+                    heappush(heap, (total, head))
+
+        return dist, parent
+
+    def query(self, source: int, destination: int
+              ) -> Optional[Tuple[float, Tuple[int, ...]]]:
+        """Melhor caminho entre dois nós, recebendo e retornando os
+        mesmos valores de :func:`~graph.dijkstra.csr_dijkstra`
+
+        As duas buscas sobem a hierarquia e o caminho passa pelo nó
+        em comum de menor peso total. Os atalhos são desempacotados
+        nas arestas originais.
+        """
+        # como em dijkstra, a origem não é alcançada por ela mesma
+        if source == destination:
+            return None
+
+        forward, forward_parent = self.upward_search(source)
+        backward, backward_parent = self.upward_search(destination, backward=True)
+
+        inf = float('inf')
+        best, meeting = inf, -1
+        for node, weight in forward.items():
+            total = weight + backward.get(node, inf)
+            if total < best:
+                best, meeting = total, node
+        if meeting < 0:
+            return None
+
+        # nós da hierarquia no caminho, da origem ao destino
+        nodes = [meeting]
+        while nodes[-1] != source:
+            nodes.append(forward_parent[nodes[-1]])
+        nodes.reverse()
+        while nodes[-1] != destination:
+            nodes.append(backward_parent[nodes[-1]])
+
+        path = [source]
+        for from_, to in zip(nodes, nodes[1:]):
+            path.extend(self.unpack(from_, to)[1:])
+        return best, tuple(path)
+
+    def unpack(self, from_: int, to: int) -> List[int]:
+        """Desempacota o arco entre dois nós nas arestas originais
+
+        :return: os nós do caminho, incluindo os extremos
+        """
+        hierarchy = self._hierarchy
+        rank = hierarchy.rank
+
+        path: List[int] = []
+        # pilha com os arcos ainda empacotados, na ordem inversa
+        stack = [(from_, to)]
+        while stack:
+            from_, to = stack.pop()
+            if rank[from_] < rank[to]:
+                middle = self._up_middle[hierarchy.arc(from_, to)]
+            else:
+                middle = self._down_middle[hierarchy.arc(to, from_)]
+
+            if middle < 0:
+                if not path:
+                    path.append(from_)
+                path.append(to)
+            else:
+                stack.append((middle, to))
+                stack.append((from_, middle))
+
+        return path
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self._hierarchy!r})'
@@ -0,0 +1,256 @@
+"""
+``compiled.py``
+===============
+
+Representação compacta (CSR) de um grafo já
+carregado, com nós indexados por inteiros
+"""
+
+from __future__ import annotations
+
+from .graph import Graph
+from protocols import Keyable, Weightable
+
+from array import array
+from typing import (
+    TYPE_CHECKING, TypeVar, Generic, Iterator, Optional,
+    Sequence, Dict, List, Tuple
+)
+
+if TYPE_CHECKING:
+    from .cch import Hierarchy
+
+__all__ = ["CompiledGraph", "topology"]
+
+
+# tipos de chave e peso de aresta
+K = TypeVar('K', bound=Keyable)
+W = TypeVar('W', bound=Weightable)
+
+
+def topology(graph: Graph[K, W]) -> Tuple[List[K], array[int], array[int], List[W]]:
+    """Extrai a topologia de um grafo no formato CSR
+
+    Os nós recebem índices na ordem de inserção no grafo e as
+    arestas de cada nó ficam contíguas, na ordem em que foram
+    criadas.
+
+    :param graph: o grafo
+    :return:    as chaves dos nós, os `offsets` das arestas de
+                cada nó, os nós alvo de cada aresta e os pesos
+                das arestas, na mesma ordem
+    """
+    names = list(graph)
+    index = {key: idx for idx, key in enumerate(names)}
+
+    offsets = array('l', [0])
+    targets = array('l')
+    weights: List[W] = []
+
+    for key in names:
+        for weight, neighbor in graph[key].edges():
+            targets.append(index[neighbor.key])
+            weights.append(weight)
+        offsets.append(len(targets))
+
+    return names, offsets, targets, weights
+
+
+def _same(first: Sequence[int], second: Sequence[int]) -> bool:
+    """se as duas colunas têm os mesmos valores, comparando os `buffers`
+    direto quando possível"""
+    if first is second:
+        return True
+    try:
+        return memoryview(first) == memoryview(second)  # type: ignore
+    except TypeError:
+        return list(first) == list(second)
+
+
+class CompiledGraph(Generic[K]):
+    """
+    Grafo congelado em arranjos contíguos no formato CSR
+    (`compressed sparse row`)
+
+    Os nós são identificados por inteiros de ``0`` a ``len(graph) - 1``
+    e as arestas que saem do nó ``u`` são as de índice no intervalo
+    ``offsets[u]`` até ``offsets[u + 1]``. Os pesos das arestas ficam
+    por conta das subclasses, em colunas indexadas pelas arestas, e as
+    que têm um peso atual (:class:`~protocols.Weighted`) podem ser
+    buscadas pelas chaves dos nós.
+
+    :param names:   chave de cada nó
+    :param offsets: início das arestas de cada nó, com uma posição
+                    extra marcando o final
+    :param targets: nó alvo de cada aresta
+    """
+    __slots__ = ['_names', '_index', '_offsets', '_targets', '_reverse',
+                 '_hierarchy']
+
+    def __init__(self, names: Sequence[K],
+                 offsets: Sequence[int],
+                 targets: Sequence[int]):
+        self._names = names
+        # índice das chaves, montado só na primeira busca por chave
+        self._index: Optional[Dict[K, int]] = None
+        self._offsets = offsets
+        self._targets = targets
+        # índice reverso, montado só quando necessário
+        self._reverse: Optional[Tuple[array[int], array[int], array[int]]] = None
+        # hierarquia de contração, também montada só quando necessário
+        self._hierarchy: Optional[Hierarchy] = None
+
+    @property
+    def names(self) -> Sequence[K]:
+        """chaves dos nós, indexadas pelo identificador"""
+        return self._names
+
+    @property
+    def offsets(self) -> Sequence[int]:
+        """início das arestas de cada nó"""
+        return self._offsets
+
+    @property
+    def targets(self) -> Sequence[int]:
+        """nó alvo de cada aresta"""
+        return self._targets
+
+    @property
+    def edge_count(self) -> int:
+        """quantidade de arestas no grafo"""
+        return len(self._targets)
+
+    def _keys(self) -> Dict[K, int]:
+        """identificador de cada chave, montado na primeira chamada"""
+        if self._index is None:
+            self._index = {key: idx for idx, key in enumerate(self._names)}
+        return self._index
+
+    def id(self, key: K) -> int:
+        """Identificador inteiro do nó de chave ``key``
+
+        :raises KeyError: se o nó não existe
+        """
+        return self._keys()[key]
+
+    def key(self, node: int) -> K:
+        """Chave do nó de identificador ``node``"""
+        return self._names[node]
+
+    def edges(self, node: int) -> range:
+        """Índices das arestas saindo do nó"""
+        return range(self._offsets[node], self._offsets[node + 1])
+
+    def neighbors(self, node: int) -> Iterator[Tuple[int, int]]:
+        """Arestas saindo do nó
+
+        :return:    iterador com o índice da aresta e o nó
+                    alvo de cada aresta
+        """
+        targets = self._targets
+        for edge in self.edges(node):
+            yield edge, targets[edge]
+
+    def reverse(self) -> Tuple[Sequence[int], Sequence[int], Sequence[int]]:
+        """Índice reverso do grafo, também em CSR
+
+        As arestas que chegam no nó ``v`` são as de posição
+        ``offsets[v]`` até ``offsets[v + 1]`` nos outros arranjos.
+
+        :return:    os `offsets` de cada nó, o índice de cada aresta
+                    e o nó de origem dela
+        """
+        if self._reverse is None:
+            nodes = len(self)
+            # contagem das arestas chegando em cada nó
+            offsets = array('l', bytes(array('l').itemsize * (nodes + 1)))
+            for target in self._targets:
+                offsets[target + 1] += 1
+            for node in range(nodes):
+                offsets[node + 1] += offsets[node]
+
+            position = array('l', offsets)
+            edges = array('l', bytes(array('l').itemsize * self.edge_count))
+            sources = array('l', edges)
+            for source in range(nodes):
+                for edge in self.edges(source):
+                    target = self._targets[edge]
+                    edges[position[target]] = edge
+                    sources[position[target]] = source
+                    position[target] += 1
+
+            self._reverse = offsets, edges, sources
+
+        return self._reverse
+
+    def hierarchy(self) -> Hierarchy:
+        """Hierarquia de contração customizável do grafo
+        (:class:`~graph.cch.Hierarchy`)
+
+        Depende só da topologia, então é construída na primeira
+        chamada e reaproveitada para qualquer vetor de pesos.
+        """
+        if self._hierarchy is None:
+            from .cch import Hierarchy
+            self._hierarchy = Hierarchy(self)
+        return self._hierarchy
+
+    def adopt(self, other: CompiledGraph[K]) -> bool:
+        """Reaproveita o pré-processamento de ``other`` que só depende
+        da topologia (:meth:`reverse`, :meth:`hierarchy` e o índice das
+        chaves), se os dois
+        grafos tiverem os mesmos nós e arestas
+
+        Serve para as versões de um mesmo mapa que só mudam os pesos,
+        como as de :func:`parser.observe`.
+
+        :return: se a topologia é a mesma
+        """
+        if other is not self and not (
+            self._names == other._names
+            and _same(self._offsets, other._offsets)
+            and _same(self._targets, other._targets)
+        ):
+            return False
+
+        if self._index is None:
+            self._index = other._index
+        if self._reverse is None:
+            self._reverse = other._reverse
+        if self._hierarchy is None:
+            self._hierarchy = other._hierarchy
+        return True
+
+    def predecessors(self, node: int) -> Iterator[Tuple[int, int]]:
+        """Arestas chegando no nó
+
+        :return:    iterador com o índice da aresta e o nó
+                    de origem de cada aresta
+        """
+        offsets, edges, sources = self.reverse()
+        for pos in range(offsets[node], offsets[node + 1]):
+            yield edges[pos], sources[pos]
+
+    def edge_id(self, from_: K, to: K) -> Optional[int]:
+        """Índice da aresta de um nó para o outro, se ela existir
+
+        :param from\_: nó de origem da aresta
+        :param to:  nó alvo da aresta
+        :raises KeyError: se algum dos nós não existe
+        """
+        index = self._keys()
+        target = index[to]
+        for edge, neighbor in self.neighbors(index[from_]):
+            if neighbor == target:
+                return edge
+        return None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys()
+
+    def __repr__(self) -> str:
+        name = type(self).__name__
+        return f'{name}(nodes={len(self)}, edges={self.edge_count})'
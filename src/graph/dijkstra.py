@@ -9,41 +9,87 @@ para encontrar um caminho ótimo
 from __future__ import annotations
 
 from . import Graph, Node
-from protocols import Keyable, Weightable
+from protocols import Keyable, Weightable, FloatWeightable, KeyHeap, Searchable, Weighted
 from heap import MinHeap
+import instrument
 
+from heapq import heappop, heappush
 from typing import (
     TypeVar, Optional, Dict, Set,
-    Mapping, Tuple, List
+    Mapping, Sequence, Tuple, List,
+    Union, SupportsFloat, Any, Callable,
+    cast, overload
 )
 
-__all__ = ["dijkstra"]
+__all__ = ["dijkstra", "float_dijkstra", "csr_dijkstra", "csr_distances", "csr_tree"]
 
 
 # tipos genéricos de chave e pesos
 K = TypeVar('K', bound=Keyable)
 W = TypeVar('W', bound=Weightable)
+F = TypeVar('F', bound=FloatWeightable)
 
 # tipos genéricos agregados, para facilitar
 # as anotações de tipo
 PathHeap = MinHeap[Tuple[W, Node[K, W]]]
 ParentDict = Dict[Node[K, W], Node[K, W]]
 WeightPath = Tuple[W, Tuple[Node[K, W], ...]]
+# caminho com o peso total reduzido a float
+NodePath = Tuple[float, Tuple[Node[K, W], ...]]
+# caminho no grafo compilado, com o peso total
+FloatPath = Tuple[float, Tuple[K, ...]]
+# construtor de filas de prioridade com decrease-key
+HeapFactory = Callable[[], KeyHeap[int, float]]
 
 
-def dijkstra(graph: Graph[K, W], source: K, destination: K) -> Optional[WeightPath[W, K]]:
+@overload
+def dijkstra(graph: Weighted[K], source: K, destination: K, *,
+             heap: Optional[HeapFactory] = None) -> Optional[FloatPath[K]]: ...
+@overload
+def dijkstra(graph: Graph[K, W], source: K, destination: K, *,
+             heap: Optional[HeapFactory] = None) -> Optional[Union[WeightPath[W, K], NodePath[K, W]]]: ...
+
+def dijkstra(graph: Union[Graph[K, W], Weighted[K]],
+             source: K, destination: K, *,
+             heap: Optional[HeapFactory] = None
+             ) -> Optional[Union[WeightPath[W, K], NodePath[K, W], FloatPath[K]]]:
     """Encontra o caminho ótimo entre dois nós
 
+    Em um grafo compilado com pesos (:class:`~protocols.Weighted`),
+    os pesos são os de :meth:`~protocols.Weighted.weights` e o caminho
+    é retornado com as chaves dos nós. Quando os pesos podem ser
+    convertidos para :class:`float`, como :class:`~street.Street`,
+    a busca é feita com :func:`float_dijkstra` e o peso total
+    retornado é um :class:`float`.
+
     :param graph: o grafo
     :param source: nó inicial do caminho
     :param destination: nó final
+    :param heap: fila de prioridade com `decrease-key` usada no
+            grafo compilado, veja :func:`csr_dijkstra`
     :return: o melhor caminho entre os nós e o peso total
             do caminho ou :obj:`None`, se não for possível
             encontrar um caminho
     """
+    if not isinstance(graph, Graph):
+        if source not in graph or destination not in graph:
+            return None
+
+        path = csr_dijkstra(graph, graph.weights(),
+                            graph.id(source), graph.id(destination),
+                            heap=heap)
+        if not path:
+            return None
+        total, nodes = path
+        return total, tuple(map(graph.key, nodes))
 
     source_node = graph[source]
 
+    # pesos redutíveis a float usam o caminho rápido
+    first_weight = next(iter(source_node.values()), None)
+    if isinstance(first_weight, SupportsFloat):
+        return float_dijkstra(cast(Graph[K, Any], graph), source, destination)
+
     # o heap com o nó e peso total até lá
     paths = PathHeap[W, K]()
     # conjunto de nós visitados
@@ -91,6 +137,292 @@ def dijkstra(graph: Graph[K, W], source: K, destination: K) -> Optional[WeightPa
     return None
 
 
+def float_dijkstra(graph: Graph[K, F], source: K, destination: K) -> Optional[NodePath[K, F]]:
+    """Dijkstra com os pesos convertidos para :class:`float`
+
+    Os pesos das arestas são lidos uma única vez, com :func:`float`,
+    e o heap guarda só pares ``(float, int)``, sem criar novos pesos
+    nem comparar nós. Pesos infinitos representam arestas inacessíveis.
+
+    :param graph: o grafo
+    :param source: nó inicial do caminho
+    :param destination: nó final
+    :return: o peso total e o melhor caminho entre os nós ou
+            :obj:`None`, se não for possível encontrar um caminho
+    """
+    source_node = graph[source]
+    inf = float('inf')
+
+    # os nós são identificados pelo id no heap e nos mapeamentos
+    nodes: Dict[int, Node[K, F]] = {id(source_node): source_node}
+    # o heap com o peso total e o nó
+    paths: List[Tuple[float, int]] = []
+    # conjunto de nós visitados
+    visited: Set[int] = {id(source_node)}
+    # mapeamento de nós-pais no caminho
+    parent: Dict[int, int] = {}
+    # peso total até o nó
+    weights: Dict[int, float] = {}
+
+    counters = instrument.active()
+    push, pop, popped = _queue(counters)
+    node, weight = source_node, 0.0
+    try:
+        while True:
+            # relaxa a vizinhança do nó
+            for neighbor, edge_weight in node.items():
+                key = id(neighbor)
+                if key in visited:
+                    continue
+
+                total = weight + float(edge_weight)
+                if total < weights.get(key, inf):
+                    weights[key] = total
+                    parent[key] = id(node)
+                    nodes[key] = neighbor
+                    push(paths, (total, key))
+
+            # puxa o próximo nó ainda não visitado
+            while paths:
+                weight, key = pop(paths)
+                if key not in visited:
+                    break
+            else:
+                # não tem caminho até o nó
+                return None
+
+            node = nodes[key]
+            visited.add(key)
+            if node.key == destination:
+                path = hiearachy_path(parent, key)
+                return weight, tuple(nodes[key] for key in path)
+    finally:
+        if counters is not None:
+            _record(counters, popped, visited, lambda key: len(nodes[key]),
+                    id(node) if node.key == destination else None)
+
+
+# operações na fila de prioridade de :mod:`heapq`
+Push = Callable[[List[Tuple[float, int]], Tuple[float, int]], None]
+Pop = Callable[[List[Tuple[float, int]]], Tuple[float, int]]
+
+
+def _queue(counters: Optional[instrument.Counters]) -> Tuple[Push, Pop, int]:
+    """operações da fila, contadas se a instrumentação estiver ligada,
+    e a contagem de retiradas antes da busca"""
+    if counters is None:
+        return heappush, heappop, 0
+    return (counters.counting('dijkstra.push', heappush),
+            counters.counting('dijkstra.pop', heappop),
+            counters.counts['dijkstra.pop'])
+
+
+def _record(counters: instrument.Counters, popped: int, visited: Set[int],
+            degree: Callable[[int], int], destination: Optional[int]) -> None:
+    """Contadores de uma busca, calculados depois dela
+
+    Os nós visitados são a origem e os retirados da fila pela primeira
+    vez. Os outros itens retirados são entradas desatualizadas. As
+    relaxações são as arestas lidas a partir dos nós expandidos, que
+    são todos os visitados, menos o destino.
+    """
+    expanded = visited - {destination} if destination in visited else visited
+    counters.add('dijkstra.calls')
+    counters.add('dijkstra.settled', len(visited))
+    pops = counters.counts['dijkstra.pop'] - popped
+    counters.add('dijkstra.stale', pops - (len(visited) - 1))
+    counters.add('dijkstra.relaxations', sum(map(degree, expanded)))
+
+
+def csr_dijkstra(graph: Searchable, weights: Sequence[float],
+                 source: int, destination: int, *,
+                 heap: Optional[HeapFactory] = None
+                 ) -> Optional[FloatPath[int]]:
+    """Dijkstra sobre o grafo compilado, com pesos em :class:`float`
+
+    Pesos infinitos representam arestas inacessíveis. Sem ``heap``,
+    a busca usa :mod:`heapq` com entradas duplicadas no lugar do
+    `decrease-key`. Com ``heap``, como :class:`~heap.IndexedHeap` ou
+    :class:`~heap.PairingHeap`, cada nó aparece no máximo uma vez
+    na fila, mas a busca fica mais lenta, porque essas filas são
+    escritas em Python puro.
+
+    :param graph: o grafo compilado
+    :param weights: peso de cada aresta, indexado pela aresta
+    :param source: identificador do nó inicial
+    :param destination: identificador do nó final
+    :param heap: construtor da fila de prioridade
+    :return: o peso total e os identificadores dos nós no
+            melhor caminho ou :obj:`None`, se não existir
+    """
+    if heap is not None:
+        return _keyed_dijkstra(graph, weights, source, destination, heap())
+
+    offsets, targets = graph.offsets, graph.targets
+    inf = float('inf')
+
+    # o heap com o peso total e o nó
+    paths: List[Tuple[float, int]] = []
+    # conjunto de nós visitados
+    visited: Set[int] = {source}
+    # mapeamento de nós-pais no caminho
+    parent: Dict[int, int] = {}
+    # peso total até o nó
+    weights_to: Dict[int, float] = {}
+
+    counters = instrument.active()
+    push, pop, popped = _queue(counters)
+    node, weight = source, 0.0
+    try:
+        while True:
+            # relaxa a vizinhança do nó
+            for edge in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[edge]
+                if neighbor in visited:
+                    continue
+
+                total = weight + weights[edge]
+                if total < weights_to.get(neighbor, inf):
+                    weights_to[neighbor] = total
+                    parent[neighbor] = node
+                    push(paths, (total, neighbor))
+
+            # puxa o próximo nó ainda não visitado
+            while paths:
+                weight, node = pop(paths)
+                if node not in visited:
+                    break
+            else:
+                # não tem caminho até o nó
+                return None
+
+            visited.add(node)
+            if node == destination:
+                return weight, hiearachy_path(parent, node)
+    finally:
+        if counters is not None:
+            _record(counters, popped, visited, lambda node: offsets[node + 1] - offsets[node],
+                    destination)
+
+
+def csr_distances(graph: Searchable, weights: Sequence[float],
+                  source: int, *, reverse: bool = False
+                  ) -> List[float]:
+    """Peso do melhor caminho da origem até cada nó do grafo
+
+    :param graph: o grafo compilado
+    :param weights: peso de cada aresta, indexado pela aresta
+    :param source: identificador do nó inicial
+    :param reverse: se a busca deve seguir as arestas ao contrário,
+            calculando o peso de cada nó até ``source``
+    :return: o peso até cada nó, infinito para os inalcançáveis
+    """
+    if reverse:
+        offsets, edges, targets = graph.reverse()
+    else:
+        offsets, targets = graph.offsets, graph.targets
+        edges = range(graph.edge_count)
+
+    inf = float('inf')
+    dist = [inf] * len(graph)
+    dist[source] = 0.0
+
+    paths = [(0.0, source)]
+    while paths:
+        weight, node = heappop(paths)
+        # entrada desatualizada
+        if weight > dist[node]:
+            continue
+
+        for pos in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[pos]
+            total = weight + weights[edges[pos]]
+            if total < dist[neighbor]:
+                dist[neighbor] = total
+                heappush(paths, (total, neighbor))
+
+    return dist
+
+
+def csr_tree(graph: Searchable, weights: Sequence[float], source: int
+             ) -> Tuple[List[float], Dict[int, int]]:
+    """Árvore de melhores caminhos da origem até todos os nós
+
+    O caminho até um nó ``v`` alcançável sai de
+    ``hiearachy_path(parent, v)``, com os mesmos valores de
+    :func:`csr_dijkstra` para cada destino.
+
+    :param graph: o grafo compilado
+    :param weights: peso de cada aresta, indexado pela aresta
+    :param source: identificador do nó inicial
+    :return: o peso até cada nó, infinito para os inalcançáveis, e
+            o pai de cada nó alcançado na árvore
+    """
+    offsets, targets = graph.offsets, graph.targets
+    inf = float('inf')
+    dist = [inf] * len(graph)
+    dist[source] = 0.0
+    # mapeamento de nós-pais no caminho
+    parent: Dict[int, int] = {}
+
+    paths = [(0.0, source)]
+    while paths:
+        weight, node = heappop(paths)
+        # entrada desatualizada
+        if weight > dist[node]:
+            continue
+
+        for edge in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[edge]
+            total = weight + weights[edge]
+            if total < dist[neighbor]:
+                dist[neighbor] = total
+                parent[neighbor] = node
+                heappush(paths, (total, neighbor))
+
+    return dist, parent
+
+
+def _keyed_dijkstra(graph: Searchable, weights: Sequence[float],
+                    source: int, destination: int,
+                    queue: KeyHeap[int, float]
+                    ) -> Optional[FloatPath[int]]:
+    """:func:`csr_dijkstra` com uma fila de prioridade com `decrease-key`"""
+    offsets, targets = graph.offsets, graph.targets
+    inf = float('inf')
+
+    # conjunto de nós visitados
+    visited: Set[int] = {source}
+    # mapeamento de nós-pais no caminho
+    parent: Dict[int, int] = {}
+
+    node, weight = source, 0.0
+    while True:
+        # relaxa a vizinhança do nó
+        for edge in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[edge]
+            if neighbor in visited:
+                continue
+
+            total = weight + weights[edge]
+            if neighbor in queue:
+                if total < queue.priority(neighbor):
+                    queue.decrease_key(neighbor, total)
+                    parent[neighbor] = node
+            elif total < inf:
+                queue.push(neighbor, total)
+                parent[neighbor] = node
+
+        if not queue:
+            # não tem caminho até o nó
+            return None
+        weight, node = queue.pop()
+
+        if node == destination:
+            return weight, hiearachy_path(parent, node)
+        visited.add(node)
+
+
 def hiearachy_path(mapping: Mapping[K, K], start: K) -> Tuple[K, ...]:
     """monta o caminho por mapeamento hieráquico a partir de uma chave"""
 
@@ -0,0 +1,195 @@
+"""
+``dynamic.py``
+==============
+
+Árvore de caminhos mínimos mantida entre mudanças de peso
+das arestas, no estilo de Ramalingam e Reps
+"""
+
+from __future__ import annotations
+
+from . import CompiledGraph
+from protocols import Keyable
+
+from array import array
+from heapq import heappop, heappush
+from typing import TypeVar, Generic, Optional, Iterable, Sequence, List, Set, Tuple
+
+__all__ = ["DynamicSSSP"]
+
+
+# tipo de chave dos nós
+K = TypeVar('K', bound=Keyable)
+
+
+class DynamicSSSP(Generic[K]):
+    """
+    Caminhos mínimos de uma origem para todos os nós, reparados só
+    onde os pesos mudaram
+
+    Quando o peso de uma aresta da árvore aumenta, a subárvore abaixo
+    dela perde as distâncias e é refeita a partir dos vizinhos que não
+    foram afetados. Quando um peso diminui e melhora o nó alvo, a busca
+    continua dele. O custo de cada atualização depende da parte da
+    árvore que muda, não do grafo todo.
+
+    :param graph: o grafo compilado
+    :param weights: peso inicial de cada aresta
+    :param source: a origem
+    :param variable: arestas que podem mudar de peso entre as
+            atualizações, para :meth:`reweight` (todas, por padrão)
+    """
+    __slots__ = ['_graph', '_source', '_weights', '_variable',
+                 '_sources', '_dist', '_parent', '_children']
+
+    def __init__(self, graph: CompiledGraph[K], weights: Sequence[float], source: int,
+                 variable: Optional[Sequence[int]] = None):
+        self._graph = graph
+        self._source = source
+        self._weights = list(weights)
+        self._variable = range(len(self._weights)) if variable is None else variable
+
+        # nó de origem de cada aresta
+        self._sources = array('l', bytes(array('l').itemsize * graph.edge_count))
+        for node in range(len(graph)):
+            for edge in graph.edges(node):
+                self._sources[edge] = node
+
+        inf = float('inf')
+        nodes = len(graph)
+        self._dist = [inf] * nodes
+        # aresta da árvore chegando em cada nó
+        self._parent = [-1] * nodes
+        self._children: List[Set[int]] = [set() for _ in range(nodes)]
+
+        self._dist[source] = 0.0
+        self._propagate([(0.0, source)])
+
+    @property
+    def graph(self) -> CompiledGraph[K]:
+        """o grafo compilado"""
+        return self._graph
+
+    @property
+    def source(self) -> int:
+        """a origem"""
+        return self._source
+
+    @property
+    def distances(self) -> Sequence[float]:
+        """distância atual da origem até cada nó"""
+        return self._dist
+
+    def _link(self, node: int, edge: int, source: int) -> None:
+        """troca o pai do nó na árvore"""
+        self._unlink(node)
+        self._parent[node] = edge
+        self._children[source].add(node)
+
+    def _unlink(self, node: int) -> None:
+        """tira o nó da árvore"""
+        old = self._parent[node]
+        if old >= 0:
+            self._children[self._sources[old]].discard(node)
+        self._parent[node] = -1
+
+    def _propagate(self, heap: List[Tuple[float, int]]) -> None:
+        """Dijkstra a partir dos nós no heap, melhorando as distâncias"""
+        graph, weights, dist = self._graph, self._weights, self._dist
+        offsets, targets = graph.offsets, graph.targets
+
+        while heap:
+            weight, node = heappop(heap)
+            if weight > dist[node]:
+                continue
+            for edge in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[edge]
+                total = weight + weights[edge]
+                if total < dist[neighbor]:
+                    dist[neighbor] = total
+                    self._link(neighbor, edge, node)
+                    heappush(heap, (total, neighbor))
+
+    def update(self, changes: Iterable[Tuple[int, float]]) -> None:
+        """Aplica novos pesos em algumas arestas e repara a árvore
+
+        :param changes: pares de aresta e novo peso
+        """
+        graph, weights, dist, parent = self._graph, self._weights, self._dist, self._parent
+        targets = graph.targets
+        inf = float('inf')
+
+        decreased: List[int] = []
+        affected: Set[int] = set()
+        for edge, weight in changes:
+            old = weights[edge]
+            if weight == old:
+                continue
+            weights[edge] = weight
+            target = targets[edge]
+            if weight > old:
+                # só importa se a aresta está na árvore
+                if parent[target] == edge:
+                    affected.add(target)
+            else:
+                decreased.append(edge)
+
+        # a subárvore dos nós afetados perde as distâncias
+        stack = list(affected)
+        while stack:
+            node = stack.pop()
+            for child in self._children[node]:
+                if child not in affected:
+                    affected.add(child)
+                    stack.append(child)
+        for node in affected:
+            dist[node] = inf
+
+        heap: List[Tuple[float, int]] = []
+        # os afetados recomeçam pelos vizinhos que não foram afetados
+        for node in affected:
+            best, best_edge, best_source = inf, -1, -1
+            for edge, source in graph.predecessors(node):
+                total = dist[source] + weights[edge]
+                if total < best:
+                    best, best_edge, best_source = total, edge, source
+            if best_edge >= 0:
+                dist[node] = best
+                self._link(node, best_edge, best_source)
+                heappush(heap, (best, node))
+            else:
+                self._unlink(node)
+
+        # as arestas mais leves podem melhorar o alvo
+        for edge in decreased:
+            source = self._sources[edge]
+            target = targets[edge]
+            total = dist[source] + weights[edge]
+            if total < dist[target]:
+                dist[target] = total
+                self._link(target, edge, source)
+                heappush(heap, (total, target))
+
+        self._propagate(heap)
+
+    def reweight(self, weights: Sequence[float]) -> None:
+        """Atualiza para um novo vetor de pesos, comparando só as
+        arestas variáveis"""
+        current = self._weights
+        self.update([(edge, weights[edge]) for edge in self._variable
+                     if weights[edge] != current[edge]])
+
+    def path(self, destination: int) -> Optional[Tuple[float, Tuple[int, ...]]]:
+        """Melhor caminho da origem até ``destination`` na árvore atual,
+        com os mesmos valores de :func:`~graph.dijkstra.csr_dijkstra`"""
+        # como em dijkstra, a origem não é alcançada por ela mesma
+        if destination == self._source or self._dist[destination] == float('inf'):
+            return None
+
+        nodes = [destination]
+        while nodes[-1] != self._source:
+            nodes.append(self._sources[self._parent[nodes[-1]]])
+        return self._dist[destination], tuple(reversed(nodes))
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(source={self._source})'
@@ -58,6 +58,8 @@ class Graph(Mapping[K, Node[K, W]]):
 
     def __init__(self) -> None:
         self.__nodes: Dict[K, Node[K, W]] = {}
+        # índice reverso: arestas que chegam em cada nó
+        self.__reverse: Dict[K, Dict[Node[K, W], W]] = {}
 
     def __make_node(self, key: K) -> Node[K, W]:
         """Cria o nó se não existe e retorna ele"""
@@ -80,6 +82,7 @@ class Graph(Mapping[K, Node[K, W]]):
         to_node = self.__make_node(to)
 
         from_node[to_node] = weight
+        self.__reverse.setdefault(to, {})[from_node] = weight
 
     def get_weight(self, from_: K, to: K) -> Optional[W]:
         """Recupera o peso da aresta de um nó para o outro,
@@ -91,6 +94,16 @@ class Graph(Mapping[K, Node[K, W]]):
         """
         return self[from_].get(self[to])
 
+    def predecessors(self, key: K) -> Iterator[Tuple[W, Node[K, W]]]:
+        """Arestas chegando no nó
+
+        :param key: nó alvo das arestas
+        :return:    iterador com o peso e o nó de origem de
+                    cada aresta
+        """
+        for neighbor, weight in self.__reverse.get(key, {}).items():
+            yield weight, neighbor
+
     # abaixo são algums métodos de um Mapping
     def __len__(self) -> int:
         return len(self.__nodes)
@@ -0,0 +1,157 @@
+"""
+``matrix.py``
+=============
+
+Matrizes de peso entre vários nós de origem e de destino,
+com a média (e os percentis) sobre várias amostras de pesos
+"""
+
+from __future__ import annotations
+
+from . import CompiledGraph
+from .dijkstra import csr_distances
+from .cch import Hierarchy, Metric
+from protocols import Keyable
+
+import numpy as np
+from typing import TypeVar, Optional, Iterable, Sequence, Dict, List, Tuple
+
+__all__ = ["tree_matrix", "bucket_matrix", "distance_matrix", "travel_times"]
+
+
+# tipo de chave dos nós
+K = TypeVar('K', bound=Keyable)
+
+
+def tree_matrix(graph: CompiledGraph[K], weights: Sequence[float],
+                origins: Sequence[int], destinations: Sequence[int]
+                ) -> np.ndarray:
+    """Matriz de pesos com uma busca de cada origem para todos os nós
+
+    :param graph: o grafo compilado
+    :param weights: peso de cada aresta
+    :param origins: nós de origem, as linhas
+    :param destinations: nós de destino, as colunas
+    :return: matriz ``origens x destinos`` com o peso do melhor
+            caminho, infinito sem caminho e zero da origem até ela
+            mesma
+    """
+    columns = np.asarray(destinations, dtype=np.intp)
+    matrix = np.empty((len(origins), len(columns)))
+    for row, origin in enumerate(origins):
+        matrix[row] = np.asarray(csr_distances(graph, weights, origin))[columns]
+    return matrix
+
+
+def bucket_matrix(metric: Metric, origins: Sequence[int], destinations: Sequence[int]
+                  ) -> np.ndarray:
+    """Matriz de pesos pelos baldes na hierarquia de contração
+
+    Cada destino sobe a hierarquia pelos arcos descendo e deixa, em
+    cada nó alcançado, o peso até ele. Depois, cada origem sobe a
+    hierarquia e combina os pesos com os baldes dos nós alcançados.
+    São só ``origens + destinos`` buscas pequenas, em vez de uma busca
+    no grafo todo por origem.
+
+    :param metric: a hierarquia customizada com os pesos
+    :param origins: nós de origem, as linhas
+    :param destinations: nós de destino, as colunas
+    :return: a mesma matriz de :func:`tree_matrix`
+    """
+    inf = float('inf')
+
+    # peso de cada nó até os destinos que alcançam ele
+    buckets: Dict[int, List[Tuple[int, float]]] = {}
+    for column, destination in enumerate(destinations):
+        backward, _ = metric.upward_search(destination, backward=True)
+        for node, weight in backward.items():
+            buckets.setdefault(node, []).append((column, float(weight)))
+
+    matrix = np.empty((len(origins), len(destinations)))
+    for row, origin in enumerate(origins):
+        best = [inf] * len(destinations)
+        forward, _ = metric.upward_search(origin)
+        for node, weight in forward.items():
+            for column, remaining in buckets.get(node, ()):
+                total = weight + remaining
+                if total < best[column]:
+                    best[column] = total
+        matrix[row] = best
+
+    return matrix
+
+
+def distance_matrix(graph: CompiledGraph[K], weights: Sequence[float],
+                    origins: Sequence[int], destinations: Sequence[int], *,
+                    hierarchy: Optional[Hierarchy] = None
+                    ) -> np.ndarray:
+    """Matriz de pesos para um vetor de pesos das arestas
+
+    Com ``hierarchy``, usa :func:`bucket_matrix` com a hierarquia
+    customizada para os pesos. Sem ela, usa :func:`tree_matrix`.
+    """
+    if hierarchy is not None:
+        return bucket_matrix(hierarchy.customize(weights), origins, destinations)
+    return tree_matrix(graph, weights, origins, destinations)
+
+
+def _inverted_cdf(matrices: np.ndarray, percentiles: Sequence[float]) -> np.ndarray:
+    """percentis da distribuição empírica ao longo do primeiro eixo, como
+    ``np.percentile(..., method='inverted_cdf')``, que não existe antes do
+    NumPy 1.22: o menor valor com pelo menos ``p%`` das amostras até ele"""
+    wanted = np.asarray(percentiles, dtype=np.float64)
+    if np.any((wanted < 0) | (wanted > 100)):
+        raise ValueError("percentiles must be between 0 and 100")
+    runs = len(matrices)
+    ranks = np.maximum(np.ceil(wanted * runs / 100).astype(np.intp) - 1, 0)
+    return np.sort(matrices, axis=0)[ranks]
+
+
+def travel_times(graph: CompiledGraph[K], samples: Iterable[Sequence[float]],
+                 origins: Sequence[int], destinations: Sequence[int], *,
+                 percentiles: Sequence[float] = (),
+                 hierarchy: Optional[Hierarchy] = None
+                 ) -> Tuple[np.ndarray, np.ndarray]:
+    """Média e percentis da matriz de pesos sobre várias amostras
+
+    As amostras podem ser as linhas de :func:`sampling.sample_times`.
+    Um par sem caminho em alguma amostra fica com média infinita.
+    Os percentis são da distribuição empírica das amostras, sem
+    interpolação, então também podem ser infinitos.
+
+    :param graph: o grafo compilado
+    :param samples: vetores de pesos das arestas, um por amostra
+    :param origins: nós de origem, as linhas
+    :param destinations: nós de destino, as colunas
+    :param percentiles: percentis desejados, entre ``0`` e ``100``
+    :param hierarchy: hierarquia de contração do grafo, para
+            :func:`bucket_matrix` (veja :func:`distance_matrix`)
+    :return: matriz ``origens x destinos`` das médias e matriz
+            ``percentis x origens x destinos`` dos percentis
+    :raises ValueError: sem amostras ou com percentis fora do intervalo
+    """
+    total = np.zeros((len(origins), len(destinations)))
+    matrices: List[np.ndarray] = []
+    runs = 0
+
+    for weights in samples:
+        if isinstance(weights, np.ndarray) and hierarchy is None:
+            # listas são mais rápidas para as buscas em Python
+            weights = weights.tolist()
+        matrix = distance_matrix(graph, weights, origins, destinations,
+                                 hierarchy=hierarchy)
+        total += matrix
+        runs += 1
+        # só guarda as matrizes se precisar dos percentis
+        if len(percentiles):
+            matrices.append(matrix)
+
+    if not runs:
+        raise ValueError("no samples given")
+
+    if len(percentiles):
+        quantiles = _inverted_cdf(np.stack(matrices), percentiles)
+    else:
+        quantiles = np.empty((0, len(origins), len(destinations)))
+
+    return total / runs, quantiles
@@ -0,0 +1,115 @@
+"""
+``yen.py``
+==========
+
+Os ``k`` melhores caminhos sem ciclos entre dois nós,
+pelo algoritmo de Yen
+"""
+
+from __future__ import annotations
+
+from . import CompiledGraph
+from .dijkstra import csr_dijkstra
+from protocols import Keyable
+
+from heapq import heappop, heappush
+from typing import TypeVar, Optional, Sequence, List, Set, Tuple
+
+__all__ = ["csr_yen", "path_edges"]
+
+
+# tipo de chave dos nós
+K = TypeVar('K', bound=Keyable)
+
+# caminho com o peso total
+WeightedPath = Tuple[float, Tuple[int, ...]]
+
+
+def _edge(graph: CompiledGraph[K], weights: Sequence[float],
+          from_: int, to: int) -> Optional[int]:
+    """aresta de menor peso de um nó para o outro"""
+    targets = graph.targets
+    edges = [edge for edge in graph.edges(from_) if targets[edge] == to]
+    return min(edges, key=weights.__getitem__, default=None)
+
+
+def path_edges(graph: CompiledGraph[K], weights: Sequence[float],
+               path: Sequence[int]) -> List[int]:
+    """Arestas de um caminho, escolhendo a de menor peso
+    entre arestas paralelas
+
+    :param path: os nós do caminho
+    :raises KeyError: se alguma aresta não existe
+    """
+    edges: List[int] = []
+    for from_, to in zip(path, path[1:]):
+        edge = _edge(graph, weights, from_, to)
+        if edge is None:
+            raise KeyError((from_, to))
+        edges.append(edge)
+    return edges
+
+
+def csr_yen(graph: CompiledGraph[K], weights: Sequence[float],
+            source: int, destination: int, k: int
+            ) -> List[WeightedPath]:
+    """Os ``k`` caminhos sem ciclos de menor peso, em ordem crescente
+
+    Cada novo caminho sai de um desvio de um caminho anterior: a partir
+    de cada nó dele, a busca de :func:`~graph.dijkstra.csr_dijkstra` é
+    refeita sem as arestas já usadas com o mesmo prefixo e sem os nós
+    do prefixo. Arestas de peso infinito não entram em nenhum caminho.
+
+    :param graph: o grafo compilado
+    :param weights: peso de cada aresta
+    :param source: nó inicial
+    :param destination: nó final
+    :param k: quantidade máxima de caminhos
+    :return: o peso e os nós de cada caminho, menos de ``k`` se não
+            houver mais caminhos
+    """
+    first = csr_dijkstra(graph, weights, source, destination)
+    if not first or k <= 0:
+        return []
+
+    inf = float('inf')
+    paths: List[WeightedPath] = [first]
+    # os candidatos ainda não escolhidos, sem repetição
+    heap: List[WeightedPath] = []
+    seen: Set[Tuple[int, ...]] = {first[1]}
+
+    while len(paths) < k:
+        _, last = paths[-1]
+        root_weight = 0.0
+        for pos in range(len(last) - 1):
+            spur = last[pos]
+            root = last[:pos + 1]
+
+            blocked = list(weights)
+            # desvios já conhecidos com o mesmo prefixo
+            for _, path in paths:
+                if path[:pos + 1] == root:
+                    for edge in graph.edges(spur):
+                        if graph.targets[edge] == path[pos + 1]:
+                            blocked[edge] = inf
+            # o caminho não pode voltar ao prefixo
+            for node in root[:-1]:
+                for edge in graph.edges(node):
+                    blocked[edge] = inf
+
+            found = csr_dijkstra(graph, blocked, spur, destination)
+            if found:
+                weight, spur_path = found
+                path = root[:-1] + spur_path
+                if path not in seen:
+                    seen.add(path)
+                    heappush(heap, (root_weight + weight, path))
+
+            root_edge = _edge(graph, weights, spur, last[pos + 1])
+            root_weight += weights[root_edge] if root_edge is not None else inf
+
+        if not heap:
+            break
+        paths.append(heappop(heap))
+
+    return paths
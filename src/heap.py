@@ -3,18 +3,32 @@
 ===========
 
 Implementação de um `heap` de mínimo
-com a biblioteca :mod:`heapq` de Python
+com a biblioteca :mod:`heapq` de Python e de
+filas de prioridade com ``decrease_key``
+(:class:`~protocols.KeyHeap`)
+
+As filas com ``decrease_key`` são escritas em Python puro e, no
+microbenchmark de :mod:`benchmark.heap`, ficam de 3 a 10 vezes mais
+lentas que o :mod:`heapq` com entradas duplicadas. Por isso
+:func:`graph.dijkstra.csr_dijkstra` só usa elas quando pedido.
 """
 
 from __future__ import annotations
 
-from protocols import Orderable
+from protocols import Orderable, Keyable, KeyHeap
 from heapq import heapify, heappop, heappush
-from typing import TypeVar, List, Iterator, Collection
+from typing import (
+    TypeVar, Generic, List, Dict, Tuple,
+    Optional, Iterator, Collection
+)
+
+__all__ = ["MinHeap", "IndexedHeap", "PairingHeap"]
 
 
 # qualquer tipo que seja ordenável
 Ord = TypeVar('Ord', bound=Orderable)
+# itens das filas de prioridade
+T = TypeVar('T', bound=Keyable)
 
 
 class MinHeap(Collection[Ord]):
@@ -48,14 +62,283 @@ class MinHeap(Collection[Ord]):
 
     def __iter__(self) -> Iterator[Ord]:
         """Itera o elementos do heap em ordem crescente"""
-        # ordenar a lista mantém a invariante do heap
-        self._list.sort()
-        return iter(self._list)
+        return iter(sorted(self._list))
 
     def __contains__(self, item: object) -> bool:
+        """Busca linear pelo item, veja :class:`IndexedHeap` para
+        buscas em tempo constante"""
         return item in self._list
 
     def __repr__(self) -> str:
         class_name = self.__class__.__name__
         items = ', '.join(map(repr, self))
         return f"{class_name}([{items}])"
+
+
+def _repr(heap: KeyHeap[T, Ord]) -> str:
+    """representação das filas com os itens e as prioridades"""
+    class_name = heap.__class__.__name__
+    items = ', '.join(f'{item!r}: {heap.priority(item)!r}' for item in heap)
+    return f"{class_name}({{{items}}})"
+
+
+class IndexedHeap(Collection[T], Generic[T, Ord]):
+    """
+    Heap `d`-ário com a posição de cada item, permitindo
+    :func:`~heap.IndexedHeap.decrease_key` em ``O(log n)`` e
+    ``in`` em tempo constante
+
+    :param arity:   quantidade de filhos de cada nó do heap
+    """
+    __slots__ = ['_arity', '_items', '_priorities', '_position']
+
+    def __init__(self, arity: int = 2):
+        if arity < 2:
+            raise ValueError(f"arity must be at least 2, got {arity}")
+        self._arity = arity
+        self._items: List[T] = []
+        self._priorities: List[Ord] = []
+        self._position: Dict[T, int] = {}
+
+    def push(self, item: T, priority: Ord) -> None:
+        """Insere um item novo na fila
+
+        :raises KeyError: se o item já está na fila
+        """
+        if item in self._position:
+            raise KeyError(item)
+
+        self._items.append(item)
+        self._priorities.append(priority)
+        self._position[item] = len(self._items) - 1
+        self._sift_up(len(self._items) - 1)
+
+    def pop(self) -> Tuple[Ord, T]:
+        """Remove o item de menor prioridade
+
+        :return: a prioridade e o item
+        """
+        items, priorities = self._items, self._priorities
+        item, priority = items[0], priorities[0]
+        del self._position[item]
+
+        # o último vai para a raiz e desce
+        last_item, last_priority = items.pop(), priorities.pop()
+        if items:
+            items[0], priorities[0] = last_item, last_priority
+            self._position[last_item] = 0
+            self._sift_down(0)
+
+        return priority, item
+
+    def peek(self) -> Tuple[Ord, T]:
+        """Observa o item de menor prioridade sem removê-lo"""
+        return self._priorities[0], self._items[0]
+
+    def priority(self, item: T) -> Ord:
+        """Prioridade atual do item
+
+        :raises KeyError: se o item não está na fila
+        """
+        return self._priorities[self._position[item]]
+
+    def decrease_key(self, item: T, priority: Ord) -> None:
+        """Diminui a prioridade de um item que já está na fila
+
+        :raises KeyError: se o item não está na fila
+        :raises ValueError: se a prioridade nova é maior que a atual
+        """
+        pos = self._position[item]
+        if self._priorities[pos] < priority:
+            raise ValueError(f"new priority {priority!r} is greater than the current one")
+
+        self._priorities[pos] = priority
+        self._sift_up(pos)
+
+    def _sift_up(self, pos: int) -> None:
+        """sobe o item até a posição correta"""
+        items, priorities, position = self._items, self._priorities, self._position
+        item, priority = items[pos], priorities[pos]
+
+        while pos > 0:
+            parent = (pos - 1) // self._arity
+            if not priority < priorities[parent]:
+                break
+            # desce o pai
+            items[pos], priorities[pos] = items[parent], priorities[parent]
+            position[items[pos]] = pos
+            pos = parent
+
+        items[pos], priorities[pos] = item, priority
+        position[item] = pos
+
+    def _sift_down(self, pos: int) -> None:
+        """desce o item até a posição correta"""
+        items, priorities, position = self._items, self._priorities, self._position
+        item, priority = items[pos], priorities[pos]
+        size, arity = len(items), self._arity
+
+        while True:
+            first = pos * arity + 1
+            if first >= size:
+                break
+            # o menor dos filhos
+            child = min(range(first, min(first + arity, size)), key=priorities.__getitem__)
+            if not priorities[child] < priority:
+                break
+            # sobe o filho
+            items[pos], priorities[pos] = items[child], priorities[child]
+            position[items[pos]] = pos
+            pos = child
+
+        items[pos], priorities[pos] = item, priority
+        position[item] = pos
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item: object) -> bool:
+        return item in self._position
+
+    def __iter__(self) -> Iterator[T]:
+        """Itera os itens em ordem crescente de prioridade"""
+        order = sorted(range(len(self._items)), key=self._priorities.__getitem__)
+        return iter([self._items[pos] for pos in order])
+
+    def __repr__(self) -> str:
+        return _repr(self)
+
+
+class _PairingNode(Generic[T, Ord]):
+    """Nó de um :class:`PairingHeap`, com o primeiro filho, o próximo
+    irmão e o nó anterior (pai, se for o primeiro filho)"""
+    __slots__ = ['item', 'priority', 'child', 'sibling', 'prev']
+
+    def __init__(self, item: T, priority: Ord):
+        self.item = item
+        self.priority = priority
+        self.child: Optional[_PairingNode[T, Ord]] = None
+        self.sibling: Optional[_PairingNode[T, Ord]] = None
+        self.prev: Optional[_PairingNode[T, Ord]] = None
+
+
+class PairingHeap(Collection[T], Generic[T, Ord]):
+    """
+    `Pairing heap`, com inserção e :func:`~heap.PairingHeap.decrease_key`
+    em tempo constante e remoção em ``O(log n)`` amortizado
+    """
+    __slots__ = ['_root', '_nodes']
+
+    def __init__(self) -> None:
+        self._root: Optional[_PairingNode[T, Ord]] = None
+        self._nodes: Dict[T, _PairingNode[T, Ord]] = {}
+
+    @staticmethod
+    def _link(first: _PairingNode[T, Ord], second: _PairingNode[T, Ord]) -> _PairingNode[T, Ord]:
+        """junta duas raízes, a maior vira primeiro filho da menor"""
+        if second.priority < first.priority:
+            first, second = second, first
+
+        second.prev = first
+        second.sibling = first.child
+        if first.child is not None:
+            first.child.prev = second
+        first.child = second
+
+        first.sibling = first.prev = None
+        return first
+
+    def push(self, item: T, priority: Ord) -> None:
+        """Insere um item novo na fila
+
+        :raises KeyError: se o item já está na fila
+        """
+        if item in self._nodes:
+            raise KeyError(item)
+
+        node = self._nodes[item] = _PairingNode(item, priority)
+        self._root = node if self._root is None else self._link(self._root, node)
+
+    def pop(self) -> Tuple[Ord, T]:
+        """Remove o item de menor prioridade
+
+        :return: a prioridade e o item
+        """
+        root = self._root
+        if root is None:
+            raise IndexError("pop from empty heap")
+        del self._nodes[root.item]
+
+        # primeira passada: junta os filhos em pares
+        pairs: List[_PairingNode[T, Ord]] = []
+        child = root.child
+        while child is not None:
+            second = child.sibling
+            if second is None:
+                child.prev = child.sibling = None
+                pairs.append(child)
+                break
+            after = second.sibling
+            pairs.append(self._link(child, second))
+            child = after
+
+        # segunda passada: junta os pares da direita para a esquerda
+        new_root = pairs.pop() if pairs else None
+        while pairs:
+            new_root = self._link(pairs.pop(), new_root)  # type: ignore
+
+        self._root = new_root
+        return root.priority, root.item
+
+    def peek(self) -> Tuple[Ord, T]:
+        """Observa o item de menor prioridade sem removê-lo"""
+        if self._root is None:
+            raise IndexError("peek from empty heap")
+        return self._root.priority, self._root.item
+
+    def priority(self, item: T) -> Ord:
+        """Prioridade atual do item
+
+        :raises KeyError: se o item não está na fila
+        """
+        return self._nodes[item].priority
+
+    def decrease_key(self, item: T, priority: Ord) -> None:
+        """Diminui a prioridade de um item que já está na fila
+
+        :raises KeyError: se o item não está na fila
+        :raises ValueError: se a prioridade nova é maior que a atual
+        """
+        node = self._nodes[item]
+        if node.priority < priority:
+            raise ValueError(f"new priority {priority!r} is greater than the current one")
+
+        node.priority = priority
+        if node is self._root or self._root is None:
+            return
+
+        # corta a subárvore do nó e junta com a raiz
+        prev = node.prev
+        if prev is not None:
+            if prev.child is node:
+                prev.child = node.sibling
+            else:
+                prev.sibling = node.sibling
+        if node.sibling is not None:
+            node.sibling.prev = prev
+
+        self._root = self._link(self._root, node)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, item: object) -> bool:
+        return item in self._nodes
+
+    def __iter__(self) -> Iterator[T]:
+        """Itera os itens em ordem crescente de prioridade"""
+        nodes = sorted(self._nodes.values(), key=lambda node: node.priority)
+        return iter([node.item for node in nodes])
+
+    def __repr__(self) -> str:
+        return _repr(self)
@@ -0,0 +1,232 @@
+"""
+``instrument.py``
+=================
+
+Contadores e tempos opcionais dos pontos críticos da solução
+
+A instrumentação fica desligada por padrão e, assim, o custo
+nas buscas é só uma leitura de :func:`active` por chamada. Com
+ela ligada (:func:`recording`), as buscas de
+:mod:`graph.dijkstra` contam as operações na fila, as fases de
+:func:`main.main` são cronometradas e :func:`utils.map_many`
+traz os totais de cada processo.
+
+Os contadores são exportados em JSON e podem ser somados entre
+execuções e processos diferentes com :meth:`Counters.merge`.
+
+Uso: ``python instrument.py SAIDA.json ENTRADA.json ...``, que
+soma os arquivos de entrada
+"""
+
+from __future__ import annotations
+
+import os
+import json
+from time import perf_counter
+from contextlib import contextmanager, nullcontext
+from typing import (
+    TypeVar, Generic, Optional, Callable, Iterable, Iterator,
+    ContextManager, Sequence, Dict, List, Tuple, Any
+)
+
+__all__ = [
+    "Counters", "active", "recording", "count", "phase", "collect", "annotate",
+    "Recorded", "load", "main"
+]
+
+
+# tipos genéricos
+T = TypeVar('T')
+U = TypeVar('U')
+
+# contadores ativos no processo
+_ACTIVE: Optional[Counters] = None
+# fase sem instrumentação, reaproveitada
+_NOTHING = nullcontext()
+
+
+class Counters:
+    """
+    Contadores inteiros e tempos acumulados, pelo nome, e os totais
+    de cada processo que executou tarefas de :func:`utils.map_many`
+
+    :param counts: valor inicial dos contadores
+    :param timings: valor inicial dos tempos, em segundos
+    """
+    __slots__ = ['counts', 'timings', 'workers', 'meta']
+
+    def __init__(self, counts: Optional[Dict[str, int]] = None,
+                 timings: Optional[Dict[str, float]] = None):
+        self.counts: Dict[str, int] = dict(counts or {})
+        self.timings: Dict[str, float] = dict(timings or {})
+        # totais de cada processo, pelo pid
+        self.workers: Dict[str, Counters] = {}
+        # informações da execução, só para a exportação
+        self.meta: Dict[str, Any] = {}
+
+    def add(self, name: str, value: int = 1) -> None:
+        """Soma ``value`` ao contador"""
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def elapsed(self, name: str, seconds: float) -> None:
+        """Soma ``seconds`` ao tempo da fase"""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Cronometra o bloco ``with`` na fase ``name``"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.elapsed(name, perf_counter() - start)
+
+    def counting(self, name: str, func: Callable[..., T]) -> Callable[..., T]:
+        """A função ``func``, contando cada chamada em ``name``"""
+        counts = self.counts
+        counts.setdefault(name, 0)
+
+        def counted(*args: Any) -> T:
+            counts[name] += 1
+            return func(*args)
+        return counted
+
+    def merge(self, other: Counters, *, worker: Optional[str] = None) -> None:
+        """Soma os contadores e tempos de ``other`` nestes
+
+        :param worker: processo que gerou ``other``, para os totais
+                por processo
+        """
+        for name, value in other.counts.items():
+            self.add(name, value)
+        for name, seconds in other.timings.items():
+            self.elapsed(name, seconds)
+        for pid, totals in other.workers.items():
+            self.workers.setdefault(pid, Counters()).merge(totals)
+        if worker is not None:
+            self.workers.setdefault(worker, Counters()).merge(other)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Os contadores em tipos de JSON"""
+        document: Dict[str, Any] = {
+            'counts': dict(sorted(self.counts.items())),
+            'timings': dict(sorted(self.timings.items())),
+        }
+        if self.workers:
+            document['workers'] = {pid: totals.to_dict()
+                                   for pid, totals in sorted(self.workers.items())}
+        if self.meta:
+            document['meta'] = self.meta
+        return document
+
+    @staticmethod
+    def from_dict(document: Dict[str, Any]) -> Counters:
+        """Contadores exportados por :meth:`to_dict`"""
+        counters = Counters(document.get('counts'), document.get('timings'))
+        for pid, totals in document.get('workers', {}).items():
+            counters.workers[pid] = Counters.from_dict(totals)
+        counters.meta = dict(document.get('meta', {}))
+        return counters
+
+    def dump(self, path: str) -> None:
+        """Grava os contadores em JSON"""
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.counts!r}, {self.timings!r})'
+
+
+def active() -> Optional[Counters]:
+    """Os contadores ativos no processo, ou :obj:`None` se a
+    instrumentação estiver desligada"""
+    return _ACTIVE
+
+
+@contextmanager
+def recording(counters: Optional[Counters] = None) -> Iterator[Counters]:
+    """Liga a instrumentação no bloco ``with``, com os contadores dados
+    ou com contadores novos, e volta ao estado anterior no final"""
+    global _ACTIVE
+    previous, _ACTIVE = _ACTIVE, counters if counters is not None else Counters()
+    try:
+        yield _ACTIVE
+    finally:
+        _ACTIVE = previous
+
+
+def count(name: str, value: int = 1) -> None:
+    """Soma ``value`` ao contador, se a instrumentação estiver ligada"""
+    if _ACTIVE is not None:
+        _ACTIVE.add(name, value)
+
+
+def phase(name: str) -> ContextManager[Any]:
+    """Cronometra o bloco ``with``, se a instrumentação estiver ligada"""
+    if _ACTIVE is None:
+        return _NOTHING
+    return _ACTIVE.phase(name)
+
+
+def collect(items: Iterable[T]) -> Iterable[T]:
+    """Com a instrumentação ligada, consome os itens na hora, para
+    separar o tempo de quem gera os itens do tempo de quem usa"""
+    if _ACTIVE is None:
+        return items
+    return list(items)
+
+
+def annotate(**meta: Any) -> None:
+    """Informações da execução, exportadas junto com os contadores,
+    se a instrumentação estiver ligada"""
+    if _ACTIVE is not None:
+        _ACTIVE.meta.update(meta)
+
+
+class Recorded(Generic[T, U]):
+    """
+    Função de uma tarefa de `pool`, com os contadores da execução
+
+    A tarefa roda com contadores novos, que voltam junto com o
+    resultado e o pid do processo, para serem somados no processo
+    principal (veja :func:`utils.map_many`).
+    """
+    __slots__ = ['func']
+
+    def __init__(self, func: Callable[[T], U]):
+        self.func = func
+
+    def __call__(self, arg: T) -> Tuple[U, str, Dict[str, Any]]:
+        with recording() as counters:
+            counters.add('tasks')
+            result = self.func(arg)
+        return result, str(os.getpid()), counters.to_dict()
+
+
+def load(path: str) -> Counters:
+    """Contadores gravados por :meth:`Counters.dump`"""
+    with open(path) as file:
+        return Counters.from_dict(json.load(file))
+
+
+def main(argv: Sequence[str]) -> None:
+    """Soma os contadores de vários arquivos"""
+    if len(argv) < 2:
+        raise SystemExit("usage: python instrument.py SAIDA.json ENTRADA.json ...")
+
+    total = Counters()
+    queries: List[Any] = []
+    for path in argv[1:]:
+        counters = load(path)
+        total.merge(counters)
+        if 'query' in counters.meta:
+            queries.append(counters.meta['query'])
+    total.meta = {'merged': len(argv) - 1}
+    if queries:
+        total.meta['queries'] = queries
+    total.dump(argv[0])
+
+
+if __name__ == "__main__":
+    import sys
+    main(sys.argv[1:])
@@ -7,18 +7,36 @@ Solução para o problema
 
 from __future__ import annotations
 
-from graph import dijkstra
-from waze import Waze
-from mean import Mean
-from utils import uncurry, run_many
-
+from graph import (
+    dijkstra, csr_dijkstra,
+    bidirectional_dijkstra, csr_bidirectional
+)
+from graph.dijkstra import csr_tree, hiearachy_path
+from graph.alt import csr_astar, csr_alt
+from graph.dynamic import DynamicSSSP
+from heap import IndexedHeap, PairingHeap
+from waze import Waze, CompiledWaze
+from prune import PrunedWaze, prune
+from shared import SharedWaze
+from street import SpeedSample
+from mean import Mean, normal_quantile
+from memo import LRUCache, signature, joint_size, assignments
+from utils import uncurry, run_many, map_many
+import instrument
+
+import io
 import sys
+from contextlib import ExitStack
+from multiprocessing import Pool
+from multiprocessing.pool import Pool as PoolType
 from heapq import nsmallest
+from math import sqrt
+from time import monotonic
 from operator import attrgetter
-from copy import deepcopy
 from typing import (
     Tuple, Union, Optional, Iterable,
-    TextIO, DefaultDict
+    TextIO, DefaultDict, Sequence, Mapping, Dict, List,
+    Callable, Iterator, Any
 )
 
 
@@ -60,26 +78,330 @@ def read_latest_speeds(waze: Waze, *,
     return source, destination
 
 
+def read_queries(source: str, destination: str, *,
+                 file: TextIO = sys.stdin
+                 ) -> List[Tuple[str, str]]:
+    """leitura das consultas seguintes, depois da origem e do destino
+
+    Cada linha até o fim do arquivo tem uma origem e um destino,
+    separados por espaço. Linhas em branco são ignoradas.
+    """
+    queries = [(source, destination)]
+    for line in file:
+        if line.strip():
+            from_, to = line.split()
+            queries.append((from_, to))
+
+    return queries
+
+
+def read_bytes(infile: Union[TextIO, str]) -> bytes:
+    """leitura da entrada completa, como `bytes`"""
+    if isinstance(infile, str):
+        with open(infile, 'rb') as file:
+            return file.read()
+    elif hasattr(infile, 'buffer'):
+        return infile.buffer.read()
+    else:
+        return infile.read().encode()
+
+
 # tipos agregados
 Path = Tuple[str, ...]
 Result = Optional[Tuple[Path, float]]
+Query = Tuple[str, str]
+# busca no grafo compilado, com os tempos de cada trecho
+# e os identificadores dos nós
+Search = Callable[[CompiledWaze, Sequence[float], int, int],
+                  Optional[Tuple[float, Tuple[int, ...]]]]
+
+
+def indexed_dijkstra(waze: CompiledWaze, times: Sequence[float], source: int, dest: int
+                     ) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """Dijkstra com a fila :class:`heap.IndexedHeap`, com `decrease-key`"""
+    return csr_dijkstra(waze, times, source, dest, heap=IndexedHeap)
+
+
+def pairing_dijkstra(waze: CompiledWaze, times: Sequence[float], source: int, dest: int
+                     ) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """Dijkstra com a fila :class:`heap.PairingHeap`, com `decrease-key`"""
+    return csr_dijkstra(waze, times, source, dest, heap=PairingHeap)
+
+
+def alt(waze: CompiledWaze, times: Sequence[float], source: int, dest: int
+        ) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """busca A* com os marcos pré-processados do grafo"""
+    return csr_alt(waze, times, source, dest, waze.landmarks())
+
+
+def astar(waze: CompiledWaze, times: Sequence[float], source: int, dest: int
+          ) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """busca A* com a estimativa exata nos tempos fixos do grafo"""
+    return csr_astar(waze, times, source, dest, waze.bounds(dest).__getitem__)
+
+
+def cch(waze: CompiledWaze, times: Sequence[float], source: int, dest: int
+        ) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """busca na hierarquia de contração, customizada com os tempos sorteados"""
+    return waze.hierarchy().customize(times).query(source, dest)
+
+
+# árvore da última busca dinâmica no processo
+_TREE: Optional[DynamicSSSP[str]] = None
+
+
+def dynamic(waze: CompiledWaze, times: Sequence[float], source: int, dest: int
+            ) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """busca que repara a árvore de caminhos mínimos da amostra anterior,
+    se ela for do mesmo grafo e da mesma origem"""
+    global _TREE
+    if _TREE is None or _TREE.graph is not waze or _TREE.source != source:
+        _TREE = DynamicSSSP(waze, times, source, waze.observed_edges())
+    else:
+        _TREE.reweight(times)
+    return _TREE.path(dest)
+
+
+#: buscas disponíveis no grafo compilado
+ENGINES: Dict[str, Search] = {
+    'dijkstra': csr_dijkstra,
+    'dijkstra-indexed': indexed_dijkstra,
+    'dijkstra-pairing': pairing_dijkstra,
+    'bidirectional': csr_bidirectional,
+    'alt': alt,
+    'astar': astar,
+    'cch': cch,
+    'dynamic': dynamic,
+}
+
+#: pré-processamento das buscas, feito uma vez
+#: antes de distribuir o grafo entre as execuções
+PREPARE: Dict[str, Callable[[CompiledWaze], Any]] = {
+    'bidirectional': CompiledWaze.reverse,
+    'alt': CompiledWaze.landmarks,
+    'cch': CompiledWaze.hierarchy,
+}
+
+#: buscas disponíveis no grafo de objetos
+OBJECT_ENGINES: Dict[str, Callable[[Waze, str, str], Any]] = {
+    'dijkstra': dijkstra,
+    'bidirectional': bidirectional_dijkstra,
+}
+
+
+def compile_waze(waze: Union[Waze, CompiledWaze], engine: str,
+                 query: Optional[Tuple[str, str]] = None) -> CompiledWaze:
+    """compila o grafo, se ainda não estiver compilado, e faz o
+    pré-processamento da busca
+
+    :param query: origem e destino, para reduzir o grafo para
+            essa consulta antes do pré-processamento (:func:`prune.prune`)
+    """
+    with instrument.phase('copy'):
+        graph = waze if isinstance(waze, CompiledWaze) else waze.compile()
+        if query is not None:
+            graph = prune(graph, *query)
+        if engine in PREPARE:
+            PREPARE[engine](graph)
+    return graph
 
 
 @uncurry
-def run(waze: Waze, source: str, dest: str) -> Result:
-    """função de resolução do grafo Waze e tratamento do resultado"""
+def run(waze: Union[Waze, CompiledWaze], source: str, dest: str,
+        times: Optional[Sequence[float]] = None,
+        engine: str = 'dijkstra') -> Result:
+    """função de resolução do grafo Waze e tratamento do resultado
+
+    No grafo compilado, ``times`` pode trazer os tempos já
+    sorteados de cada trecho. A busca usada é a de nome ``engine``
+    em :data:`ENGINES` ou :data:`OBJECT_ENGINES`.
+    """
+
+    if isinstance(waze, CompiledWaze):
+        if source not in waze or dest not in waze:
+            return None
+        # o grafo compilado sorteia novas velocidades a cada busca
+        if times is None:
+            with instrument.phase('sample'):
+                times = waze.weights()
+
+        with instrument.phase('search'):
+            result = ENGINES[engine](waze, times, waze.id(source), waze.id(dest))
+        if not result:
+            return None
 
-    # deepcopy pra esquecer as velocidades assumidas
-    graph = deepcopy(waze)
+        total, nodes = result
+        return tuple(map(waze.key, nodes)), total
 
-    path = dijkstra(graph, source, dest)
+    # as velocidades assumidas ficam só na amostra,
+    # o grafo é compartilhado entre as execuções, e
+    # são sorteadas durante a busca
+    with instrument.phase('search'), SpeedSample():
+        path = OBJECT_ENGINES[engine](waze, source, dest)
     if not path:
         # caminho não encontrado
         return None
 
     # montagem do resultado
     keys = map(attrgetter('key'), path[1])
-    return tuple(keys), path[0].time
+    return tuple(keys), float(path[0])
+
+
+@uncurry
+def query_run(waze: CompiledWaze, queries: Sequence[Query]) -> List[Result]:
+    """uma amostra para todas as consultas
+
+    As velocidades são sorteadas uma vez e cada origem faz uma só
+    árvore de caminhos mínimos (:func:`graph.dijkstra.csr_tree`), que
+    atende todos os destinos dela.
+
+    :return: o resultado de cada consulta, na mesma ordem
+    """
+    times = waze.weights()
+    trees: Dict[str, Tuple[List[float], Dict[int, int]]] = {}
+    inf = float('inf')
+
+    results: List[Result] = []
+    for source, dest in queries:
+        if source not in waze or dest not in waze or source == dest:
+            results.append(None)
+            continue
+
+        tree = trees.get(source)
+        if tree is None:
+            tree = trees[source] = csr_tree(waze, times, waze.id(source))
+        dist, parent = tree
+
+        node = waze.id(dest)
+        if dist[node] == inf:
+            results.append(None)
+        else:
+            path = hiearachy_path(parent, node)
+            results.append((tuple(map(waze.key, path)), dist[node]))
+
+    return results
+
+
+def query_results(waze: CompiledWaze, queries: Sequence[Query], runs: int, *,
+                  PARALLEL: bool = False
+                  ) -> List[Tuple[DefaultDict[Path, Mean], int]]:
+    """execuções de :func:`query_run`, com as médias de cada caminho e
+    os erros separados por consulta"""
+    totals = [(DefaultDict[Path, Mean](Mean), 0) for _ in queries]
+
+    for sample in run_many(query_run, (waze, queries), runs=runs, PARALLEL=PARALLEL):
+        for idx, result in enumerate(sample):
+            results, errors = totals[idx]
+            if not result:
+                totals[idx] = results, errors + 1
+            else:
+                path, time = result
+                results[path] += time
+
+    return totals
+
+
+def candidate_runs(waze: CompiledWaze, source: str, dest: str, runs: int,
+                   k: int, engine: str = 'dijkstra', *,
+                   PARALLEL: bool = False,
+                   pool: Optional[PoolType] = None,
+                   strategy: str = 'uniform') -> List[Result]:
+    """execuções avaliadas de uma vez sobre os ``k`` melhores caminhos
+    candidatos (:class:`candidates.Candidates`)
+
+    Só as amostras em que o melhor candidato não é comprovadamente
+    ótimo passam pela busca ``engine``. As amostras seguem a estratégia
+    ``strategy`` de :data:`sampling.STRATEGIES`.
+    """
+    # precisam do NumPy
+    from sampling import sample_times
+    from candidates import Candidates
+
+    if source not in waze or dest not in waze:
+        return [None] * runs
+
+    samples = sample_times(waze, runs, strategy=strategy)
+    found = Candidates.build(waze, waze.id(source), waze.id(dest), k)
+    best, cost, proven = found.evaluate(samples)
+
+    results: List[Result] = []
+    pending: List[int] = []
+    for sample, (path, total, done) in enumerate(zip(best.tolist(), cost.tolist(), proven.tolist())):
+        if not done:
+            pending.append(sample)
+        elif path < 0:
+            results.append(None)
+        else:
+            results.append((tuple(map(waze.key, found.paths[path])), total))
+
+    # as outras amostras são resolvidas com a busca
+    args = ((waze, source, dest, samples[sample].tolist(), engine) for sample in pending)
+    results.extend(map_many(run, args, PARALLEL=PARALLEL, pool=pool))
+    return results
+
+
+def shared_runs(backend: SharedWaze, source: str, dest: str, runs: int,
+                engine: str = 'dijkstra') -> Iterator[Result]:
+    """execuções no pool persistente do grafo compartilhado"""
+    waze = backend.graph
+    if source not in waze or dest not in waze:
+        for _ in range(runs):
+            yield None
+        return
+
+    for result in backend.run(ENGINES[engine], waze.id(source), waze.id(dest), runs):
+        if not result:
+            yield None
+        else:
+            nodes, total = result
+            yield tuple(map(waze.key, nodes)), total
+
+
+def memo_runs(waze: CompiledWaze, source: str, dest: str, runs: int,
+              engine: str, cache: LRUCache[bytes, Result]) -> Iterator[Result]:
+    """execuções que reaproveitam o resultado de amostras com os mesmos
+    tempos nos trechos com velocidades registradas
+
+    Os acertos e falhas do cache nessas execuções são somados nos
+    contadores ``memo.hits`` e ``memo.misses`` da instrumentação.
+    """
+    edges = waze.observed_edges()
+    hits, misses = cache.hits, cache.misses
+    try:
+        for _ in range(runs):
+            times = waze.weights()
+            key = signature(times, edges)
+            try:
+                result = cache[key]
+            except KeyError:
+                result = cache[key] = run((waze, source, dest, times, engine))
+            yield result
+    finally:
+        instrument.count('memo.hits', cache.hits - hits)
+        instrument.count('memo.misses', cache.misses - misses)
+
+
+def exact_results(waze: CompiledWaze, source: str, dest: str,
+                  engine: str = 'dijkstra') -> Tuple[DefaultDict[Path, Mean], int, int]:
+    """resultados de todas as amostras possíveis (:func:`memo.assignments`),
+    com as médias ponderadas pela probabilidade de cada uma
+
+    :return: as médias de cada caminho, as amostras sem caminho e
+            a quantidade de amostras
+    """
+    results = DefaultDict[Path, Mean](Mean)
+    errors = runs = 0
+
+    for times, probability in assignments(waze):
+        runs += 1
+        result = run((waze, source, dest, times, engine))
+        if not result:
+            errors += 1
+        else:
+            path, total = result
+            results[path].add(total, probability)
+
+    return results, errors, runs
 
 
 def aggregate(items: Iterable[Result]) -> Tuple[DefaultDict[Path, Mean], int]:
@@ -100,57 +422,404 @@ def aggregate(items: Iterable[Result]) -> Tuple[DefaultDict[Path, Mean], int]:
     return results, errors
 
 
+def settled(results: Mapping[Path, Mean], confidence: float) -> bool:
+    """se os três melhores caminhos estão separados entre si
+
+    O melhor e o segundo melhor (e o segundo e o terceiro, que
+    poderia tomar o lugar do segundo) estão separados quando a
+    diferença das médias passa do quantil normal de ``confidence``
+    vezes o erro padrão da diferença. Caminhos vistos uma vez só
+    usam a maior variância entre os outros.
+    """
+    ranking = sorted(results.values(), key=attrgetter('average'))[:3]
+    if len(ranking) < 2:
+        return True
+
+    variances = [mean.variance for mean in results.values() if mean.count > 1]
+    fallback = max(variances, default=float('inf'))
+
+    def error(mean: Mean) -> float:
+        variance = mean.variance if mean.count > 1 else fallback
+        return variance / mean.count
+
+    z = normal_quantile(confidence)
+    return all(second.average - first.average > z * sqrt(error(first) + error(second))
+               for first, second in zip(ranking, ranking[1:]))
+
+
+# resultado acumulado: médias de cada caminho, erros e execuções feitas
+Snapshot = Tuple[DefaultDict[Path, Mean], int, int]
+# melhores caminhos com as médias
+Answer = List[Tuple[Path, Mean]]
+
+
+def best_paths(results: Mapping[Path, Mean], count: int = 2) -> Answer:
+    """os ``count`` caminhos de menor média"""
+    return nsmallest(count, results.items(), key=lambda x: x[1].average)
+
+
+def expand_paths(graph: Union[Waze, CompiledWaze], answer: Answer) -> Answer:
+    """caminhos com os nós originais, se o grafo foi reduzido
+    (:class:`prune.PrunedWaze`)"""
+    if isinstance(graph, PrunedWaze):
+        return [(graph.expand(path), mean) for path, mean in answer]
+    return answer
+
+
+def batches(sample: Callable[[int], Iterable[Result]], max_runs: Optional[int],
+            batch: int = 10, deadline: Optional[float] = None
+            ) -> Iterator[Snapshot]:
+    """execuções em lotes, com o resultado acumulado depois de cada lote
+
+    Os lotes param em ``max_runs`` execuções ou quando passar o prazo
+    de ``deadline`` segundos, o que vier antes. O prazo também é
+    conferido a cada resultado, então um lote pode parar no meio,
+    e os lotes depois do primeiro diminuem para caber no tempo que
+    falta, pelo tempo médio das execuções até ali. Pelo menos uma
+    execução é sempre feita. As médias de cada lote são juntadas às
+    anteriores, então a ordem em que os resultados chegam não faz
+    diferença.
+
+    :param sample: gera os resultados de uma quantidade de execuções
+    """
+    results = DefaultDict[Path, Mean](Mean)
+    errors = runs = 0
+    start = monotonic()
+    end = None if deadline is None else start + deadline
+
+    def until_deadline(items: Iterable[Result]) -> Iterator[Result]:
+        """os resultados até passar o prazo, contando as execuções"""
+        nonlocal runs
+        for item in items:
+            runs += 1
+            yield item
+            if end is not None and monotonic() >= end:
+                break
+
+    while max_runs is None or runs < max_runs:
+        size = batch if max_runs is None else min(batch, max_runs - runs)
+        if end is not None and runs:
+            # as execuções que cabem no prazo, pela média até aqui
+            per_run = (monotonic() - start) / runs
+            size = max(1, min(size, int((end - monotonic()) / per_run)))
+
+        partial, failed = aggregate(until_deadline(sample(size)))
+        for path, mean in partial.items():
+            results[path] += mean
+        errors += failed
+        yield results, errors, runs
+
+        if end is not None and monotonic() >= end:
+            break
+
+
+def sequential(sample: Callable[[int], Iterable[Result]], max_runs: Optional[int],
+               batch: int = 10, *, confidence: Optional[float] = None,
+               deadline: Optional[float] = None,
+               progress: Optional[Callable[[Answer], Any]] = None
+               ) -> Snapshot:
+    """execuções em lotes (:func:`batches`), que também param quando
+    os melhores caminhos ficarem separados com ``confidence``
+    (:func:`settled`)
+
+    :param progress: recebe os melhores caminhos depois de cada lote
+    :return: as médias de cada caminho, os erros e as execuções feitas
+    """
+    snapshot: Snapshot = DefaultDict[Path, Mean](Mean), 0, 0
+
+    for snapshot in batches(sample, max_runs, batch, deadline):
+        results = snapshot[0]
+        if progress is not None:
+            progress(best_paths(results))
+        if confidence is not None and results and settled(results, confidence):
+            break
+
+    return snapshot
+
+
 def main(RUNS: int = 100, PARALLEL: bool = False, *,
+         COMPILE: bool = True, BATCH: bool = False,
+         ENGINE: str = 'dijkstra', CANDIDATES: int = 0,
+         SHARED: bool = False, CONFIDENCE: Optional[float] = None,
+         BATCHSIZE: int = 10, DEADLINE: Optional[float] = None,
+         STRATEGY: str = 'uniform', MEMO: int = 0, PRUNE: bool = True,
+         QUERIES: bool = False, FASTPARSE: bool = False,
+         SNAPSHOT: Optional[str] = None, INSTRUMENT: Optional[str] = None,
          infile: Union[TextIO, str] = sys.stdin,
-         outfile: TextIO = sys.stdout
+         outfile: TextIO = sys.stdout,
+         progress: Optional[Callable[[Answer], Any]] = None
          ) -> None:
-    """função principal que resolve o grafo várias vezes"""
-
-    # abre o arquivo de leitura, se necessário
-    if isinstance(infile, str):
-        file = open(infile, 'r')
-    else:
-        file = infile
-    # lê o grafo
-    waze_graph = read_waze(file=file)
-    source, dest = read_latest_speeds(waze_graph, file=file)
-    # e fecha o arquivo
-    if isinstance(infile, str):
-        file.close()
+    """função principal que resolve o grafo várias vezes
+
+    Com ``COMPILE``, as buscas são feitas no grafo compilado
+    (:class:`~waze.CompiledWaze`), em vez do grafo de objetos. Com
+    ``BATCH``, as velocidades de todas as execuções são sorteadas
+    de uma vez, com :func:`sampling.sample_times` e a estratégia
+    ``STRATEGY`` (que também vale para ``CANDIDATES``). ``ENGINE`` escolhe
+    a busca feita em cada execução, entre as de :data:`ENGINES`; as
+    variantes ``dijkstra-indexed`` e ``dijkstra-pairing`` trocam o
+    :mod:`heapq` pelas filas com `decrease-key` de :mod:`heap`, que
+    são mais lentas em Python puro (veja :mod:`benchmark.heap`). Com
+    ``CANDIDATES`` positivo, as execuções são avaliadas sobre essa
+    quantidade de caminhos candidatos (veja :func:`candidate_runs`).
+    Com ``SHARED``, as execuções são sempre paralelas, em processos
+    que mapeiam o grafo compilado de :class:`shared.SharedWaze`.
+
+    Com ``CONFIDENCE``, as execuções são feitas em lotes de ``BATCHSIZE``
+    e param quando a ordem dos melhores caminhos estiver definida com
+    essa confiança (veja :func:`sequential`), com no máximo ``RUNS``
+    execuções. Com ``DEADLINE``, os lotes continuam até passar esse
+    prazo em segundos, em vez de ``RUNS``. Nos dois casos, ``progress``
+    recebe os melhores caminhos parciais depois de cada lote.
+
+    Com ``MEMO`` positivo, as buscas passam por um cache desse tamanho,
+    indexado pelos tempos sorteados nos trechos com velocidades
+    registradas (:func:`memo_runs`). Se houver no máximo ``RUNS``
+    amostras possíveis, elas são todas avaliadas, com o peso da
+    probabilidade de cada uma (:func:`exact_results`).
+
+    Com ``PRUNE``, o grafo compilado é reduzido para a consulta antes
+    das amostras, sem os nós fora dos caminhos da origem ao destino
+    e com as cadeias de trechos sem registros contraídas (veja
+    :func:`prune.prune`). Os caminhos mostrados voltam a ter os nós
+    originais.
+
+    Com ``QUERIES``, a entrada pode ter mais consultas depois da origem
+    e do destino, uma por linha (:func:`read_queries`). Todas usam as
+    mesmas ``RUNS`` amostras, no grafo compilado e com uma árvore por
+    origem (:func:`query_results`), e os dois melhores caminhos de cada
+    uma são mostrados em sequência, na ordem da entrada. Consultas sem
+    caminho vão para a saída de erros, sem interromper as outras. As
+    outras opções valem só para a consulta única.
+
+    Com ``FASTPARSE``, a entrada é lida de uma vez direto para o grafo
+    compilado (:mod:`parser`), nos modos que usam ele. Com ``SNAPSHOT``,
+    o mapa vem desse arquivo binário (:func:`snapshot.load`) e a entrada
+    só tem as velocidades registradas e as consultas, aplicadas sobre
+    ele com :func:`parser.observe`.
+
+    Com ``INSTRUMENT``, a execução é instrumentada (:mod:`instrument`)
+    e os contadores das buscas (e do cache de ``MEMO``), os tempos das
+    fases (``parse``, ``copy``, ``sample``, ``search``, ``runs`` e
+    ``aggregate``) e os totais de cada processo são gravados nesse
+    arquivo JSON, mesmo se houver erro.
+
+    ``CANDIDATES``, ``SHARED``, ``MEMO``, ``BATCH`` e ``QUERIES`` são
+    modos exclusivos entre si e todos precisam de ``COMPILE``. Opções
+    que não valem no modo escolhido, como ``STRATEGY`` fora de ``BATCH``
+    e ``CANDIDATES``, são recusadas, em vez de ignoradas.
+
+    :raises ValueError: se as opções não podem ser combinadas
+    """
+    if INSTRUMENT is not None:
+        # a mesma execução, com os contadores ligados
+        with instrument.recording() as counters:
+            try:
+                with counters.phase('total'):
+                    main(RUNS, PARALLEL, COMPILE=COMPILE, BATCH=BATCH, ENGINE=ENGINE,
+                         CANDIDATES=CANDIDATES, SHARED=SHARED, CONFIDENCE=CONFIDENCE,
+                         BATCHSIZE=BATCHSIZE, DEADLINE=DEADLINE, STRATEGY=STRATEGY,
+                         MEMO=MEMO, PRUNE=PRUNE, QUERIES=QUERIES, FASTPARSE=FASTPARSE,
+                         SNAPSHOT=SNAPSHOT, infile=infile, outfile=outfile,
+                         progress=progress)
+            finally:
+                counters.dump(INSTRUMENT)
+        return
+
+    # modos que escolhem como as execuções são feitas, um de cada vez
+    modes = [name for name, value in (('CANDIDATES', CANDIDATES), ('SHARED', SHARED),
+                                      ('MEMO', MEMO), ('BATCH', BATCH), ('QUERIES', QUERIES))
+             if value]
+    if len(modes) > 1:
+        raise ValueError(f"conflicting modes: {', '.join(modes)}")
+    if modes and not COMPILE:
+        raise ValueError(f"{modes[0]} needs the compiled graph")
+    if QUERIES and (ENGINE != 'dijkstra' or CONFIDENCE is not None or DEADLINE is not None):
+        raise ValueError("QUERIES only runs dijkstra, without CONFIDENCE or DEADLINE")
+    if STRATEGY != 'uniform' and not (BATCH or CANDIDATES):
+        raise ValueError("STRATEGY needs BATCH or CANDIDATES")
+    if FASTPARSE and (SNAPSHOT is not None or not COMPILE):
+        raise ValueError("FASTPARSE needs the compiled graph and no SNAPSHOT")
+
+    if ENGINE not in (ENGINES if COMPILE else OBJECT_ENGINES):
+        raise ValueError(f"unknown search engine: {ENGINE}")
+
+    waze_graph: Union[Waze, CompiledWaze]
+    with instrument.phase('parse'):
+        if SNAPSHOT is not None:
+            if not COMPILE:
+                raise ValueError("snapshots need the compiled graph")
+            # precisa do NumPy
+            from parser import observe
+            from snapshot import load as load_snapshot
+
+            waze_graph, source, dest, rest = observe(load_snapshot(SNAPSHOT), read_bytes(infile))
+            queries = read_queries(source, dest, file=io.StringIO(rest.decode())) if QUERIES else []
+        elif FASTPARSE:
+            # precisa do NumPy
+            from parser import parse, load
+
+            if isinstance(infile, str):
+                waze_graph, source, dest, rest = load(infile)
+            else:
+                waze_graph, source, dest, rest = parse(read_bytes(infile))
+            queries = read_queries(source, dest, file=io.StringIO(rest.decode())) if QUERIES else []
+        else:
+            # abre o arquivo de leitura, se necessário
+            if isinstance(infile, str):
+                file = open(infile, 'r')
+            else:
+                file = infile
+            # lê o grafo
+            waze_graph = read_waze(file=file)
+            source, dest = read_latest_speeds(waze_graph, file=file)
+            queries = read_queries(source, dest, file=file) if QUERIES else []
+            # e fecha o arquivo
+            if isinstance(infile, str):
+                file.close()
+    instrument.annotate(query=[source, dest], runs=RUNS, engine=ENGINE)
+
+    if QUERIES:
+        compiled = compile_waze(waze_graph, 'dijkstra')
+        with instrument.phase('runs'):
+            totals = query_results(compiled, queries, RUNS, PARALLEL=PARALLEL)
+        for (from_, to), (results, errors) in zip(queries, totals):
+            if errors == RUNS:
+                print(f"no path between {from_} and {to}", file=sys.stderr)
+                continue
+            for path, time in best_paths(results):
+                print(f'{time.average * 60.0:.1f}', file=outfile)
+                print(*path, file=outfile)
+            outfile.flush()
+        return
+
+    # com poucas amostras possíveis, dá para avaliar todas
+    exact = False
+    # grafo das buscas, de onde vêm os caminhos
+    graph: Union[Waze, CompiledWaze] = waze_graph
+    query = (source, dest) if PRUNE else None
+
+    def report(answer: Answer) -> Any:
+        """resultados parciais, com os caminhos originais"""
+        if progress is not None:
+            return progress(expand_paths(graph, answer))
+
+    with ExitStack() as stack:
+        # em lotes, o mesmo pool atende todos eles
+        pool: Optional[PoolType] = None
+        if PARALLEL and not SHARED and (CONFIDENCE is not None or DEADLINE is not None):
+            pool = stack.enter_context(Pool())
+
+        # prepara a função que gera as execuções
+        if CANDIDATES:
+            graph = compiled = compile_waze(waze_graph, ENGINE, query)
+
+            def sample(runs: int) -> Iterable[Result]:
+                return candidate_runs(compiled, source, dest, runs,
+                                      CANDIDATES, ENGINE, PARALLEL=PARALLEL, pool=pool,
+                                      strategy=STRATEGY)
+        elif SHARED:
+            graph = compiled = compile_waze(waze_graph, ENGINE, query)
+            # o pool fica aberto até o fim das execuções
+            backend = stack.enter_context(SharedWaze(compiled, PREPARE.get(ENGINE)))
+
+            def sample(runs: int) -> Iterable[Result]:
+                return shared_runs(backend, source, dest, runs, ENGINE)
+        elif MEMO:
+            graph = compiled = compile_waze(waze_graph, ENGINE, query)
+            exact = joint_size(compiled) <= RUNS
+            # o cache continua entre os lotes
+            cache = LRUCache[bytes, Result](MEMO)
+
+            def sample(runs: int) -> Iterable[Result]:
+                return memo_runs(compiled, source, dest, runs, ENGINE, cache)
+        elif BATCH:
+            # precisa do NumPy
+            from sampling import sample_times
+
+            graph = compiled = compile_waze(waze_graph, ENGINE, query)
+
+            def sample(runs: int) -> Iterable[Result]:
+                with instrument.phase('sample'):
+                    samples = sample_times(compiled, runs, strategy=STRATEGY)
+                args = ((compiled, source, dest, times.tolist(), ENGINE) for times in samples)
+                return map_many(run, args, PARALLEL=PARALLEL, pool=pool)
+        else:
+            # congela o grafo para as buscas
+            if COMPILE:
+                graph = compile_waze(waze_graph, ENGINE, query)
+
+            def sample(runs: int) -> Iterable[Result]:
+                return run_many(run, (graph, source, dest, None, ENGINE),
+                                runs=runs, PARALLEL=PARALLEL, pool=pool)
+
+        # analisa os resultados
+        if exact:
+            with instrument.phase('runs'):
+                results, errors, runs = exact_results(compiled, source, dest, ENGINE)
+        elif CONFIDENCE is None and DEADLINE is None:
+            # instrumentado, as execuções terminam antes da agregação
+            with instrument.phase('runs'):
+                samples = instrument.collect(sample(RUNS))
+            with instrument.phase('aggregate'):
+                results, errors = aggregate(samples)
+            runs = RUNS
+        else:
+            # os lotes já agregam os resultados
+            with instrument.phase('runs'):
+                results, errors, runs = sequential(
+                    sample, RUNS if DEADLINE is None else None, BATCHSIZE,
+                    confidence=CONFIDENCE, deadline=DEADLINE,
+                    progress=None if progress is None else report
+                )
 
-    # prepara o generator com a execução
-    items = run_many(run, (waze_graph, source, dest),
-                     runs=RUNS, PARALLEL=PARALLEL)
-    # analisa os resultados
-    results, errors = aggregate(items)
     # se não teve nenhum resultado válido
     # provalvelmente é um problema no grafo
-    if errors == RUNS:
+    if errors == runs:
         raise ValueError(f"no path between {source} and {dest}")
 
     # retira e mostra os melhores resultados
-    best = nsmallest(2, results.items(), key=lambda x: x[1].average)
-    for path, time in best:
+    for path, time in expand_paths(graph, best_paths(results)):
         print(f'{time.average * 60.0:.1f}', file=outfile)
         print(*path, file=outfile)
 
 
 # preparação e código para benchmark
 SETUP = """
-from __main__ import main
+from main import main
 import os
 
 devnull = open(os.devnull, 'w')
 """
 
-CODE = "main(file_or_name='{file}', out=devnull, PARALLEL={arg})"
+CODE = "main(infile={file!r}, outfile=devnull, PARALLEL={arg})"
 
 
-def time(RUNS: int = 100, *, input_file: str) -> None:
-    """benchmark dos modos paralelo e sequencial, para comparação"""
+def time(RUNS: int = 100, *, input_file: Optional[str] = None, EDGES: int = 1000) -> None:
+    """benchmark dos modos paralelo e sequencial, para comparação
+
+    Sem ``input_file``, a entrada é um mapa sintético com ``EDGES``
+    trechos, de :func:`benchmark.generator.generate`. As fases de cada
+    modo são medidas em separado por :mod:`benchmark.suite`.
+    """
+    import os
+    from tempfile import NamedTemporaryFile
     from timeit import timeit
 
-    for arg in (True, False):
-        code = CODE.format(file=input_file, arg=arg)
-        timing = timeit(code, setup=SETUP, number=RUNS)
-        print(f'PARALLEL={arg}', f'TIMING={timing}')
+    generated = None
+    if input_file is None:
+        # precisa do NumPy
+        from benchmark.generator import write
+
+        with NamedTemporaryFile('wb', suffix='.txt', delete=False) as file:
+            write(file, EDGES)
+        input_file = generated = file.name
+
+    try:
+        for arg in (True, False):
+            code = CODE.format(file=input_file, arg=arg)
+            timing = timeit(code, setup=SETUP, number=RUNS)
+            print(f'PARALLEL={arg}', f'TIMING={timing}')
+    finally:
+        if generated is not None:
+            os.remove(generated)
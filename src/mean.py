@@ -7,7 +7,27 @@ Módulo com um tipo agregador da média de valores
 
 from __future__ import annotations
 
-from typing import Union
+from math import erf, sqrt
+from typing import Union, Tuple
+
+
+def normal_quantile(p: float) -> float:
+    """Quantil da distribuição normal padrão, por bisseção
+    na função de distribuição acumulada
+
+    :param p: probabilidade acumulada, entre ``0`` e ``1``
+    """
+    if not 0.0 < p < 1.0:
+        raise ValueError("probability must be between 0 and 1")
+
+    low, high = -40.0, 40.0
+    for _ in range(100):
+        middle = (low + high) / 2
+        if 0.5 * (1.0 + erf(middle / sqrt(2.0))) < p:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
 
 
 class Mean:
@@ -19,27 +39,77 @@ class Mean:
     a nova média é tratada como a média da junção dos
     valores que compõe as duas médias.
 
+    A variância é acumulada junto, pelo método de Welford,
+    sem guardar os valores. Valores podem ter pesos diferentes
+    (veja :meth:`add`), como as probabilidades de cada caso.
+
     :param nums:    valores iniciais na medida
     """
 
     def __init__(self, *nums: float):
-        self._count = len(nums)
-        self._sum = sum(nums)
+        self._count = 0
+        self._weight = 0.0
+        self._mean = 0.0
+        # soma ponderada dos quadrados dos desvios
+        self._m2 = 0.0
+        self.insert(*nums)
+
+    @property
+    def count(self) -> int:
+        """Quantidade de valores agregados"""
+        return self._count
+
+    @property
+    def weight(self) -> float:
+        """Soma dos pesos dos valores agregados"""
+        return self._weight
 
     @property
     def average(self) -> float:
         """A média propriamente"""
         if not self._count:
             raise ValueError("no number aggregated")
-        return self._sum / self._count
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        """Variância amostral dos valores, ponderada pelos pesos"""
+        if self._count < 2:
+            raise ValueError("at least two numbers needed")
+        return self._m2 / self._weight * self._count / (self._count - 1)
+
+    @property
+    def stderr(self) -> float:
+        """Erro padrão da média"""
+        return sqrt(self.variance / self._count)
+
+    def interval(self, confidence: float = 0.95) -> Tuple[float, float]:
+        """Intervalo de confiança da média, pela aproximação normal
+
+        :param confidence: nível de confiança do intervalo
+        """
+        margin = normal_quantile((1.0 + confidence) / 2) * self.stderr
+        return self.average - margin, self.average + margin
 
     def insert(self, *nums: float) -> None:
         """Insere novos valores na média
 
         :param nums:
         """
-        self._sum += sum(nums)
-        self._count += len(nums)
+        for num in nums:
+            self.add(num)
+
+    def add(self, num: float, weight: float = 1.0) -> None:
+        """Insere um valor com peso na média
+
+        :param num:
+        :param weight: peso do valor, positivo
+        """
+        self._count += 1
+        self._weight += weight
+        delta = num - self._mean
+        self._mean += delta * weight / self._weight
+        self._m2 += weight * delta * (num - self._mean)
 
     def __iadd__(self, num: Union[float, Mean]) -> Mean:
         """Expansão da média com um :class:`float` ou um
@@ -49,8 +119,13 @@ class Mean:
         """
         if isinstance(num, float):
             self.insert(num)
-        else:
-            self._sum += num._sum
+        elif num._count:
+            # junção das duas medidas (Chan et al.)
+            weight = self._weight + num._weight
+            delta = num._mean - self._mean
+            self._mean += delta * num._weight / weight
+            self._m2 += num._m2 + delta * delta * self._weight * num._weight / weight
+            self._weight = weight
             self._count += num._count
 
         return self
@@ -61,12 +136,9 @@ class Mean:
 
         :param num:
         """
-        if isinstance(num, float):
-            new = Mean(num)
-        else:
-            new = Mean(num._sum)
-            new._count = num._count
+        new = Mean()
         new += self
+        new += num
         return new
 
     def __radd__(self, num: float) -> Mean:
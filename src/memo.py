@@ -0,0 +1,140 @@
+"""
+``memo.py``
+===========
+
+Cache dos resultados das buscas pela assinatura das
+velocidades sorteadas e enumeração exata das amostras
+quando há poucas combinações
+"""
+
+from __future__ import annotations
+
+from waze import CompiledWaze
+import street
+
+from array import array
+from collections import OrderedDict
+from itertools import product
+from typing import TypeVar, Generic, Sequence, Iterator, Tuple
+
+__all__ = ["LRUCache", "signature", "joint_size", "assignments"]
+
+
+# tipos genéricos de chave e valor
+K = TypeVar('K')
+V = TypeVar('V')
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Cache com remoção do item usado há mais tempo, com
+    contadores de acertos e falhas
+
+    :param maxsize: quantidade máxima de itens
+    """
+    __slots__ = ['_items', '_maxsize', 'hits', 'misses']
+
+    def __init__(self, maxsize: int = 1024):
+        self._items: OrderedDict[K, V] = OrderedDict()
+        self._maxsize = maxsize
+        #: buscas que encontraram o item
+        self.hits = 0
+        #: buscas que não encontraram o item
+        self.misses = 0
+
+    @property
+    def maxsize(self) -> int:
+        """quantidade máxima de itens"""
+        return self._maxsize
+
+    def __getitem__(self, key: K) -> V:
+        """Item da chave, que passa a ser o usado mais recentemente
+
+        :raises KeyError: se o item não estiver no cache
+        """
+        try:
+            value = self._items[key]
+        except KeyError:
+            self.misses += 1
+            raise
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key: K, value: V) -> None:
+        """Guarda o item, removendo o mais antigo se passar
+        do tamanho máximo"""
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self._maxsize:
+            self._items.popitem(last=False)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __repr__(self) -> str:
+        name = type(self).__name__
+        return f'{name}(size={len(self)}, hits={self.hits}, misses={self.misses})'
+
+
+def signature(times: Sequence[float], edges: Sequence[int]) -> bytes:
+    """Assinatura compacta dos tempos sorteados nas arestas
+    que variam entre as amostras
+
+    :param times: tempo de cada aresta
+    :param edges: as arestas que variam, como as de
+            :meth:`~waze.CompiledWaze.observed_edges`
+    """
+    return array('d', (times[edge] for edge in edges)).tobytes()
+
+
+def _options(graph: CompiledWaze, edge: int) -> Sequence[float]:
+    """possibilidades de velocidade de um trecho com registros"""
+    speeds = list(graph.latest_speeds(edge))
+    if street.INCLUDE_MAX_SPEED:
+        speeds.append(graph.max_speed[edge])
+    return speeds
+
+
+def joint_size(graph: CompiledWaze) -> int:
+    """Quantidade de combinações de velocidades possíveis
+    em uma amostra de :meth:`~waze.CompiledWaze.weights`"""
+    size = 1
+    for edge in graph.observed_edges():
+        size *= len(_options(graph, edge))
+    return size
+
+
+def assignments(graph: CompiledWaze) -> Iterator[Tuple[array[float], float]]:
+    """Todas as amostras possíveis de :meth:`~waze.CompiledWaze.weights`,
+    com a probabilidade de cada uma
+
+    Cada trecho com registros escolhe uma possibilidade com
+    probabilidade uniforme, independente dos outros, então a
+    probabilidade é o produto das de cada escolha. Possibilidades
+    repetidas aparecem em combinações separadas.
+
+    :return: iterador com os tempos e a probabilidade
+    """
+    inf = float('inf')
+    edges = graph.observed_edges()
+    # os trechos sem registros não mudam entre as amostras
+    times = graph.weights()
+
+    choices = []
+    for edge in edges:
+        distance = graph.distance[edge]
+        choices.append([distance / speed if speed else inf
+                        for speed in _options(graph, edge)])
+    probability = 1.0
+    for options in choices:
+        probability /= len(options)
+
+    for combination in product(*choices):
+        for edge, time in zip(edges, combination):
+            times[edge] = time
+        yield array('d', times), probability
@@ -0,0 +1,330 @@
+"""
+``observations.py``
+===================
+
+Velocidades registradas ao vivo, com o horário de cada
+registro, em uma janela de tempo
+
+Cada trecho com registros tem um buffer circular de tamanho
+fixo, em uma linha de uma matriz de
+`NumPy <https://numpy.org/>`_. Registros mais antigos que a
+janela expiram e, com o buffer cheio, os novos sobrescrevem os
+mais antigos, então a memória fica limitada mesmo com registros
+chegando sem parar.
+"""
+
+from __future__ import annotations
+
+from waze import CompiledWaze
+
+import numpy as np
+from array import array
+from time import time
+from typing import Optional, Callable, Union, Tuple
+
+__all__ = ["ObservationStore"]
+
+
+# horário de um ou de vários registros, em segundos
+Stamps = Union[float, np.ndarray]
+
+
+class ObservationStore:
+    """
+    Registros de velocidade com horário, por trecho, nos últimos
+    ``WINDOW`` segundos
+
+    A ordem dos registros de um trecho é a de chegada (e a do horário,
+    dentro de um mesmo :meth:`ingest`). Registros que chegam já fora da
+    janela são descartados. Um registro atrasado, com horário anterior
+    aos que já estão no trecho, expira junto com os registros que
+    chegaram antes dele.
+
+    As amostras leem os registros direto dos buffers, com
+    :meth:`population` e :meth:`select`, e :func:`sampling.sample_times`
+    chama :meth:`expire` antes de cada sorteio, então só os registros
+    dentro da janela são sorteados.
+
+    :param edges: quantidade de trechos do grafo
+    :param WINDOW: tamanho da janela, em segundos
+    :param CAPACITY: máximo de registros guardados por trecho
+    :param clock: horário atual, em segundos, para :meth:`expire`
+            e para os registros sem horário
+    """
+    __slots__ = ['_window', '_capacity', '_clock', '_row', '_edge', '_speeds',
+                 '_stamps', '_head', '_count', '_oldest', '_rows', '_version']
+
+    def __init__(self, edges: int, *, WINDOW: float = 600.0, CAPACITY: int = 16,
+                 clock: Callable[[], float] = time):
+        if WINDOW <= 0:
+            raise ValueError(f"window must be positive, got {WINDOW}")
+        if CAPACITY < 1:
+            raise ValueError(f"capacity must be at least 1, got {CAPACITY}")
+
+        self._window = float(WINDOW)
+        self._capacity = CAPACITY
+        self._clock = clock
+        # linha do buffer de cada trecho, ou -1 se ele nunca teve registros
+        self._row = np.full(edges, -1, dtype=np.intp)
+        # trecho, velocidades, horários, próxima posição de escrita e
+        # quantidade de registros válidos de cada linha
+        self._edge = np.empty(0, dtype=np.intp)
+        self._speeds = np.empty((0, CAPACITY))
+        self._stamps = np.empty((0, CAPACITY))
+        self._head = np.empty(0, dtype=np.intp)
+        self._count = np.empty(0, dtype=np.intp)
+        # limite inferior do horário dos registros válidos de cada linha
+        self._oldest = np.empty(0)
+        # linhas em uso
+        self._rows = 0
+        # muda a cada alteração nos registros
+        self._version = 0
+
+    @staticmethod
+    def from_graph(graph: CompiledWaze, *, stamp: Optional[float] = None,
+                   WINDOW: float = 600.0, CAPACITY: int = 16,
+                   clock: Callable[[], float] = time) -> ObservationStore:
+        """Registros iniciais com as velocidades registradas no grafo,
+        todas no horário ``stamp`` (ou no horário atual)"""
+        store = ObservationStore(graph.edge_count, WINDOW=WINDOW, CAPACITY=CAPACITY,
+                                 clock=clock)
+        offsets = np.asarray(graph.obs_offsets, dtype=np.intp)
+        edges = np.repeat(np.arange(graph.edge_count), np.diff(offsets))
+        if len(edges):
+            store.ingest(edges, np.asarray(graph.observations, dtype=np.float64),
+                         clock() if stamp is None else stamp)
+        return store
+
+    @property
+    def window(self) -> float:
+        """tamanho da janela, em segundos"""
+        return self._window
+
+    @property
+    def capacity(self) -> int:
+        """máximo de registros guardados por trecho"""
+        return self._capacity
+
+    @property
+    def edge_count(self) -> int:
+        """quantidade de trechos do grafo"""
+        return len(self._row)
+
+    @property
+    def version(self) -> int:
+        """contador de alterações, para saber se os registros mudaram"""
+        return self._version
+
+    @property
+    def nbytes(self) -> int:
+        """memória usada pelos buffers, em bytes"""
+        columns = (self._row, self._edge, self._speeds, self._stamps,
+                   self._head, self._count, self._oldest)
+        return sum(column.nbytes for column in columns)
+
+    def __len__(self) -> int:
+        """Quantidade de registros guardados"""
+        return int(self._count[:self._rows].sum())
+
+    def _grow(self, rows: int) -> None:
+        """espaço para pelo menos ``rows`` linhas, dobrando os buffers"""
+        size = len(self._edge)
+        if rows <= size:
+            return
+
+        size = max(rows, 2 * size, 16)
+        used = self._rows
+        for name in ('_edge', '_speeds', '_stamps', '_head', '_count', '_oldest'):
+            old: np.ndarray = getattr(self, name)
+            new = np.zeros((size,) + old.shape[1:], dtype=old.dtype)
+            new[:used] = old[:used]
+            setattr(self, name, new)
+
+    def _rows_of(self, edges: np.ndarray) -> np.ndarray:
+        """linhas dos trechos, criando as que faltam"""
+        new = np.unique(edges[self._row[edges] < 0])
+        if len(new):
+            start = self._rows
+            self._grow(start + len(new))
+            created = np.arange(start, start + len(new))
+            self._row[new] = created
+            self._edge[created] = new
+            self._head[created] = 0
+            self._count[created] = 0
+            self._oldest[created] = np.inf
+            self._rows += len(new)
+        rows: np.ndarray = self._row[edges]
+        return rows
+
+    def ingest(self, edges: np.ndarray, speeds: np.ndarray,
+               stamps: Optional[Stamps] = None) -> int:
+        """Registra velocidades em vários trechos de uma vez
+
+        :param edges: trecho de cada registro
+        :param speeds: velocidade de cada registro
+        :param stamps: horário de cada registro, um horário para todos
+                ou nenhum, para o horário atual
+        :return: quantidade de registros guardados, sem os que
+                chegaram fora da janela
+        :raises IndexError: se algum trecho não existir
+        """
+        edges = np.asarray(edges, dtype=np.intp).reshape(-1)
+        speeds = np.asarray(speeds, dtype=np.float64).reshape(-1)
+        if len(edges) != len(speeds):
+            raise ValueError(f"{len(edges)} edges for {len(speeds)} speeds")
+        if not len(edges):
+            return 0
+        if edges.min() < 0 or edges.max() >= self.edge_count:
+            raise IndexError(f"edge out of range: {edges.max()}")
+
+        now = self._clock()
+        times = np.broadcast_to(np.asarray(now if stamps is None else stamps,
+                                           dtype=np.float64), edges.shape)
+        fresh = times >= now - self._window
+        if not fresh.all():
+            edges, speeds, times = edges[fresh], speeds[fresh], times[fresh]
+            if not len(edges):
+                return 0
+
+        # registros agrupados por trecho, na ordem do horário
+        order = np.lexsort((times, edges))
+        edges, speeds, times = edges[order], speeds[order], times[order]
+
+        total = len(edges)
+        starts = np.flatnonzero(np.diff(edges, prepend=-1))
+        sizes = np.diff(starts, append=total)
+        rank = np.arange(total) - np.repeat(starts, sizes)
+        rows = self._rows_of(edges)
+
+        # só os últimos CAPACITY registros de cada trecho ficam no buffer,
+        # então cada posição é escrita uma vez só
+        capacity = self._capacity
+        keep = rank >= np.repeat(sizes - capacity, sizes)
+        positions = (self._head[rows] + rank) % capacity
+        self._speeds[rows[keep], positions[keep]] = speeds[keep]
+        self._stamps[rows[keep], positions[keep]] = times[keep]
+
+        written = rows[starts]
+        # os horários estão em ordem dentro de cada trecho
+        self._oldest[written] = np.where(self._count[written] > 0,
+                                         np.minimum(self._oldest[written], times[starts]),
+                                         times[starts])
+        self._head[written] = (self._head[written] + sizes) % capacity
+        self._count[written] = np.minimum(self._count[written] + sizes, capacity)
+        self._version += 1
+        return total
+
+    def register(self, edge: int, *speeds: float, stamp: Optional[float] = None) -> None:
+        """Registra velocidades em um trecho, como em
+        :meth:`street.Street.register_speeds`"""
+        self.ingest(np.full(len(speeds), edge, dtype=np.intp), np.array(speeds), stamp)
+
+    def _first(self, rows: np.ndarray) -> np.ndarray:
+        """posição do registro mais antigo de cada linha"""
+        first: np.ndarray = (self._head[rows] - self._count[rows]) % self._capacity
+        return first
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Descarta os registros fora da janela
+
+        :param now: horário atual, se for diferente de ``clock``
+        :return: quantidade de registros descartados
+        """
+        rows = self._rows
+        if not rows:
+            return 0
+        cutoff = (self._clock() if now is None else now) - self._window
+
+        # só as linhas que podem ter registros fora da janela
+        candidates = np.flatnonzero((self._count[:rows] > 0)
+                                    & (self._oldest[:rows] < cutoff))
+        if not len(candidates):
+            return 0
+
+        # registros em ordem de chegada, do mais antigo
+        count = self._count[candidates]
+        logical = np.arange(self._capacity)
+        slots = (self._first(candidates)[:, None] + logical) % self._capacity
+        stale = ((self._stamps[candidates[:, None], slots] < cutoff)
+                 & (logical < count[:, None]))
+
+        # descarta até o último registro fora da janela
+        expired = np.where(stale.any(axis=1),
+                           self._capacity - np.argmax(stale[:, ::-1], axis=1), 0)
+        self._count[candidates] = count - expired
+        valid = (logical >= expired[:, None]) & (logical < count[:, None])
+        remaining = np.where(valid,
+                             self._stamps[candidates[:, None], slots], np.inf)
+        self._oldest[candidates] = remaining.min(axis=1)
+        if not expired.any():
+            return 0
+        self._version += 1
+        return int(expired.sum())
+
+    def latest_speeds(self, edge: int) -> np.ndarray:
+        """Velocidades guardadas no trecho, da mais antiga para a
+        mais recente"""
+        row = self._row[edge]
+        if row < 0:
+            return np.empty(0)
+        slots = (self._first(row) + np.arange(self._count[row])) % self._capacity
+        speeds: np.ndarray = self._speeds[row, slots]
+        return speeds
+
+    def observed_edges(self) -> np.ndarray:
+        """Trechos com registros guardados, em ordem"""
+        rows = np.flatnonzero(self._count[:self._rows] > 0)
+        return np.sort(self._edge[rows])
+
+    def population(self) -> Tuple[np.ndarray, np.ndarray]:
+        """População atual das amostras, sem cópia dos registros
+
+        :return: os trechos com registros, em ordem, e a quantidade
+                de registros de cada um, para as escolhas de
+                :meth:`select`
+        """
+        edges = self.observed_edges()
+        return edges, self._count[self._row[edges]]
+
+    def select(self, edges: np.ndarray, choices: np.ndarray) -> np.ndarray:
+        """Velocidades escolhidas nos buffers
+
+        :param edges: trechos de :meth:`population`
+        :param choices: índice do registro escolhido em cada trecho,
+                entre zero e a quantidade de registros, em uma matriz
+                com uma coluna por trecho
+        :return: a velocidade de cada escolha, no formato de ``choices``
+        """
+        rows = self._row[edges]
+        slots = (self._first(rows) + choices) % self._capacity
+        speeds: np.ndarray = self._speeds[rows, slots]
+        return speeds
+
+    def compile(self, graph: CompiledWaze) -> CompiledWaze:
+        """Grafo compilado com as velocidades guardadas no lugar
+        das registradas em ``graph``
+
+        É uma cópia dos registros, para as execuções em outros
+        processos (veja :meth:`shared.SharedWaze.update`). O grafo
+        compartilha a topologia, as distâncias e as velocidades
+        máximas com ``graph``.
+        """
+        edges, counts = self.population()
+        rows = self._row[edges]
+        logical = np.arange(self._capacity)
+        slots = (self._first(rows)[:, None] + logical) % self._capacity
+        speeds = self._speeds[rows[:, None], slots][logical < counts[:, None]]
+
+        offsets = np.zeros(graph.edge_count + 1, dtype=np.int64)
+        offsets[edges + 1] = counts
+        np.cumsum(offsets, out=offsets)
+
+        obs_offsets, observations = array('l'), array('d')
+        obs_offsets.frombytes(offsets.astype(np.dtype('l')).tobytes())
+        observations.frombytes(speeds.astype(np.float64).tobytes())
+        return CompiledWaze(graph.names, graph.offsets, graph.targets, graph.distance,
+                            graph.max_speed, obs_offsets, observations)
+
+    def __repr__(self) -> str:
+        return (f'{type(self).__name__}({self.edge_count}, WINDOW={self._window!r}, '
+                f'CAPACITY={self._capacity!r})')
@@ -0,0 +1,304 @@
+"""
+``parser.py``
+=============
+
+Leitura rápida da entrada do problema, direto para
+o grafo compilado (:class:`~waze.CompiledWaze`)
+
+As linhas são lidas como `bytes` e os números de cada
+seção são convertidos de uma vez com
+`NumPy <https://numpy.org/>`_, sem passar por
+:class:`~waze.Waze` e :class:`~street.Street`.
+"""
+
+from __future__ import annotations
+
+from waze import CompiledWaze
+
+import os
+import mmap
+import numpy as np
+from array import array
+from typing import Any, Sequence, Dict, List, Tuple, Union
+
+__all__ = ["parse", "speeds", "observe", "load"]
+
+
+# entrada lida: o grafo, a origem, o destino e o resto da entrada
+Parsed = Tuple[CompiledWaze, str, str, bytes]
+# campos de cada linha de uma seção
+Rows = List[List[bytes]]
+# entrada completa, em `bytes` ou em um `buffer` sem cópia
+Input = Union[bytes, mmap.mmap, memoryview]
+
+#: tamanho dos blocos lidos de uma vez de entradas em `buffers`
+CHUNK = 1 << 24
+
+
+def _column(typecode: str, values: np.ndarray) -> array[Any]:
+    """coluna contígua no mesmo formato de :meth:`waze.Waze.compile`"""
+    column = array(typecode)
+    column.frombytes(values.astype(np.dtype(typecode)).tobytes())
+    return column
+
+
+def _section(fields: Sequence[List[bytes]], short: np.ndarray, start: int
+             ) -> Tuple[Rows, int]:
+    """Linhas com pelo menos dois campos a partir de ``start``
+
+    :param fields: os campos de cada linha
+    :param short: posições das linhas com menos de dois campos, em ordem
+    :return: os campos de cada linha da seção e a posição da primeira
+            linha fora dela
+    """
+    pos = int(np.searchsorted(short, start))
+    end = int(short[pos]) if pos < len(short) else len(fields)
+    return list(fields[start:end]), end
+
+
+def _numbers(rows: Rows) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Converte de uma vez os campos depois dos dois nós de cada linha
+
+    :return: os números de todas as linhas, a quantidade de números
+            em cada linha e a quantidade de linhas válidas, antes do
+            primeiro campo que não é número
+    """
+    counts = np.array([len(row) - 2 for row in rows], dtype=np.intp)
+    fields = [value for row in rows for value in row[2:]]
+    try:
+        return np.array(fields, dtype=bytes).astype(np.float64), counts, len(rows)
+    except ValueError:
+        pass
+
+    # procura a primeira linha com erro, só quando precisa
+    valid = 0
+    for valid, row in enumerate(rows):
+        try:
+            for value in row[2:]:
+                float(value)
+        except ValueError:
+            break
+    values, counts, _ = _numbers(rows[:valid])
+    return values, counts, valid
+
+
+def _missing(row: List[bytes]) -> KeyError:
+    """erro de um trecho inexistente, como em :meth:`waze.Waze.latest_speeds`"""
+    return KeyError((row[0].decode(), row[1].decode()))
+
+
+def _offsets(groups: np.ndarray, size: int) -> np.ndarray:
+    """início de cada grupo, com os itens ordenados pelo grupo"""
+    offsets = np.zeros(size + 1, dtype=np.intp)
+    np.cumsum(np.bincount(groups, minlength=size), out=offsets[1:])
+    return offsets
+
+
+def _observations(fields: Sequence[List[bytes]], short: np.ndarray, start: int,
+                  index: Dict[bytes, int], edge_pairs: np.ndarray, nodes: int
+                  ) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Seção das velocidades registradas, a partir de ``start``
+
+    :param index: índice de cada nó, pelo nome
+    :param edge_pairs: ``origem * nodes + alvo`` de cada aresta
+    :param nodes: quantidade de nós
+    :return: o trecho e o valor de cada velocidade, na ordem da
+            entrada, e a posição da linha com a origem
+    """
+    observed, end = _section(fields, short, start)
+    values, counts, valid = _numbers(observed)
+    # a linha inválida vira a origem
+    if valid < len(observed):
+        observed, end = observed[:valid], start + valid
+
+    for row in observed:
+        if row[0] not in index or row[1] not in index:
+            raise _missing(row)
+    requested = np.array([index[row[0]] * nodes + index[row[1]] for row in observed],
+                         dtype=np.intp)
+
+    # trecho de cada linha, pela busca binária nos pares de nós
+    by_pair = np.argsort(edge_pairs)
+    found = np.searchsorted(edge_pairs, requested, sorter=by_pair)
+    if len(edge_pairs):
+        targets = by_pair[np.minimum(found, len(edge_pairs) - 1)]
+        invalid = np.flatnonzero(edge_pairs[targets] != requested)
+    else:
+        targets, invalid = found, np.arange(len(requested))
+    if len(invalid):
+        raise _missing(observed[invalid[0]])
+
+    return np.repeat(targets, counts), values, end
+
+
+def _query(lines: Sequence[bytes], end: int) -> Tuple[str, str, bytes]:
+    """origem e destino, vazios no fim da entrada, e o resto dela"""
+    source = lines[end].strip().decode() if end < len(lines) else ''
+    destination = lines[end + 1].strip().decode() if end + 1 < len(lines) else ''
+    return source, destination, b'\n'.join(lines[end + 2:])
+
+
+def _lines(data: Input) -> List[bytes]:
+    """linhas da entrada, como em ``bytes.split(b'\\n')``, mas sem copiar
+    a entrada inteira de uma vez quando ela é um `buffer`, como o
+    :class:`mmap.mmap` de :func:`load`, que é lido em blocos de
+    :data:`CHUNK` bytes"""
+    if isinstance(data, bytes):
+        return data.split(b'\n')
+
+    lines: List[bytes] = []
+    tail = b''
+    with memoryview(data) as view:
+        for start in range(0, len(view), CHUNK):
+            # a última linha do bloco pode continuar no próximo
+            *complete, tail = (tail + view[start:start + CHUNK].tobytes()).split(b'\n')
+            lines.extend(complete)
+    lines.append(tail)
+    return lines
+
+
+def _split(data: Input) -> Tuple[List[bytes], List[List[bytes]], np.ndarray]:
+    """linhas, os campos de cada uma e as posições das linhas com
+    menos de dois campos"""
+    lines = _lines(data)
+    # todas as linhas são separadas de uma vez
+    fields = [line.split() for line in lines]
+    short = np.flatnonzero(np.fromiter(map(len, fields), np.intp, len(fields)) < 2)
+    return lines, fields, short
+
+
+def parse(data: Input) -> Parsed:
+    """Lê a entrada completa, com as mesmas regras de
+    :func:`main.read_waze` e :func:`main.read_latest_speeds`
+
+    A seção do grafo e a das velocidades terminam na primeira linha
+    com menos de dois campos ou com um campo numérico inválido. Essa
+    linha é descartada no grafo e vira a origem nas velocidades. Os
+    nós recebem índices na ordem em que aparecem, trechos repetidos
+    ficam com os valores da última linha e velocidades repetidas em
+    um trecho se acumulam, como em :meth:`waze.Waze.compile`.
+
+    :param data: a entrada completa, em `bytes` ou em um `buffer`, como
+            um :class:`mmap.mmap`, que é lido sem ser copiado inteiro
+    :return: o grafo compilado, a origem, o destino e o resto da
+            entrada depois deles, como em :func:`main.read_queries`
+    :raises KeyError: se houver velocidades de um trecho inexistente
+    """
+    lines, fields, short = _split(data)
+    default_speed = float(lines[0].strip())
+
+    # seção do grafo, sem a linha inválida
+    streets, end = _section(fields, short, 1)
+    values, counts, valid = _numbers(streets)
+    if valid < len(streets):
+        streets, end = streets[:valid], 1 + valid
+    for row, count in zip(streets, counts.tolist()):
+        if not 1 <= count <= 2:
+            raise TypeError(f"invalid street: {b' '.join(row).decode()}")
+
+    starts = np.cumsum(counts) - counts
+    distance = values[starts]
+    # velocidade nula é a padrão, como em :meth:`waze.Waze.new_street`
+    speed = np.where(counts > 1, values[np.minimum(starts + 1, len(values) - 1)], 0.0)
+    speed[speed == 0.0] = default_speed
+
+    # nós na ordem em que aparecem
+    keys = np.array([key for row in streets for key in row[:2]], dtype=bytes)
+    unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    ends = rank[inverse.reshape(-1)].reshape(-1, 2)
+    nodes = len(order)
+
+    # trechos repetidos ficam na posição da primeira linha,
+    # com os valores da última
+    pairs = ends[:, 0] * nodes + ends[:, 1]
+    unique_pairs, pair_first, pair_inverse = np.unique(pairs, return_index=True,
+                                                       return_inverse=True)
+    pair_last = np.zeros(len(unique_pairs), dtype=np.intp)
+    np.maximum.at(pair_last, pair_inverse.reshape(-1), np.arange(len(pairs)))
+    sources = ends[pair_first, 0]
+    rows = pair_last[np.lexsort((pair_first, sources))]
+
+    offsets = _offsets(sources, nodes)
+
+    # seção das velocidades e origem e destino depois dela
+    index: Dict[bytes, int] = dict(zip(unique[order].tolist(), range(nodes)))
+    speed_edges, observations, end = _observations(fields, short, end + 1, index,
+                                                   pairs[rows], nodes)
+    obs_offsets = _offsets(speed_edges, len(rows))
+    observations = observations[np.argsort(speed_edges, kind='stable')]
+
+    source, destination, rest = _query(lines, end)
+
+    names = [key.decode() for key in unique[order].tolist()]
+    graph = CompiledWaze(names, _column('l', offsets), _column('l', ends[rows, 1]),
+                         _column('d', distance[rows]), _column('d', speed[rows]),
+                         _column('l', obs_offsets), _column('d', observations))
+    return graph, source, destination, rest
+
+
+def _speed_section(graph: CompiledWaze, data: Input
+                   ) -> Tuple[np.ndarray, np.ndarray, List[bytes], int]:
+    """trecho e valor de cada velocidade da seção no início de ``data``,
+    as linhas e a posição da linha depois da seção"""
+    lines, fields, short = _split(data)
+    nodes = len(graph)
+    index = {name.encode(): node for node, name in enumerate(graph.names)}
+
+    offsets = np.asarray(graph.offsets, dtype=np.intp)
+    sources = np.repeat(np.arange(nodes), np.diff(offsets))
+    edge_pairs = sources * nodes + np.asarray(graph.targets, dtype=np.intp)
+    speed_edges, values, end = _observations(fields, short, 0, index, edge_pairs, nodes)
+    return speed_edges, values, lines, end
+
+
+def speeds(graph: CompiledWaze, data: Input) -> Tuple[np.ndarray, np.ndarray]:
+    """Lê só a seção das velocidades registradas, com os trechos
+    de um grafo já compilado
+
+    :return: o trecho e o valor de cada velocidade, na ordem da
+            entrada, como em :meth:`observations.ObservationStore.ingest`
+    :raises KeyError: se houver velocidades de um trecho inexistente
+    """
+    speed_edges, values, *_ = _speed_section(graph, data)
+    return speed_edges, values
+
+
+def observe(graph: CompiledWaze, data: Input) -> Parsed:
+    """Lê só a seção das velocidades registradas, seguida da origem e
+    do destino, e aplica as velocidades sobre um grafo já compilado,
+    como o de :func:`snapshot.load`
+
+    As velocidades novas de cada trecho vêm depois das que ele já
+    tinha. O grafo retornado é novo, mas compartilha a topologia, as
+    distâncias e as velocidades máximas com ``graph``.
+
+    :return: o mesmo de :func:`parse`
+    """
+    speed_edges, values, lines, end = _speed_section(graph, data)
+
+    # as velocidades que o grafo já tinha vêm antes
+    old_offsets = np.asarray(graph.obs_offsets, dtype=np.intp)
+    old_edges = np.repeat(np.arange(graph.edge_count), np.diff(old_offsets))
+    edges = np.concatenate((old_edges, speed_edges))
+    values = np.concatenate((np.asarray(graph.observations, dtype=np.float64), values))
+    observations = values[np.argsort(edges, kind='stable')]
+
+    source, destination, rest = _query(lines, end)
+    observed = CompiledWaze(graph.names, graph.offsets, graph.targets,
+                            graph.distance, graph.max_speed,
+                            _column('l', _offsets(edges, graph.edge_count)),
+                            _column('d', observations))
+    return observed, source, destination, rest
+
+
+def load(path: str) -> Parsed:
+    """Lê a entrada de um arquivo mapeado em memória, veja :func:`parse`"""
+    with open(path, 'rb') as file:
+        # arquivos vazios não podem ser mapeados
+        if not os.fstat(file.fileno()).st_size:
+            return parse(b'')
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return parse(data)
@@ -8,7 +8,7 @@ a checagem estática de tipo com o `mypy <https://mypy.readthedocs.io/>`_
 
 from __future__ import annotations
 
-from typing import TypeVar, Hashable, TYPE_CHECKING
+from typing import TypeVar, Generic, Hashable, Iterator, Sequence, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from typing_extensions import Protocol, Literal
@@ -19,7 +19,9 @@ else:
 __all__ = [
     "Comparable", "Orderable",
     "Keyable", "Additive",
-    "Weightable", "Literal"
+    "Weightable", "FloatWeightable",
+    "KeyHeap", "Searchable", "Weighted",
+    "Literal"
 ]
 
 
@@ -85,3 +87,128 @@ class Weightable(Additive, Protocol):
         """Teste se o peso representa uma aresta não acessível,
         como ``float('inf')``"""
         ...
+
+
+class FloatWeightable(Weightable, Protocol):
+    """Pesos que podem ser reduzidos a um :class:`float`, com
+    :func:`float`
+    """
+
+    def __float__(self) -> float:
+        """conversão para :class:`float`, com infinito representando
+        uma aresta não acessível"""
+        ...
+
+
+# tipo dos itens das filas de prioridade
+T = TypeVar('T', bound='Keyable')
+
+class KeyHeap(Protocol, Generic[T, Ord]):
+    """Filas de prioridade de mínimo indexadas pelos itens, com
+    `decrease-key`, como :class:`~heap.IndexedHeap` e
+    :class:`~heap.PairingHeap`
+
+    Cada item aparece no máximo uma vez e tem uma prioridade
+    associada. Diferente de :class:`~heap.MinHeap`, os itens não
+    precisam ser ordenáveis, só as prioridades.
+    """
+
+    def push(self, item: T, priority: Ord) -> None:
+        """Insere um item novo na fila
+
+        :raises KeyError: se o item já está na fila
+        """
+        ...
+
+    def pop(self) -> Tuple[Ord, T]:
+        """Remove o item de menor prioridade
+
+        :return: a prioridade e o item
+        """
+        ...
+
+    def peek(self) -> Tuple[Ord, T]:
+        """Observa o item de menor prioridade sem removê-lo"""
+        ...
+
+    def priority(self, item: T) -> Ord:
+        """Prioridade atual do item
+
+        :raises KeyError: se o item não está na fila
+        """
+        ...
+
+    def decrease_key(self, item: T, priority: Ord) -> None:
+        """Diminui a prioridade de um item que já está na fila
+
+        :raises KeyError: se o item não está na fila
+        :raises ValueError: se a prioridade nova é maior que a atual
+        """
+        ...
+
+    def __len__(self) -> int:
+        """quantidade de itens na fila"""
+        ...
+
+    def __contains__(self, item: object) -> bool:
+        """se o item está na fila"""
+        ...
+
+    def __iter__(self) -> Iterator[T]:
+        """itera os itens em ordem crescente de prioridade"""
+        ...
+
+class Searchable(Protocol):
+    """Grafos compilados no formato CSR, com nós e arestas indexados
+    por inteiros, como :class:`~graph.compiled.CompiledGraph`, que as
+    buscas de :mod:`graph` percorrem
+    """
+
+    @property
+    def offsets(self) -> Sequence[int]:
+        """início das arestas de cada nó"""
+        ...
+
+    @property
+    def targets(self) -> Sequence[int]:
+        """nó alvo de cada aresta"""
+        ...
+
+    @property
+    def edge_count(self) -> int:
+        """quantidade de arestas no grafo"""
+        ...
+
+    def reverse(self) -> Tuple[Sequence[int], Sequence[int], Sequence[int]]:
+        """índice reverso do grafo, também em CSR"""
+        ...
+
+    def __len__(self) -> int:
+        """quantidade de nós"""
+        ...
+
+
+# tipo genérico de chave dos nós
+K = TypeVar('K', bound='Keyable')
+
+class Weighted(Searchable, Protocol, Generic[K]):
+    """Grafos compilados com um peso atual para cada aresta, como
+    :class:`~waze.CompiledWaze`, buscados pelas chaves dos nós
+    """
+
+    def __contains__(self, key: object) -> bool:
+        """operador ``in``, com a chave do nó"""
+        ...
+
+    def id(self, key: K) -> int:
+        """identificador inteiro do nó de chave ``key``"""
+        ...
+
+    def key(self, node: int) -> K:
+        """chave do nó de identificador ``node``"""
+        ...
+
+    def weights(self) -> Sequence[float]:
+        """peso atual de cada aresta, como :class:`float`,
+        indexado pelas arestas"""
+        ...
@@ -0,0 +1,207 @@
+"""
+``prune.py``
+============
+
+Redução do grafo compilado para uma consulta, antes
+das amostras
+"""
+
+from __future__ import annotations
+
+from waze import CompiledWaze
+import street
+
+from array import array
+from collections import deque
+from typing import Sequence, Dict, List, Set, Tuple
+
+__all__ = ["PrunedWaze", "closed_edges", "prune"]
+
+
+# trecho do grafo reduzido: distância, velocidade máxima, trecho
+# original (ou -1, se for uma cadeia contraída) e os nós no meio
+Link = Tuple[float, float, int, Tuple[int, ...]]
+
+
+class PrunedWaze(CompiledWaze):
+    """
+    Grafo do Waze reduzido para uma consulta, com as cadeias de
+    trechos contraídas em um trecho só
+
+    :param via: nós no meio de cada trecho contraído, pelas
+            chaves dos extremos
+    """
+    __slots__ = ['_via']
+
+    def __init__(self, names: Sequence[str],
+                 offsets: Sequence[int],
+                 targets: Sequence[int],
+                 distance: Sequence[float],
+                 max_speed: Sequence[float],
+                 obs_offsets: Sequence[int],
+                 observations: Sequence[float],
+                 via: Dict[Tuple[str, str], Tuple[str, ...]]):
+        super().__init__(names, offsets, targets, distance,
+                         max_speed, obs_offsets, observations)
+        self._via = via
+
+    @property
+    def via(self) -> Dict[Tuple[str, str], Tuple[str, ...]]:
+        """nós no meio de cada trecho contraído"""
+        return self._via
+
+    def expand(self, path: Sequence[str]) -> Tuple[str, ...]:
+        """Caminho no grafo original, com os nós das cadeias contraídas"""
+        if not path:
+            return ()
+
+        nodes = [path[0]]
+        for from_, to in zip(path, path[1:]):
+            nodes.extend(self._via.get((from_, to), ()))
+            nodes.append(to)
+        return tuple(nodes)
+
+
+def closed_edges(graph: CompiledWaze) -> Set[int]:
+    """Trechos fechados em qualquer amostra, em que todas as
+    velocidades possíveis são nulas"""
+    include_max = street.INCLUDE_MAX_SPEED
+    closed: Set[int] = set()
+    for edge, speed in enumerate(graph.max_speed):
+        speeds = graph.latest_speeds(edge)
+        if speeds and not include_max:
+            if not any(speeds):
+                closed.add(edge)
+        elif not speed and not any(speeds):
+            closed.add(edge)
+    return closed
+
+
+def _reachable(start: int, adjacency: Sequence[Dict[int, int]]) -> Set[int]:
+    """nós alcançáveis a partir de ``start``"""
+    seen = {start}
+    stack = [start]
+    while stack:
+        node = stack.pop()
+        for neighbor in adjacency[node]:
+            if neighbor not in seen:
+                seen.add(neighbor)
+                stack.append(neighbor)
+    return seen
+
+
+def prune(graph: CompiledWaze, source: str, dest: str) -> CompiledWaze:
+    """Reduz o grafo para os caminhos de ``source`` até ``dest``
+
+    Os trechos sempre fechados saem do grafo, assim como os nós que
+    não estão em nenhum caminho da origem até o destino (que não são
+    alcançados pela origem ou não alcançam o destino). Depois, cada nó
+    intermediário ligado só a dois vizinhos, por trechos sem velocidades
+    registradas, é contraído: os trechos que passam por ele viram um
+    só, com a soma das distâncias e a velocidade que mantém a soma dos
+    tempos (média harmônica ponderada).
+
+    Contrações que criariam trechos paralelos não são feitas, então
+    cada par de nós do caminho identifica o trecho usado e os nós
+    contraídos voltam com :meth:`PrunedWaze.expand`.
+
+    :return: o grafo reduzido ou o próprio grafo, se a origem ou o
+            destino não existirem
+    """
+    if source not in graph or dest not in graph:
+        return graph
+
+    closed = closed_edges(graph)
+    nodes = len(graph)
+    # trechos abertos, pelos nós de origem e destino
+    forward: List[Dict[int, int]] = [{} for _ in range(nodes)]
+    backward: List[Dict[int, int]] = [{} for _ in range(nodes)]
+    for node in range(nodes):
+        for edge, target in graph.neighbors(node):
+            if edge not in closed:
+                forward[node][target] = edge
+                backward[target][node] = edge
+
+    start, end = graph.id(source), graph.id(dest)
+    kept = _reachable(start, forward) & _reachable(end, backward)
+    kept.update((start, end))
+
+    out: Dict[int, Dict[int, Link]] = {node: {} for node in kept}
+    into: Dict[int, Set[int]] = {node: set() for node in kept}
+    for node in kept:
+        for target, edge in forward[node].items():
+            if target in kept:
+                link = graph.distance[edge], graph.max_speed[edge], edge, ()
+                out[node][target] = link
+                into[target].add(node)
+
+    def deterministic(link: Link) -> bool:
+        return link[2] < 0 or not graph.latest_speeds(link[2])
+
+    # contração das cadeias
+    queue = deque(node for node in sorted(kept) if node not in (start, end))
+    while queue:
+        node = queue.popleft()
+        if node not in out:
+            continue
+        neighbors = set(out[node]) | into[node]
+        if len(neighbors) != 2 or node in neighbors:
+            continue
+        links = [out[node][target] for target in out[node]]
+        links.extend(out[other][node] for other in into[node])
+        if not all(map(deterministic, links)):
+            continue
+
+        first, second = neighbors
+        # passagens pelo nó, sem os retornos
+        passes = [(a, b) for a, b in ((first, second), (second, first))
+                  if node in out[a] and b in out[node]]
+        if any(b in out[a] for a, b in passes):
+            continue
+
+        for a, b in passes:
+            d1, s1, _, via1 = out[a][node]
+            d2, s2, _, via2 = out[node][b]
+            distance, time = d1 + d2, d1 / s1 + d2 / s2
+            speed = distance / time if time else 1.0
+            out[a][b] = distance, speed, -1, via1 + (node,) + via2
+            into[b].add(a)
+
+        for target in out[node]:
+            into[target].discard(node)
+        for other in into[node]:
+            del out[other][node]
+        del out[node], into[node]
+        queue.extend(neighbor for neighbor in neighbors if neighbor not in (start, end))
+
+    return _build(graph, out)
+
+
+def _build(graph: CompiledWaze, out: Dict[int, Dict[int, Link]]) -> PrunedWaze:
+    """monta o grafo reduzido, com os nós na ordem original"""
+    order = sorted(out)
+    index = {node: idx for idx, node in enumerate(order)}
+    names = [graph.key(node) for node in order]
+
+    offsets = array('l', [0])
+    targets = array('l')
+    distance = array('d')
+    max_speed = array('d')
+    obs_offsets = array('l', [0])
+    observations = array('d')
+    via: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+
+    for node in order:
+        for target, (length, speed, edge, middle) in out[node].items():
+            targets.append(index[target])
+            distance.append(length)
+            max_speed.append(speed)
+            if edge >= 0:
+                observations.extend(graph.latest_speeds(edge))
+            obs_offsets.append(len(observations))
+            if middle:
+                via[graph.key(node), graph.key(target)] = tuple(map(graph.key, middle))
+        offsets.append(len(targets))
+
+    return PrunedWaze(names, offsets, targets, distance, max_speed,
+                      obs_offsets, observations, via)
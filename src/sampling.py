@@ -0,0 +1,230 @@
+"""
+``sampling.py``
+===============
+
+Amostragem vetorizada das velocidades dos trechos
+com `NumPy <https://numpy.org/>`_, sorteando todas as
+execuções de uma vez
+"""
+
+from __future__ import annotations
+
+from waze import CompiledWaze
+from observations import ObservationStore
+import street
+
+import numpy as np
+from typing import Optional, Callable, Dict, Tuple
+
+__all__ = [
+    "speed_pool", "sample_speeds", "sample_times",
+    "uniform", "stratified", "antithetic", "halton", "STRATEGIES"
+]
+
+
+# gera a matriz ``runs x dims`` de uniformes em [0, 1)
+Strategy = Callable[[int, int, np.random.Generator], np.ndarray]
+
+
+def uniform(runs: int, dims: int, rng: np.random.Generator) -> np.ndarray:
+    """Sorteios independentes, como em :attr:`street.Street.speed`"""
+    return rng.random((runs, dims))
+
+
+def stratified(runs: int, dims: int, rng: np.random.Generator) -> np.ndarray:
+    """Hipercubo latino: em cada dimensão, cada execução cai em um
+    dos ``runs`` estratos de [0, 1), em ordem aleatória"""
+    strata = (np.arange(runs)[:, None] + rng.random((runs, dims))) / runs
+    return rng.permuted(strata, axis=0)
+
+
+def antithetic(runs: int, dims: int, rng: np.random.Generator) -> np.ndarray:
+    """Pares antitéticos: a segunda metade das execuções usa ``1 - u``
+    dos sorteios da primeira"""
+    half = rng.random(((runs + 1) // 2, dims))
+    # o complemento de 0 seria 1, fora do intervalo
+    mirror = np.where(half > 0.0, 1.0 - half, 0.0)
+    return np.concatenate((half, mirror))[:runs]
+
+
+def _primes(count: int) -> np.ndarray:
+    """os ``count`` primeiros primos"""
+    limit = max(16, int(count * (np.log(count + 1) + np.log(np.log(count + 2)) + 2)))
+    sieve = np.ones(limit, dtype=bool)
+    sieve[:2] = False
+    for num in range(2, int(limit ** 0.5) + 1):
+        if sieve[num]:
+            sieve[num * num::num] = False
+    return np.flatnonzero(sieve)[:count]
+
+
+def halton(runs: int, dims: int, rng: np.random.Generator) -> np.ndarray:
+    """Sequência de Halton embaralhada, com uma base prima por dimensão
+
+    Os dígitos de cada base passam por uma permutação linear
+    aleatória (``a * d + c mod b``) e o ponto todo recebe um
+    deslocamento aleatório módulo 1, que mantém cada execução
+    uniforme no hipercubo.
+    """
+    bases = _primes(dims)
+    factor = rng.integers(1, np.maximum(bases, 2))
+    offset = rng.integers(0, bases)
+
+    index = np.arange(1, runs + 1)[:, None] + np.zeros(dims, dtype=np.int64)
+    points = np.zeros((runs, dims))
+    scale = np.ones(dims)
+    while index.any():
+        scale = scale / bases
+        digits = (factor * (index % bases) + offset) % bases
+        points += digits * scale
+        index = index // bases
+
+    return (points + rng.random(dims)) % 1.0
+
+
+#: estratégias de amostragem de :func:`sample_speeds`
+STRATEGIES: Dict[str, Strategy] = {
+    'uniform': uniform,
+    'stratified': stratified,
+    'antithetic': antithetic,
+    'halton': halton,
+}
+
+
+def speed_pool(graph: CompiledWaze) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Possibilidades de velocidade de cada trecho, seguindo
+    :data:`street.INCLUDE_MAX_SPEED`
+
+    :param graph: o grafo compilado
+    :return:    todas as velocidades possíveis, concatenadas, o início
+                e a quantidade de possibilidades de cada trecho
+    """
+    offsets = np.asarray(graph.obs_offsets, dtype=np.intp)
+    pool = np.asarray(graph.observations, dtype=np.float64)
+
+    starts = offsets[:-1]
+    counts = np.diff(offsets)
+
+    if street.INCLUDE_MAX_SPEED:
+        # a velocidade máxima entra no final da lista de cada trecho
+        max_speed = np.asarray(graph.max_speed, dtype=np.float64)
+        pool = np.insert(pool, offsets[1:], max_speed)
+        starts = starts + np.arange(len(starts))
+        counts = counts + 1
+
+    return pool, starts, counts
+
+
+def _draw_live(graph: CompiledWaze, store: ObservationStore, runs: int,
+               rng: np.random.Generator, strategy: str) -> Tuple[np.ndarray, np.ndarray]:
+    """sorteio das velocidades dos trechos com registros na janela,
+    direto dos buffers de ``store``"""
+    store.expire()
+    edges, counts = store.population()
+    # a velocidade máxima é a escolha depois dos registros
+    options = counts + 1 if street.INCLUDE_MAX_SPEED else counts
+
+    choices = STRATEGIES[strategy](runs, len(edges), rng) * options
+    choices = np.minimum(choices.astype(np.intp), options - 1)
+    speeds = store.select(edges, np.minimum(choices, counts - 1))
+    if street.INCLUDE_MAX_SPEED:
+        max_speed = np.asarray(graph.max_speed, dtype=np.float64)[edges]
+        speeds = np.where(choices < counts, speeds, max_speed)
+    return edges, speeds
+
+
+def _draw(graph: CompiledWaze, runs: int, rng: Optional[np.random.Generator],
+          strategy: str, store: Optional[ObservationStore] = None
+          ) -> Tuple[np.ndarray, np.ndarray]:
+    """sorteio das velocidades só dos trechos que variam
+    (:meth:`~waze.CompiledWaze.observed_edges`)"""
+    if rng is None:
+        rng = np.random.default_rng()
+    if store is not None:
+        return _draw_live(graph, store, runs, rng, strategy)
+
+    pool, starts, counts = speed_pool(graph)
+    stochastic = np.asarray(graph.observed_edges(), dtype=np.intp)
+    counts, starts = counts[stochastic], starts[stochastic]
+
+    choices = STRATEGIES[strategy](runs, len(stochastic), rng) * counts
+    # arredondamentos não podem passar da última possibilidade
+    choices = np.minimum(choices.astype(np.intp), counts - 1)
+    return stochastic, pool[starts + choices]
+
+
+def sample_speeds(graph: CompiledWaze, runs: int, *,
+                  rng: Optional[np.random.Generator] = None,
+                  strategy: str = 'uniform',
+                  store: Optional[ObservationStore] = None
+                  ) -> np.ndarray:
+    """Sorteia as velocidades de todos os trechos para várias execuções
+
+    Cada trecho com possibilidades de velocidade recebe uma delas com
+    probabilidade uniforme, como em :attr:`street.Street.speed`. Os
+    outros ficam com a velocidade máxima.
+
+    A escolha vem de uma uniforme em [0, 1) por trecho sorteado, gerada
+    pela estratégia de :data:`STRATEGIES`. Em todas elas, cada execução
+    sozinha tem a mesma distribuição que na amostragem independente, e
+    as médias têm o mesmo valor esperado. O que muda é a correlação
+    entre as execuções, que reduz a variância das médias.
+
+    Com ``store``, as possibilidades de cada trecho são os registros
+    dentro da janela (:class:`~observations.ObservationStore`), no lugar
+    das velocidades registradas no grafo. Os registros expirados são
+    descartados antes do sorteio.
+
+    :param graph: o grafo compilado
+    :param runs: quantidade de execuções
+    :param rng: gerador aleatório, se for diferente do padrão
+    :param strategy: nome da estratégia de amostragem
+    :param store: registros ao vivo, com a mesma numeração de trechos
+    :return:    matriz ``runs x E`` com as velocidades sorteadas
+    """
+    stochastic, drawn = _draw(graph, runs, rng, strategy, store)
+
+    speeds = np.empty((runs, graph.edge_count))
+    speeds[:] = np.asarray(graph.max_speed, dtype=np.float64)
+    speeds[:, stochastic] = drawn
+    return speeds
+
+
+def sample_times(graph: CompiledWaze, runs: int, *,
+                 rng: Optional[np.random.Generator] = None,
+                 strategy: str = 'uniform',
+                 store: Optional[ObservationStore] = None
+                 ) -> np.ndarray:
+    """Tempo em cada trecho para várias execuções, com as velocidades
+    de :func:`sample_speeds`
+
+    Velocidades nulas (rua fechada) resultam em tempo infinito. Só os
+    trechos que variam são calculados, os outros vêm de
+    :meth:`~waze.CompiledWaze.static_times`.
+
+    :param graph: o grafo compilado
+    :param runs: quantidade de execuções
+    :param rng: gerador aleatório, se for diferente do padrão
+    :param strategy: nome da estratégia de amostragem
+    :param store: registros ao vivo, veja :func:`sample_speeds`
+    :return:    matriz ``runs x E`` com os tempos
+    """
+    stochastic, speeds = _draw(graph, runs, rng, strategy, store)
+    distance = np.asarray(graph.distance, dtype=np.float64)
+
+    times = np.empty((runs, graph.edge_count))
+    if store is None:
+        # os trechos fixos já têm o tempo calculado no grafo
+        times[:] = np.asarray(graph.static_times(), dtype=np.float64)
+    else:
+        # os registros do grafo não valem, todos usam a velocidade máxima
+        max_speed = np.asarray(graph.max_speed, dtype=np.float64)
+        base = np.full(graph.edge_count, np.inf)
+        np.divide(distance, max_speed, out=base, where=max_speed != 0)
+        times[:] = base
+    distance = distance[stochastic]
+
+    drawn = np.full(speeds.shape, np.inf)
+    np.divide(distance, speeds, out=drawn, where=speeds != 0)
+    times[:, stochastic] = drawn
+    return times
@@ -0,0 +1,382 @@
+"""
+``server.py``
+=============
+
+Servidor assíncrono de rotas, que mantém o grafo compilado
+e o `pool` de processos (:class:`shared.SharedWaze`) entre
+as consultas
+
+Cada mensagem é um objeto JSON em uma linha e cada resposta
+também, com o mesmo ``id`` da mensagem. As respostas podem
+vir fora de ordem. As operações são:
+
+``route``
+    ``{"op": "route", "id": 1, "source": "aa", "dest": "z", "runs": 100}``
+    responde os dois caminhos de menor média, com o tempo em
+    minutos, como em :func:`main.main`
+
+``observe``
+    ``{"op": "observe", "id": 2, "lines": ["aa b 12.5 11.3"], "time": 1700000000.0}``
+    registra velocidades nos trechos, no formato da entrada, para
+    as próximas consultas, no horário ``time`` (em segundos, o atual
+    se não for dado). Os registros valem só durante a janela do
+    servidor (:class:`observations.ObservationStore`) e chegam às
+    consultas em até ``REFRESH`` segundos (:class:`RoutingServer`)
+
+Toda resposta tem ``ok``, o erro (se ``ok`` for falso) e os tempos
+da requisição em segundos: na fila até começar a execução, na
+execução e o total.
+
+Uso::
+
+    python server.py MAPA [PORTA | CAMINHO_UNIX]
+"""
+
+from __future__ import annotations
+
+from waze import CompiledWaze
+from shared import SharedWaze
+from observations import ObservationStore
+from main import ENGINES, PREPARE, Result, aggregate, best_paths, shared_runs
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from typing import Optional, Callable, Sequence, Dict, List, Any
+
+__all__ = ["RoutingServer"]
+
+
+# mensagens recebidas e respostas
+Message = Dict[str, Any]
+
+
+async def _read_line(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """próxima linha da conexão, como em
+    :meth:`~asyncio.StreamReader.readline`, ou :obj:`None` se ela passar
+    do limite do ``reader``, depois de descartar a linha inteira"""
+    try:
+        return await reader.readuntil(b'\n')
+    except asyncio.IncompleteReadError as error:
+        # fim da conexão
+        return error.partial
+    except asyncio.LimitOverrunError as error:
+        consumed = error.consumed
+
+    try:
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b'\n')
+                return None
+            except asyncio.LimitOverrunError as error:
+                consumed = error.consumed
+    except asyncio.IncompleteReadError:
+        return None
+
+
+class RoutingServer:
+    """
+    Servidor de rotas sobre um grafo compilado
+
+    As amostras de cada consulta vão para o `pool` persistente e a
+    espera pelos resultados fica em `threads`, sem bloquear o `loop`
+    de eventos. No máximo ``MAXPENDING`` requisições são atendidas ao
+    mesmo tempo: com todas as vagas ocupadas, o servidor para de ler
+    as conexões, e os clientes sentem a pressão pelo próprio socket.
+
+    As velocidades do mapa e as recebidas depois ficam em uma
+    :class:`~observations.ObservationStore`. Antes de cada consulta, os
+    registros fora da janela expiram e, se algo mudou, o grafo do `pool`
+    é trocado pelo grafo com os registros atuais. A troca empacota o grafo
+    inteiro, então é feita no máximo uma vez a cada ``REFRESH`` segundos:
+    os registros que chegam nesse intervalo se acumulam e entram todos
+    juntos na troca seguinte.
+
+    :param graph: o grafo compilado
+    :param ENGINE: a busca de cada execução, entre :data:`main.ENGINES`
+    :param RUNS: execuções por consulta, se a mensagem não disser
+    :param MAXRUNS: limite de execuções por consulta
+    :param MAXPENDING: requisições atendidas ao mesmo tempo
+    :param MAXLINE: tamanho máximo de uma mensagem, em bytes, com folga
+            para os ``observe`` com muitas linhas. Mensagens maiores são
+            descartadas e respondidas com erro
+    :param POOLSIZE: quantidade de processos do `pool`
+    :param CHUNKSIZE: execuções de cada tarefa do `pool`
+    :param WINDOW: janela dos registros de velocidade, em segundos
+    :param CAPACITY: máximo de registros guardados por trecho
+    :param REFRESH: intervalo mínimo entre as trocas do grafo do `pool`,
+            em segundos
+    """
+    __slots__ = ['_backend', '_engine', '_runs', '_maxruns', '_maxpending', '_maxline',
+                 '_slots', '_updating', '_executor', '_base', '_store', '_published',
+                 '_interval', '_refreshed']
+
+    def __init__(self, graph: CompiledWaze, *,
+                 ENGINE: str = 'dijkstra', RUNS: int = 100, MAXRUNS: int = 10000,
+                 MAXPENDING: int = 16, MAXLINE: int = 1 << 24,
+                 POOLSIZE: int = 8, CHUNKSIZE: int = 10,
+                 WINDOW: float = 600.0, CAPACITY: int = 16, REFRESH: float = 1.0):
+        if ENGINE not in ENGINES:
+            raise ValueError(f"unknown search engine: {ENGINE}")
+
+        self._engine = ENGINE
+        self._runs = RUNS
+        self._maxruns = MAXRUNS
+        self._maxpending = MAXPENDING
+        self._maxline = MAXLINE
+        self._backend = SharedWaze(graph, PREPARE.get(ENGINE),
+                                   POOLSIZE=POOLSIZE, CHUNKSIZE=CHUNKSIZE)
+        self._executor = ThreadPoolExecutor(MAXPENDING)
+        # mapa sem alterações e os registros ao vivo, já no pool
+        self._base = graph
+        self._store = ObservationStore.from_graph(graph, WINDOW=WINDOW, CAPACITY=CAPACITY)
+        self._published = self._store.version
+        # intervalo e última troca do grafo, em :func:`time.monotonic`
+        self._interval = REFRESH
+        self._refreshed = float('-inf')
+        # criados dentro do loop de eventos, em serve
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._updating: Optional[asyncio.Lock] = None
+
+    @property
+    def graph(self) -> CompiledWaze:
+        """o grafo atual, com as velocidades registradas até aqui"""
+        return self._backend.graph
+
+    @property
+    def store(self) -> ObservationStore:
+        """os registros de velocidade ao vivo"""
+        return self._store
+
+    def _refresh(self) -> None:
+        """expira os registros e troca o grafo do pool, se mudaram e
+        se a última troca foi há pelo menos ``REFRESH`` segundos"""
+        now = monotonic()
+        if now - self._refreshed < self._interval:
+            return
+        self._store.expire()
+        if self._store.version != self._published:
+            self._published = self._store.version
+            self._refreshed = now
+            self._backend.update(self._store.compile(self._base))
+
+    async def refresh(self) -> None:
+        """Expira os registros fora da janela e atualiza o grafo das
+        próximas consultas, se a última atualização não foi há menos
+        de ``REFRESH`` segundos"""
+        assert self._updating is not None
+        loop = asyncio.get_running_loop()
+        # uma atualização de cada vez, sobre a anterior
+        async with self._updating:
+            await loop.run_in_executor(self._executor, self._refresh)
+
+    def _sample(self, source: str, dest: str, runs: int) -> List[Result]:
+        """execuções no pool, feitas em uma thread"""
+        return list(shared_runs(self._backend, source, dest, runs, self._engine))
+
+    async def route(self, message: Message) -> Message:
+        """Os dois melhores caminhos entre a origem e o destino"""
+        source, dest = str(message['source']), str(message['dest'])
+        runs = int(message.get('runs', self._runs))
+        if not 0 < runs <= self._maxruns:
+            raise ValueError(f"runs must be between 1 and {self._maxruns}")
+
+        await self.refresh()
+        loop = asyncio.get_running_loop()
+        samples = await loop.run_in_executor(self._executor, self._sample,
+                                             source, dest, runs)
+        results, errors = aggregate(samples)
+        if errors == runs:
+            raise ValueError(f"no path between {source} and {dest}")
+
+        paths = [{'minutes': mean.average * 60.0, 'path': list(path)}
+                 for path, mean in best_paths(results)]
+        return {'paths': paths, 'runs': runs, 'errors': errors}
+
+    async def observe(self, message: Message) -> Message:
+        """Registra velocidades nos trechos, para as próximas consultas
+
+        O grafo do `pool` não é trocado aqui, só antes da próxima
+        consulta (:meth:`refresh`).
+        """
+        # precisa do NumPy
+        from parser import speeds
+
+        lines: Sequence[str] = message['lines']
+        stamp = message.get('time')
+        data = '\n'.join(lines).encode()
+        assert self._updating is not None
+
+        loop = asyncio.get_running_loop()
+        edges, values = await loop.run_in_executor(self._executor, speeds,
+                                                   self._base, data)
+        async with self._updating:
+            received = self._store.ingest(edges, values,
+                                          None if stamp is None else float(stamp))
+        return {'received': received, 'observations': len(self._store)}
+
+    async def handle(self, line: bytes, received: float) -> Message:
+        """Atende uma mensagem, com os tempos e os erros na resposta
+
+        :param received: quando a mensagem foi lida, em :func:`time.monotonic`
+        """
+        started = monotonic()
+        try:
+            message = json.loads(line)
+            if not isinstance(message, dict):
+                raise ValueError("message must be a JSON object")
+        except ValueError as error:
+            return {'id': None, 'ok': False, 'error': str(error)}
+
+        operations: Dict[str, Callable[[Message], Any]] = {
+            'route': self.route,
+            'observe': self.observe,
+        }
+        response: Message = {'id': message.get('id')}
+        try:
+            operation = operations[message.get('op', '')]
+        except KeyError:
+            response.update(ok=False, error=f"unknown operation: {message.get('op')}")
+        else:
+            try:
+                response.update(await operation(message), ok=True)
+            except (KeyError, ValueError, TypeError) as error:
+                response.update(ok=False, error=f'{type(error).__name__}: {error}')
+
+        finished = monotonic()
+        response['timing'] = {
+            'queued': started - received,
+            'run': finished - started,
+            'total': finished - received,
+        }
+        return response
+
+    async def client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+                     ) -> None:
+        """Atende uma conexão, com várias mensagens ao mesmo tempo"""
+        assert self._slots is not None
+        slots = self._slots
+        writing = asyncio.Lock()
+        tasks = set()
+
+        async def reply(line: Optional[bytes], received: float) -> None:
+            try:
+                if line is None:
+                    response: Message = {'id': None, 'ok': False, 'error':
+                                         f"message longer than {self._maxline} bytes"}
+                else:
+                    response = await self.handle(line, received)
+                async with writing:
+                    writer.write(json.dumps(response).encode() + b'\n')
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                slots.release()
+
+        try:
+            while True:
+                # sem vagas, a conexão não é lida
+                await slots.acquire()
+                # a vaga passa para a resposta, se houver uma
+                replying = False
+                try:
+                    line = await _read_line(reader)
+                    if line == b'':
+                        break
+                    if line is not None and not line.strip():
+                        continue
+
+                    task = asyncio.create_task(reply(line, monotonic()))
+                    replying = True
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                finally:
+                    if not replying:
+                        slots.release()
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        except (asyncio.CancelledError, ConnectionError):
+            # servidor encerrado ou conexão perdida, a conexão só é fechada
+            for task in tasks:
+                task.cancel()
+        finally:
+            writer.close()
+
+    async def serve(self, port: int = 8000, *, host: str = '127.0.0.1',
+                    path: Optional[str] = None,
+                    ready: Optional[Callable[[], Any]] = None) -> None:
+        """Atende as conexões até ser cancelado
+
+        :param port: porta TCP, em ``host``
+        :param path: caminho do socket Unix, usado em vez da porta
+        :param ready: chamado quando o servidor começar a aceitar conexões
+        """
+        self._slots = asyncio.Semaphore(self._maxpending)
+        self._updating = asyncio.Lock()
+
+        if path is not None:
+            server = await asyncio.start_unix_server(self.client, path,
+                                                     limit=self._maxline)
+        else:
+            server = await asyncio.start_server(self.client, host, port,
+                                                limit=self._maxline)
+
+        async with server:
+            if ready is not None:
+                ready()
+            await server.serve_forever()
+
+    def close(self) -> None:
+        """Encerra o pool e as threads"""
+        self._executor.shutdown()
+        self._backend.close()
+
+    def __enter__(self) -> RoutingServer:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self._backend!r}, ENGINE={self._engine!r})'
+
+
+def load_map(path: str) -> CompiledWaze:
+    """Grafo de uma cópia binária (:mod:`snapshot`) ou de um arquivo
+    de texto, lido com :func:`parser.load`"""
+    # precisa do NumPy
+    from parser import load
+    from snapshot import load as load_snapshot
+
+    try:
+        return load_snapshot(path)
+    except ValueError:
+        graph, *_ = load(path)
+        return graph
+
+
+def main(argv: Sequence[str]) -> None:
+    """Carrega o mapa e atende as conexões"""
+    if not 1 <= len(argv) <= 2:
+        raise SystemExit("usage: python server.py MAPA [PORTA | CAMINHO_UNIX]")
+
+    graph = load_map(argv[0])
+    address = argv[1] if len(argv) > 1 else '8000'
+
+    with RoutingServer(graph) as server:
+        try:
+            if address.isdigit():
+                asyncio.run(server.serve(int(address)))
+            else:
+                asyncio.run(server.serve(path=address))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    import sys
+    main(sys.argv[1:])
@@ -0,0 +1,261 @@
+"""
+``shared.py``
+=============
+
+Grafo compilado em memória compartilhada entre os processos
+de um `pool` persistente, que recebe só sementes e quantidades
+de execuções
+"""
+
+from __future__ import annotations
+
+from waze import CompiledWaze
+from utils import map_many
+import instrument
+
+import os
+import mmap
+import random
+import struct
+import tempfile
+import threading
+from array import array
+from multiprocessing import Pool
+from typing import (
+    Optional, Callable, Sequence, Iterator,
+    BinaryIO, Dict, Set, List, Tuple, Any
+)
+
+__all__ = ["pack", "unpack", "SharedWaze"]
+
+
+#: cabeçalho do grafo empacotado: quantidade de nós, de arestas,
+#: de velocidades registradas, de trechos com velocidades registradas
+#: e tamanho dos nomes em bytes
+HEADER = struct.Struct('<5q')
+
+# busca no grafo compilado, como em main.ENGINES
+Search = Callable[[CompiledWaze, Sequence[float], int, int],
+                  Optional[Tuple[float, Tuple[int, ...]]]]
+# resultado de uma execução, com os identificadores dos nós
+IdResult = Optional[Tuple[Tuple[int, ...], float]]
+
+
+def pack(graph: CompiledWaze, file: BinaryIO) -> None:
+    """Escreve as colunas do grafo em sequência no arquivo
+
+    Depois do :data:`HEADER`, vêm os `offsets`, alvos, distâncias,
+    velocidades máximas, início das velocidades registradas, as
+    velocidades registradas, os tempos de
+    :meth:`~waze.CompiledWaze.static_times` e os trechos de
+    :meth:`~waze.CompiledWaze.observed_edges`, todos com 8 bytes por
+    item, e os nomes dos nós em UTF-8, separados por quebras de linha.
+    """
+    names = '\n'.join(graph.names).encode('utf-8')
+    stochastic = graph.observed_edges()
+    file.write(HEADER.pack(len(graph), graph.edge_count, len(graph.observations),
+                           len(stochastic), len(names)))
+    for typecode, column in (('q', graph.offsets), ('q', graph.targets),
+                             ('d', graph.distance), ('d', graph.max_speed),
+                             ('q', graph.obs_offsets), ('d', graph.observations),
+                             ('d', graph.static_times()), ('q', stochastic)):
+        file.write(array(typecode, column).tobytes())
+    file.write(names)
+
+
+def unpack(buffer: memoryview) -> CompiledWaze:
+    """Grafo empacotado por :func:`pack`, sem cópia das colunas
+
+    As colunas são `views` do próprio ``buffer``, que precisa
+    continuar aberto enquanto o grafo for usado. Só os tempos fixos
+    são copiados, porque cada amostra de
+    :meth:`~waze.CompiledWaze.weights` parte de uma cópia deles, e o
+    índice dos nomes é montado só na primeira busca por chave.
+    """
+    nodes, edges, observations, observed, names_size = HEADER.unpack_from(buffer)
+    position = HEADER.size
+
+    def column(size: int) -> memoryview:
+        nonlocal position
+        start, position = position, position + 8 * size
+        return buffer[start:position]
+
+    offsets = column(nodes + 1).cast('q')
+    targets = column(edges).cast('q')
+    distance = column(edges).cast('d')
+    max_speed = column(edges).cast('d')
+    obs_offsets = column(edges + 1).cast('q')
+    speeds = column(observations).cast('d')
+    static = array('d')
+    static.frombytes(column(edges))
+    stochastic = column(observed).cast('q')
+    names = bytes(buffer[position:position + names_size]).decode('utf-8')
+
+    return CompiledWaze(names.split('\n') if nodes else [], offsets, targets,
+                        distance, max_speed, obs_offsets, speeds,
+                        static=static, stochastic=stochastic)
+
+
+# grafo de cada processo do pool, o arquivo de onde ele veio
+# e o pré-processamento da busca
+_GRAPH: Optional[CompiledWaze] = None
+_PATH: Optional[str] = None
+_PREPARE: Optional[Callable[[CompiledWaze], Any]] = None
+
+
+def _attach(path: str, prepare: Optional[Callable[[CompiledWaze], Any]]) -> None:
+    """mapeia o grafo compartilhado no processo e faz o pré-processamento,
+    que é reaproveitado da versão anterior quando a topologia é a mesma
+    (:meth:`waze.CompiledWaze.adopt`)"""
+    global _GRAPH, _PATH, _PREPARE
+    with open(path, 'rb') as file:
+        memory = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    graph = unpack(memoryview(memory))
+    if _GRAPH is not None:
+        graph.adopt(_GRAPH)
+    _GRAPH, _PATH, _PREPARE = graph, path, prepare
+    if prepare is not None:
+        prepare(graph)
+
+
+def _sample_runs(task: Tuple[str, Search, int, int, int, int]) -> List[IdResult]:
+    """várias execuções com a semente recebida, no grafo do processo,
+    que é trocado se a tarefa for de outra versão dele"""
+    path, search, source, dest, runs, seed = task
+    if path != _PATH:
+        _attach(path, _PREPARE)
+    graph = _GRAPH
+    assert graph is not None, "processo sem grafo compartilhado"
+
+    random.seed(seed)
+    results: List[IdResult] = []
+    for _ in range(runs):
+        with instrument.phase('sample'):
+            times = graph.weights()
+        with instrument.phase('search'):
+            result = search(graph, times, source, dest)
+        results.append((result[1], result[0]) if result else None)
+    return results
+
+
+class SharedWaze:
+    """
+    Grafo compilado em um arquivo mapeado em memória (em
+    ``/dev/shm``, quando existe) e um `pool` de processos que
+    o mapeiam uma vez só, ao iniciar
+
+    O pool continua vivo entre as consultas, até :meth:`close`.
+    Cada tarefa leva só o arquivo do grafo, a busca, os nós, a
+    quantidade de execuções e uma semente, tirada de :mod:`random`
+    no processo principal.
+
+    Com :meth:`update`, o grafo passa para um novo arquivo, que os
+    processos mapeiam na primeira tarefa com ele. O arquivo antigo é
+    removido quando nenhuma execução estiver usando ele. Se só as
+    velocidades mudaram, cada processo reaproveita o pré-processamento
+    da versão anterior, em vez de refazer ``prepare``.
+
+    :param graph: o grafo compilado
+    :param prepare: pré-processamento da busca, feito uma vez
+            em cada processo ao iniciar
+    :param POOLSIZE: quantidade de processos
+    :param CHUNKSIZE: quantidade de execuções de cada tarefa
+    """
+    __slots__ = ['_graph', '_path', '_pool', '_chunksize',
+                 '_lock', '_users', '_retired']
+
+    def __init__(self, graph: CompiledWaze,
+                 prepare: Optional[Callable[[CompiledWaze], Any]] = None, *,
+                 POOLSIZE: int = 8, CHUNKSIZE: int = 10):
+        self._path = self._write(graph)
+        self._graph = graph
+        self._chunksize = CHUNKSIZE
+        # execuções em andamento em cada arquivo e os arquivos antigos
+        self._lock = threading.Lock()
+        self._users: Dict[str, int] = {}
+        self._retired: Set[str] = set()
+        self._pool = Pool(POOLSIZE, initializer=_attach, initargs=(self._path, prepare))
+
+    @staticmethod
+    def _write(graph: CompiledWaze) -> str:
+        """empacota o grafo em um novo arquivo temporário"""
+        directory = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        fd, path = tempfile.mkstemp(prefix='waze-', suffix='.bin', dir=directory)
+        with os.fdopen(fd, 'wb') as file:
+            pack(graph, file)
+        return path
+
+    def _release(self, path: str) -> None:
+        """remove o arquivo, se ele for antigo e ninguém estiver usando"""
+        if path in self._retired and not self._users.get(path):
+            self._retired.discard(path)
+            self._users.pop(path, None)
+            os.remove(path)
+
+    @property
+    def graph(self) -> CompiledWaze:
+        """o grafo compilado"""
+        return self._graph
+
+    @property
+    def path(self) -> str:
+        """arquivo com o grafo empacotado"""
+        return self._path
+
+    def run(self, search: Search, source: int, dest: int, runs: int
+            ) -> Iterator[IdResult]:
+        """Executa a busca ``runs`` vezes, com novas velocidades
+        sorteadas a cada vez
+
+        :param search: a busca, que precisa ser uma função de módulo
+        :return: iterador com o caminho e o peso de cada execução,
+                com os identificadores dos nós, fora de ordem
+        """
+        with self._lock:
+            path = self._path
+            self._users[path] = self._users.get(path, 0) + 1
+
+        tasks = []
+        for start in range(0, runs, self._chunksize):
+            count = min(self._chunksize, runs - start)
+            tasks.append((path, search, source, dest, count, random.getrandbits(64)))
+
+        try:
+            for results in map_many(_sample_runs, tasks, pool=self._pool, CHUNKSIZE=1):
+                for result in results:
+                    yield result
+        finally:
+            with self._lock:
+                self._users[path] -= 1
+                self._release(path)
+
+    def update(self, graph: CompiledWaze) -> None:
+        """Troca o grafo das próximas execuções
+
+        O novo grafo precisa ter os mesmos nós, como os de
+        :func:`parser.observe`, porque as execuções em andamento
+        continuam no grafo antigo.
+        """
+        path = self._write(graph)
+        with self._lock:
+            old, self._path, self._graph = self._path, path, graph
+            self._retired.add(old)
+            self._release(old)
+
+    def close(self) -> None:
+        """Encerra o pool e remove o arquivo compartilhado"""
+        self._pool.close()
+        self._pool.join()
+        for path in self._retired | {self._path}:
+            if os.path.exists(path):
+                os.remove(path)
+        self._retired.clear()
+
+    def __enter__(self) -> SharedWaze:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self._path!r})'
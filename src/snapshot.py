@@ -0,0 +1,88 @@
+"""
+``snapshot.py``
+===============
+
+Cópia binária versionada do grafo compilado, para
+carregar o mapa base sem ler o texto de novo
+
+O arquivo é o grafo empacotado por :func:`shared.pack`,
+depois de um prefixo com :data:`MAGIC` e :data:`VERSION`.
+A leitura mapeia o arquivo em memória e as colunas do
+grafo são `views` dele, sem cópia.
+
+Uso::
+
+    python snapshot.py ENTRADA SAIDA
+"""
+
+from __future__ import annotations
+
+from waze import CompiledWaze
+from shared import pack, unpack
+
+import mmap
+import struct
+from typing import Sequence
+
+__all__ = ["MAGIC", "VERSION", "save", "load"]
+
+
+#: identificação do arquivo
+MAGIC = b'WAZESNAP'
+#: versão do formato, que muda junto com :func:`shared.pack`
+VERSION = 2
+
+# prefixo com a identificação e a versão, em 16 bytes para
+# manter as colunas alinhadas em 8 bytes
+PREFIX = struct.Struct('<8sq')
+
+
+def save(graph: CompiledWaze, path: str) -> None:
+    """Grava o grafo compilado no arquivo
+
+    As velocidades registradas no grafo também são gravadas, mas
+    normalmente o mapa base não tem nenhuma e elas são aplicadas
+    depois, com :func:`parser.observe`.
+    """
+    with open(path, 'wb') as file:
+        file.write(PREFIX.pack(MAGIC, VERSION))
+        pack(graph, file)
+
+
+def load(path: str) -> CompiledWaze:
+    """Mapeia o grafo gravado por :func:`save`, sem cópia das colunas
+
+    O mapeamento fica aberto enquanto o grafo for usado.
+
+    :raises ValueError: se o arquivo não for dessa versão do formato
+    """
+    with open(path, 'rb') as file:
+        memory = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    buffer = memoryview(memory)
+    if len(buffer) < PREFIX.size:
+        raise ValueError(f"not a graph snapshot: {path}")
+    magic, version = PREFIX.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError(f"not a graph snapshot: {path}")
+    if version != VERSION:
+        raise ValueError(f"unsupported snapshot version {version}, expected {VERSION}")
+
+    return unpack(buffer[PREFIX.size:])
+
+
+def main(argv: Sequence[str]) -> None:
+    """Converte um mapa em texto para a cópia binária"""
+    # precisa do NumPy
+    from parser import load as parse_file
+
+    if len(argv) != 2:
+        raise SystemExit("usage: python snapshot.py ENTRADA SAIDA")
+
+    graph, *_ = parse_file(argv[0])
+    save(graph, argv[1])
+
+
+if __name__ == "__main__":
+    import sys
+    main(sys.argv[1:])
@@ -7,22 +7,25 @@ Módulo para o peso de um trecho de rua
 
 from __future__ import annotations
 
-from protocols import Weightable
+from protocols import FloatWeightable
 
 from random import choice
 from functools import total_ordering
-from typing import Optional, List, Any, Dict
+from typing import Optional, List, Any, Dict, Sequence
 
 
 #: Incluir velocidade máxima entre as possibilidades
 #: de velocidade assumida naquele trecho de rua
 INCLUDE_MAX_SPEED = False
 
+# amostra de velocidades ativa no momento
+_SAMPLE: Optional[SpeedSample] = None
+
 
 @total_ordering
-class Street(Weightable):
+class Street(FloatWeightable):
     """
-    Classe de peso (:class:`Weightable`) do trecho da rua
+    Classe de peso (:class:`FloatWeightable`) do trecho da rua
 
     Assim que a propriedade :attr:`~street.Street.speed` é
     lida pela primeira vez, ela assume um valor que é mantido
@@ -30,7 +33,8 @@ class Street(Weightable):
 
     No entanto, quuando essa instância é copiada com :func:`copy.deepcopy`,
     essa propriedade é desconfigurada e ela pode assumir um novo
-    valor.
+    valor. Dentro de uma :class:`SpeedSample`, a velocidade assumida
+    é a da amostra, sem alterar o trecho.
 
     :param distance:    distância do trecho
     :param max_speed:   velocidade máxima do trecho
@@ -41,21 +45,34 @@ class Street(Weightable):
         self._max_speed = max_speed
         self._latest_speeds: List[float] = []
         self._speed: Optional[float] = None
+        # tempo enquanto não houver velocidades registradas,
+        # que não muda entre as amostras
+        self._static_time = distance / max_speed if max_speed else float('inf')
 
     def register_speeds(self, *speeds: float) -> None:
         """Registra as velocidades atuais no trecho"""
         self._latest_speeds += list(speeds)
 
+    def draw_speed(self) -> float:
+        """Sorteia uma nova velocidade para o trecho, sem
+        guardá-la
+        """
+        if INCLUDE_MAX_SPEED:
+            return choice(self._latest_speeds + [self._max_speed])
+        elif self._latest_speeds:
+            return choice(self._latest_speeds)
+        else:
+            return self._max_speed
+
     @property
     def speed(self) -> float:
         """Velocidade assumida no trecho"""
+        # sem velocidades registradas, a velocidade é sempre a máxima
+        if _SAMPLE is not None and self._latest_speeds:
+            return _SAMPLE.speed(self)
+
         if self._speed is None:
-            if INCLUDE_MAX_SPEED:
-                self._speed = choice(self._latest_speeds + [self._max_speed])
-            elif self._latest_speeds:
-                self._speed = choice(self._latest_speeds)
-            else:
-                self._speed = self._max_speed
+            self._speed = self.draw_speed()
 
         return self._speed
 
@@ -64,17 +81,34 @@ class Street(Weightable):
         """distância do trecho"""
         return self._distance
 
+    @property
+    def max_speed(self) -> float:
+        """velocidade máxima do trecho"""
+        return self._max_speed
+
+    @property
+    def latest_speeds(self) -> Sequence[float]:
+        """velocidades registradas recentemente no trecho"""
+        return self._latest_speeds
+
     @property
     def time(self) -> float:
         """tempo no trecho, com a velocidade assumida
 
-        Usado para a comparação entre trechos
+        Usado para a comparação entre trechos. Sem velocidades
+        registradas, o tempo é fixo e já vem calculado.
         """
+        if not self._latest_speeds:
+            return self._static_time
         if self.speed:
             return self.distance / self.speed
         else:
             return float('inf')
 
+    def __float__(self) -> float:
+        """O tempo no trecho, para buscas com pesos em :class:`float`"""
+        return self.time
+
     def is_inf(self) -> bool:
         """Se a velocidade assumida representa um tempo infinito"""
         return not self.speed
@@ -107,3 +141,41 @@ class Street(Weightable):
 
         memo[id(self)] = new
         return new
+
+
+class SpeedSample:
+    """
+    Amostra das velocidades assumidas nos trechos, guardada fora
+    dos objetos :class:`Street`
+
+    Enquanto a amostra estiver ativa, em um bloco ``with``, os trechos
+    com velocidades registradas leem a velocidade assumida daqui, que é
+    sorteada na primeira leitura. Assim, um mesmo grafo pode ser
+    compartilhado entre várias execuções, sem :func:`copy.deepcopy`.
+    """
+    __slots__ = ['_speeds', '_previous']
+
+    def __init__(self) -> None:
+        # velocidade assumida de cada trecho, pelo id do trecho
+        self._speeds: Dict[int, float] = {}
+        self._previous: Optional[SpeedSample] = None
+
+    def speed(self, street: Street) -> float:
+        """Velocidade assumida do trecho nesta amostra"""
+        speed = self._speeds.get(id(street))
+        if speed is None:
+            speed = self._speeds[id(street)] = street.draw_speed()
+        return speed
+
+    def __len__(self) -> int:
+        """Quantidade de trechos já sorteados"""
+        return len(self._speeds)
+
+    def __enter__(self) -> SpeedSample:
+        global _SAMPLE
+        self._previous, _SAMPLE = _SAMPLE, self
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        global _SAMPLE
+        _SAMPLE, self._previous = self._previous, None
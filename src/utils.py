@@ -7,12 +7,15 @@ Utilidades para o código principal :mod:`__main__.py`
 
 from __future__ import annotations
 
+import instrument
+
 from multiprocessing import Pool
+from multiprocessing.pool import Pool as PoolType
 from itertools import repeat
 from functools import wraps
-from typing import TypeVar, Callable, Tuple, Any, Iterator
+from typing import TypeVar, Callable, Optional, Tuple, Any, Iterator, Iterable
 
-__all__ = ["uncurry", "run_many"]
+__all__ = ["uncurry", "run_many", "map_many"]
 
 
 # tipos genéricos
@@ -35,7 +38,8 @@ def uncurry(func: Callable[..., T]) -> Callable[[Tuple[Any, ...]], T]:
 
 def run_many(func: Callable[[T], U], arg: T, runs: int, *,
              PARALLEL: bool = True,
-             POOLSIZE: int = 8, CHUNKSIZE: int = 10
+             POOLSIZE: int = 8, CHUNKSIZE: int = 10,
+             pool: Optional[PoolType] = None
              ) -> Iterator[U]:
     """
     `Generator` que repete uma função com o mesmo argumento
@@ -50,15 +54,69 @@ def run_many(func: Callable[[T], U], arg: T, runs: int, *,
                             a função ao mesmo tempo
     :param CHUNKSIZE:   quantidade de vezes que cada
                             processo executa a função
+    :param pool:    `pool` já aberto, veja :func:`map_many`
+    :return:    iterador dos resultados
+    """
+    return map_many(func, repeat(arg, runs), PARALLEL=PARALLEL,
+                    POOLSIZE=POOLSIZE, CHUNKSIZE=CHUNKSIZE, pool=pool)
+
+
+def map_many(func: Callable[[T], U], args: Iterable[T], *,
+             PARALLEL: bool = True,
+             POOLSIZE: int = 8, CHUNKSIZE: int = 10,
+             pool: Optional[PoolType] = None
+             ) -> Iterator[U]:
+    """
+    `Generator` que executa uma função para cada argumento,
+    como :func:`run_many`, mas com argumentos diferentes
+
+    No modo paralelo, os resultados podem vir fora de ordem. Com
+    ``pool``, as execuções vão para esse `pool`, que continua aberto
+    depois, em vez de um novo com ``POOLSIZE`` processos.
+
+    Com a instrumentação ligada (:func:`instrument.recording`), cada
+    execução volta com os seus contadores, que são somados nos ativos,
+    junto com os totais de cada processo.
+
+    :param func:   função a ser executada
+    :param args:    argumentos de cada execução
+    :param PARALLEL:   se a execução deve ser feita
+                            em paralelo
+    :param POOLSIZE:    quantidade de processos executando
+                            a função ao mesmo tempo
+    :param CHUNKSIZE:   quantidade de vezes que cada
+                            processo executa a função
+    :param pool:    `pool` já aberto, usado mesmo sem ``PARALLEL``
     :return:    iterador dos resultados
     """
+    counters = instrument.active()
+    if counters is None:
+        yield from _map_many(func, args, PARALLEL=PARALLEL, POOLSIZE=POOLSIZE,
+                             CHUNKSIZE=CHUNKSIZE, pool=pool)
+        return
+
+    recorded = _map_many(instrument.Recorded(func), args, PARALLEL=PARALLEL,
+                         POOLSIZE=POOLSIZE, CHUNKSIZE=CHUNKSIZE, pool=pool)
+    for value, worker, totals in recorded:
+        counters.merge(instrument.Counters.from_dict(totals), worker=worker)
+        yield value
+
+
+def _map_many(func: Callable[[T], U], args: Iterable[T], *,
+              PARALLEL: bool, POOLSIZE: int, CHUNKSIZE: int,
+              pool: Optional[PoolType]) -> Iterator[U]:
+    """execução de :func:`map_many`, sem a instrumentação"""
+    if pool is not None:
+        for value in pool.imap_unordered(func, args, CHUNKSIZE):
+            yield value
+        return
 
     if not PARALLEL:
-        for value in map(func, repeat(arg, runs)):
+        for value in map(func, args):
             yield value
         return
 
     with Pool(POOLSIZE) as p:
-        results = p.imap_unordered(func, repeat(arg, runs), CHUNKSIZE)
+        results = p.imap_unordered(func, args, CHUNKSIZE)
         for value in results:
             yield value
@@ -5,9 +5,18 @@
 
 from __future__ import annotations
 
-from graph import Graph
+from graph import Graph, CompiledGraph
+from graph.compiled import topology
+from graph.alt import Landmarks
+from graph.dijkstra import csr_distances
 from street import Street
-from typing import Optional
+import street
+
+from array import array
+from itertools import compress, islice
+from operator import ge, lt, truediv
+from random import random
+from typing import Optional, Sequence, Dict
 
 
 class Waze(Graph[str, Street]):
@@ -51,3 +60,243 @@ class Waze(Graph[str, Street]):
             raise KeyError((from_, to))
 
         weight.register_speeds(*speeds)
+
+    def compile(self) -> CompiledWaze:
+        """Congela o grafo em um :class:`CompiledWaze`
+
+        As velocidades registradas até aqui são copiadas
+        para o grafo compilado.
+        """
+        names, offsets, targets, streets = topology(self)
+
+        distance = array('d', (s.distance for s in streets))
+        max_speed = array('d', (s.max_speed for s in streets))
+
+        obs_offsets = array('l', [0])
+        observations = array('d')
+        for s in streets:
+            observations.extend(s.latest_speeds)
+            obs_offsets.append(len(observations))
+
+        return CompiledWaze(names, offsets, targets, distance,
+                            max_speed, obs_offsets, observations)
+
+
+class CompiledWaze(CompiledGraph[str]):
+    """
+    Grafo do Waze compilado, com as informações de cada trecho
+    de rua em colunas contíguas, indexadas pelas arestas
+
+    As velocidades registradas no trecho ``e`` são as de índice
+    ``obs_offsets[e]`` até ``obs_offsets[e + 1]`` em ``observations``.
+
+    Os trechos sem velocidades registradas têm tempo fixo em qualquer
+    amostra. Eles são separados dos outros, com os tempos já calculados
+    (:meth:`static_times`), e cada amostra sorteia só os trechos que
+    variam (:meth:`observed_edges`). A separação é feita na primeira
+    amostra, ou vem pronta em ``static`` e ``stochastic``, como as
+    colunas de :func:`shared.unpack`.
+
+    :param names:   chave de cada nó
+    :param offsets: início das arestas de cada nó
+    :param targets: nó alvo de cada aresta
+    :param distance:    distância de cada trecho
+    :param max_speed:   velocidade máxima de cada trecho
+    :param obs_offsets: início das velocidades registradas
+                        de cada trecho
+    :param observations:    velocidades registradas de todos
+                            os trechos
+    :param static:  tempos de :meth:`static_times`, já calculados
+    :param stochastic:  trechos de :meth:`observed_edges`, já calculados
+    """
+    __slots__ = ['_distance', '_max_speed', '_obs_offsets', '_observations',
+                 '_static', '_stochastic', '_landmarks', '_bounds']
+
+    def __init__(self, names: Sequence[str],
+                 offsets: Sequence[int],
+                 targets: Sequence[int],
+                 distance: Sequence[float],
+                 max_speed: Sequence[float],
+                 obs_offsets: Sequence[int],
+                 observations: Sequence[float], *,
+                 static: Optional[Sequence[float]] = None,
+                 stochastic: Optional[Sequence[int]] = None):
+        super().__init__(names, offsets, targets)
+        self._distance = distance
+        self._max_speed = max_speed
+        self._obs_offsets = obs_offsets
+        self._observations = observations
+
+        # separação dos trechos fixos e dos que variam entre as amostras,
+        # feita só quando necessário
+        self._stochastic = stochastic
+        self._static = static
+
+        # pré-processamento do A*, feito só quando necessário
+        self._landmarks: Optional[Landmarks] = None
+        self._bounds: Dict[int, Sequence[float]] = {}
+
+    @property
+    def distance(self) -> Sequence[float]:
+        """distância de cada trecho"""
+        return self._distance
+
+    @property
+    def max_speed(self) -> Sequence[float]:
+        """velocidade máxima de cada trecho"""
+        return self._max_speed
+
+    @property
+    def obs_offsets(self) -> Sequence[int]:
+        """início das velocidades registradas de cada trecho"""
+        return self._obs_offsets
+
+    @property
+    def observations(self) -> Sequence[float]:
+        """velocidades registradas de todos os trechos"""
+        return self._observations
+
+    def latest_speeds(self, edge: int) -> Sequence[float]:
+        """Velocidades registradas no trecho ``edge``"""
+        return self._observations[self._obs_offsets[edge]:self._obs_offsets[edge + 1]]
+
+    def observed_edges(self) -> Sequence[int]:
+        """Trechos com velocidades registradas, os únicos que
+        mudam de tempo entre as amostras de :meth:`weights`
+
+        O vetor é calculado na primeira chamada e compartilhado
+        entre as seguintes, então não deve ser alterado.
+        """
+        if self._stochastic is None:
+            obs_offsets = self._obs_offsets
+            self._stochastic = array('l', compress(
+                range(self.edge_count), map(lt, obs_offsets, islice(obs_offsets, 1, None))
+            ))
+        return self._stochastic
+
+    def _fastest_times(self) -> array[float]:
+        """menor tempo possível em cada trecho"""
+        distance, max_speed = self._distance, self._max_speed
+        inf = float('inf')
+        try:
+            times = array('d', map(truediv, distance, max_speed))
+        except ZeroDivisionError:
+            # ruas fechadas, com velocidade máxima nula
+            times = array('d', [distance / speed if speed else inf
+                                for distance, speed in zip(distance, max_speed)])
+        # só os trechos com registros podem ser mais rápidos
+        for edge in self.observed_edges():
+            fastest = max(max_speed[edge], max(self.latest_speeds(edge)))
+            times[edge] = distance[edge] / fastest if fastest else inf
+        return times
+
+    def static_times(self) -> Sequence[float]:
+        """Tempo de cada trecho fixo, calculado na primeira chamada
+
+        Os trechos de :meth:`observed_edges` ficam com o menor tempo
+        possível, como em :meth:`lower_bounds`. O vetor é compartilhado
+        entre as chamadas, então não deve ser alterado.
+        """
+        if self._static is None:
+            self._static = self._fastest_times()
+        return self._static
+
+    def lower_bounds(self) -> array[float]:
+        """Menor tempo possível em cada trecho, com a maior entre a
+        velocidade máxima e as velocidades registradas
+
+        Vale como limite inferior para qualquer amostra de
+        :meth:`weights`, com ou sem :data:`street.INCLUDE_MAX_SPEED`.
+        """
+        return array('d', self.static_times())
+
+    def bounds(self, destination: int) -> Sequence[float]:
+        """Menor tempo possível de cada nó até ``destination``,
+        com os tempos de :meth:`static_times`
+
+        É a estimativa exata para a busca A* (:func:`graph.alt.csr_astar`)
+        nos limites inferiores, que vale para qualquer amostra de
+        :meth:`weights`. A tabela é calculada na primeira chamada para
+        cada destino e reaproveitada nas seguintes.
+        """
+        table = self._bounds.get(destination)
+        if table is None:
+            table = self._bounds[destination] = csr_distances(
+                self, self.static_times(), destination, reverse=True
+            )
+        return table
+
+    def upper_bounds(self) -> array[float]:
+        """Maior tempo possível em cada trecho, com a menor das
+        velocidades que podem ser sorteadas em :meth:`weights`
+
+        Trechos que podem ser fechados (velocidade nula) ficam
+        com tempo infinito.
+        """
+        include_max = street.INCLUDE_MAX_SPEED
+        inf = float('inf')
+        times = array('d')
+        for edge, (distance, speed) in enumerate(zip(self._distance, self._max_speed)):
+            speeds = self.latest_speeds(edge)
+            if speeds:
+                speed = min(speeds) if not include_max else min(speed, min(speeds))
+            times.append(distance / speed if speed else inf)
+        return times
+
+    def landmarks(self, count: int = 8) -> Landmarks:
+        """Marcos para a busca A* (:func:`graph.alt.csr_alt`), com
+        as tabelas calculadas sobre :meth:`lower_bounds`
+
+        O pré-processamento é feito na primeira chamada e reaproveitado
+        em todas as amostras e buscas seguintes.
+
+        :param count: quantidade de marcos, usada só na primeira chamada
+        """
+        if self._landmarks is None:
+            self._landmarks = Landmarks.build(self, self.lower_bounds(), count)
+        return self._landmarks
+
+    def adopt(self, other: CompiledGraph[str]) -> bool:
+        """Reaproveita o pré-processamento de ``other``, como em
+        :meth:`CompiledGraph.adopt <graph.compiled.CompiledGraph.adopt>`,
+        e também os marcos de :meth:`landmarks`, se os limites inferiores
+        deste grafo não forem menores que os de ``other``, e as tabelas
+        de :meth:`bounds`, se os tempos fixos forem os mesmos
+        """
+        if not super().adopt(other) or not isinstance(other, CompiledWaze):
+            return False
+
+        static, previous = self.static_times(), other.static_times()
+        if static == previous:
+            for destination, table in other._bounds.items():
+                self._bounds.setdefault(destination, table)
+        # as estimativas dos marcos continuam consistentes com pesos maiores
+        if self._landmarks is None and other._landmarks is not None and (
+            static == previous or all(map(ge, static, previous))
+        ):
+            self._landmarks = other._landmarks
+        return True
+
+    def weights(self) -> array[float]:
+        """Amostra uma velocidade para cada trecho, com a mesma
+        regra de :attr:`street.Street.speed`, e retorna o tempo
+        em cada um deles
+
+        Velocidades nulas resultam em tempo infinito. Os trechos fixos
+        vêm de :meth:`static_times`, só os outros são sorteados.
+        """
+        include_max = int(street.INCLUDE_MAX_SPEED)
+        obs_offsets, observations = self._obs_offsets, self._observations
+        distance, max_speed = self._distance, self._max_speed
+        inf = float('inf')
+
+        times = array('d', self.static_times())
+        for edge in self.observed_edges():
+            start = obs_offsets[edge]
+            count = obs_offsets[edge + 1] - start
+            # sorteia entre as velocidades registradas (e a máxima)
+            choice = int(random() * (count + include_max))
+            speed = observations[start + choice] if choice < count else max_speed[edge]
+
+            times[edge] = distance[edge] / speed if speed else inf
+        return times
@@ -0,0 +1,91 @@
+from graph import dijkstra, csr_dijkstra
+from shared import pack, unpack
+from waze import Waze
+
+import io
+import random
+
+import pytest
+
+
+# mapa pequeno com caminhos concorrentes, um trecho fechado e
+# velocidades registradas com um só valor, para não depender do sorteio
+STREETS = [
+    ('a', 'b', 1.0, None), ('b', 'c', 1.0, None), ('c', 'z', 1.0, None),
+    ('a', 'd', 0.5, 20.0), ('d', 'z', 2.5, None), ('b', 'z', 2.0, 80.0),
+    ('d', 'c', 0.4, None), ('z', 'a', 1.0, None), ('e', 'a', 1.0, None),
+]
+SPEEDS = [('b', 'c', 10.0), ('b', 'z', 0.0), ('d', 'c', 60.0)]
+
+
+def make_waze() -> Waze:
+    waze = Waze(40.0)
+    for from_, to, distance, speed in STREETS:
+        waze.new_street(from_, to, distance, speed)
+    for from_, to, speed in SPEEDS:
+        waze.latest_speeds(from_, to, speed)
+    return waze
+
+
+@pytest.mark.parametrize('source, dest', [
+    ('a', 'z'), ('a', 'c'), ('b', 'z'), ('d', 'a'), ('e', 'z'), ('z', 'e'), ('c', 'c'),
+])
+def test_csr_dijkstra_matches_object_graph(source: str, dest: str) -> None:
+    waze = make_waze()
+    compiled = waze.compile()
+
+    expected = dijkstra(waze, source, dest)
+    path = csr_dijkstra(compiled, compiled.weights(), compiled.id(source), compiled.id(dest))
+    keyed = dijkstra(compiled, source, dest)
+
+    if expected is None:
+        assert path is None and keyed is None
+        return
+
+    time, nodes = expected
+    assert path is not None and keyed is not None
+    assert path[0] == pytest.approx(time)
+    assert tuple(map(compiled.key, path[1])) == tuple(node.key for node in nodes)
+    assert keyed == (path[0], tuple(map(compiled.key, path[1])))
+
+
+def test_adopt_reuses_preprocessing_for_the_same_topology() -> None:
+    waze = make_waze()
+    first = waze.compile()
+    hierarchy, landmarks, reverse = first.hierarchy(), first.landmarks(), first.reverse()
+
+    # só as velocidades mudam
+    waze.latest_speeds('a', 'b', 5.0)
+    second = waze.compile()
+    assert second.adopt(first)
+    assert second.hierarchy() is hierarchy
+    assert second.reverse() is reverse
+    # os limites inferiores não diminuem, então os marcos continuam valendo
+    assert second.landmarks() is landmarks
+
+    # uma velocidade registrada maior diminui um limite inferior
+    waze.latest_speeds('a', 'b', 200.0)
+    third = waze.compile()
+    assert third.adopt(second)
+    assert third.hierarchy() is hierarchy
+    assert third.landmarks() is not landmarks
+
+    waze.new_street('c', 'a', 1.0)
+    assert not waze.compile().adopt(first)
+
+
+def test_unpack_keeps_the_precomputed_columns() -> None:
+    compiled = make_waze().compile()
+    file = io.BytesIO()
+    pack(compiled, file)
+    unpacked = unpack(memoryview(file.getvalue()))
+
+    assert list(unpacked.static_times()) == list(compiled.static_times())
+    assert list(unpacked.observed_edges()) == list(compiled.observed_edges())
+    assert [unpacked.id(name) for name in compiled.names] == list(range(len(compiled)))
+    assert 'z' in unpacked and 'y' not in unpacked
+
+    random.seed(7)
+    expected = compiled.weights()
+    random.seed(7)
+    assert unpacked.weights() == expected
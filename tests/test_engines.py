@@ -0,0 +1,59 @@
+from benchmark.generator import generate
+from graph.dijkstra import csr_distances
+from main import ENGINES, PREPARE
+from parser import parse
+
+import random
+import pytest
+
+
+# mapas pequenos com muitos trechos fechados, para que existam
+# destinos inalcançáveis
+MAPS = [('grid', 600, 0), ('grid', 600, 1), ('road', 800, 2), ('road', 1500, 3)]
+# amostras de velocidades de cada mapa
+SAMPLES = 4
+
+
+@pytest.mark.parametrize('kind, edges, seed', MAPS)
+def test_engines_agree_with_dijkstra(kind: str, edges: int, seed: int) -> None:
+    graph, *_ = parse(generate(edges, kind, density=0.2, closed=0.35, seed=seed))
+    for prepare in PREPARE.values():
+        prepare(graph)
+    rng = random.Random(seed)
+    nodes = len(graph)
+
+    unreachable = 0
+    for sample in range(SAMPLES):
+        random.seed(seed * SAMPLES + sample)
+        times = graph.weights()
+        assert float('inf') in times
+
+        # a mesma origem em todas as amostras, para reparar a árvore dinâmica
+        source = rng.randrange(nodes) if sample % 2 else 0
+        dist = csr_distances(graph, times, source)
+        dests = [rng.randrange(nodes) for _ in range(10)]
+        dests += [node for node in range(nodes) if dist[node] == float('inf')][:3]
+
+        for dest in dests:
+            expected = ENGINES['dijkstra'](graph, times, source, dest)
+            if dest != source and dist[dest] == float('inf'):
+                unreachable += 1
+                assert expected is None
+            for name, engine in ENGINES.items():
+                found = engine(graph, times, source, dest)
+                if expected is None:
+                    assert found is None, name
+                    continue
+
+                assert found is not None, name
+                cost, path = found
+                assert cost == pytest.approx(expected[0]), name
+                assert path[0] == source and path[-1] == dest, name
+                # o caminho existe e custa o mesmo que o informado
+                total = 0.0
+                for from_, to in zip(path, path[1:]):
+                    total += min(times[edge] for edge in graph.edges(from_)
+                                 if graph.targets[edge] == to)
+                assert total == pytest.approx(cost), name
+
+    assert unreachable > 0
@@ -0,0 +1,89 @@
+import json
+import os
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+from graph import CompiledGraph, csr_dijkstra
+from utils import map_many
+import instrument
+
+
+# arestas a -> b (1), a -> c (3), b -> c (1) e c -> e (5): c entra duas
+# vezes na fila e a entrada mais antiga sai desatualizada
+GRAPH = CompiledGraph(['a', 'b', 'c', 'e'], [0, 2, 3, 4, 4], [1, 2, 2, 3])
+WEIGHTS = [1.0, 3.0, 1.0, 5.0]
+
+
+def search(weights: Sequence[float]) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    return csr_dijkstra(GRAPH, weights, 0, 3)
+
+
+def test_dijkstra_counters() -> None:
+    assert instrument.active() is None
+    with instrument.recording() as counters:
+        assert search(WEIGHTS) == (7.0, (0, 1, 2, 3))
+        first = dict(counters.counts)
+        search(WEIGHTS)
+    assert instrument.active() is None
+
+    assert first == {
+        'dijkstra.calls': 1,
+        'dijkstra.push': 4,
+        'dijkstra.pop': 4,
+        # a origem e os três retirados da fila pela primeira vez
+        'dijkstra.settled': 4,
+        'dijkstra.stale': 1,
+        # arestas de a, b e c, sem as do destino
+        'dijkstra.relaxations': 4,
+    }
+    # a segunda busca soma nos mesmos contadores
+    assert counters.counts == {name: 2 * value for name, value in first.items()}
+
+
+def test_merge_and_round_trip() -> None:
+    total = instrument.Counters({'tasks': 1}, {'search': 0.5})
+    task = instrument.Counters({'tasks': 2, 'dijkstra.calls': 3}, {'search': 0.25})
+    total.merge(task, worker='10')
+    total.merge(instrument.Counters({'tasks': 1}), worker='11')
+
+    assert total.counts == {'tasks': 4, 'dijkstra.calls': 3}
+    assert total.timings == {'search': 0.75}
+    assert total.workers['10'].counts == {'tasks': 2, 'dijkstra.calls': 3}
+    assert total.workers['11'].counts == {'tasks': 1}
+
+    # os totais por processo também são somados, e não só os contadores
+    outer = instrument.Counters()
+    outer.merge(total, worker='main')
+    assert set(outer.workers) == {'10', '11', 'main'}
+    assert outer.workers['main'].workers['10'].counts == {'tasks': 2, 'dijkstra.calls': 3}
+    outer.meta['query'] = ['a', 'e']
+
+    document = json.loads(json.dumps(outer.to_dict()))
+    restored = instrument.Counters.from_dict(document)
+    assert restored.to_dict() == outer.to_dict()
+    assert restored.workers['main'].workers['11'].counts == {'tasks': 1}
+    assert restored.meta == {'query': ['a', 'e']}
+
+
+def test_map_many_and_main_merge_the_task_counters(tmp_path: Path) -> None:
+    paths = []
+    for runs in (2, 3):
+        with instrument.recording() as counters:
+            results = list(map_many(search, [WEIGHTS] * runs, PARALLEL=False))
+            instrument.annotate(query=['a', 'e', runs])
+        assert results == [(7.0, (0, 1, 2, 3))] * runs
+        assert counters.counts['tasks'] == runs
+        assert counters.counts['dijkstra.calls'] == runs
+        assert counters.workers[str(os.getpid())].counts['dijkstra.push'] == 4 * runs
+
+        path = tmp_path / f'{runs}.json'
+        counters.dump(str(path))
+        paths.append(str(path))
+
+    output = tmp_path / 'total.json'
+    instrument.main([str(output), *paths])
+    merged = instrument.load(str(output))
+    assert merged.counts['tasks'] == 5
+    assert merged.counts['dijkstra.settled'] == 20
+    assert merged.workers[str(os.getpid())].counts['tasks'] == 5
+    assert merged.meta == {'merged': 2, 'queries': [['a', 'e', 2], ['a', 'e', 3]]}
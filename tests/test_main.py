@@ -0,0 +1,66 @@
+from main import main
+
+import io
+import pytest
+
+
+MAP = """40
+a b 1
+b c 1
+a c 3
+
+a c 20
+a
+c
+"""
+
+
+@pytest.mark.parametrize('options', [
+    {'BATCH': True, 'MEMO': 4},
+    {'CANDIDATES': 2, 'SHARED': True},
+    {'COMPILE': False, 'BATCH': True},
+    {'QUERIES': True, 'ENGINE': 'cch'},
+    {'QUERIES': True, 'CONFIDENCE': 0.95},
+    {'STRATEGY': 'halton'},
+    {'FASTPARSE': True, 'COMPILE': False},
+    {'FASTPARSE': True, 'SNAPSHOT': 'map.snapshot'},
+])
+def test_conflicting_options(options: dict) -> None:
+    with pytest.raises(ValueError):
+        main(10, infile=io.StringIO(MAP), outfile=io.StringIO(), **options)
+
+
+@pytest.mark.parametrize('options', [{}, {'COMPILE': False}, {'MEMO': 4}, {'QUERIES': True}])
+def test_compatible_options(options: dict) -> None:
+    output = io.StringIO()
+    main(10, infile=io.StringIO(MAP), outfile=output, **options)
+    assert output.getvalue().splitlines()[:2] == ['3.0', 'a b c']
+
+
+def test_batches_stop_inside_a_batch_at_the_deadline() -> None:
+    from main import batches
+    from time import monotonic, sleep
+
+    def sample(runs: int):
+        for _ in range(runs):
+            sleep(0.02)
+            yield ('a', 'b'), 1.0
+
+    start = monotonic()
+    *_, (results, errors, runs) = batches(sample, None, batch=100, deadline=0.1)
+    # um lote inteiro levaria 2 segundos
+    assert monotonic() - start < 0.5
+    assert errors == 0 and 1 <= runs < 100
+    assert results[('a', 'b')].count == runs
+
+
+def test_batches_stop_at_max_runs() -> None:
+    from main import batches
+
+    sizes = []
+    def sample(runs: int):
+        sizes.append(runs)
+        return [None] * runs
+
+    *_, (_, errors, runs) = batches(sample, 25, batch=10)
+    assert sizes == [10, 10, 5] and errors == runs == 25
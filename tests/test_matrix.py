@@ -0,0 +1,55 @@
+from typing import Any
+
+from graph import CompiledGraph
+from graph.matrix import travel_times
+
+import numpy as np
+import pytest
+
+
+inf = float('inf')
+
+# arestas a -> b, a -> c e b -> c, sem arestas saindo de c
+GRAPH = CompiledGraph(['a', 'b', 'c'], [0, 2, 3, 3], [1, 2, 2])
+SAMPLES = [[1.0, 5.0, 1.0], [2.0, 3.0, 2.0], [3.0, 1.0, 1.0], [4.0, 10.0, 4.0]]
+# de a e de c até b e até c, em cada amostra, com
+# a -> c: min(2, 5), min(4, 3), min(4, 1), min(8, 10)
+MATRICES = np.array([
+    [[1.0, 2.0], [inf, 0.0]],
+    [[2.0, 3.0], [inf, 0.0]],
+    [[3.0, 1.0], [inf, 0.0]],
+    [[4.0, 8.0], [inf, 0.0]],
+])
+
+
+@pytest.mark.parametrize('hierarchy', [None, GRAPH.hierarchy()])
+def test_travel_times_mean_and_percentiles(hierarchy: Any) -> None:
+    mean, quantiles = travel_times(GRAPH, SAMPLES, [0, 2], [1, 2],
+                                   percentiles=[0, 25, 50, 75, 100], hierarchy=hierarchy)
+
+    assert mean.tolist() == [[2.5, 3.5], [inf, 0.0]]
+    # sem interpolação: o menor valor com pelo menos p% das amostras
+    assert quantiles[:, 0, 0].tolist() == [1.0, 1.0, 2.0, 3.0, 4.0]
+    assert quantiles[:, 0, 1].tolist() == [1.0, 1.0, 2.0, 3.0, 8.0]
+    assert quantiles[:, 1, 0].tolist() == [inf] * 5
+    assert quantiles[:, 1, 1].tolist() == [0.0] * 5
+
+
+def test_travel_times_percentiles_match_the_inverted_cdf() -> None:
+    percentiles = [0, 10, 30, 50, 62.5, 90, 100]
+    _, quantiles = travel_times(GRAPH, SAMPLES * 3, [0, 2], [1, 2], percentiles=percentiles)
+
+    stacked = np.concatenate([MATRICES] * 3)
+    if np.lib.NumpyVersion(np.__version__) >= '1.22.0':
+        expected = np.percentile(stacked, percentiles, axis=0, method='inverted_cdf')
+        assert np.array_equal(quantiles, expected)
+
+
+def test_travel_times_without_percentiles_or_samples() -> None:
+    mean, quantiles = travel_times(GRAPH, SAMPLES[:1], [0], [2])
+    assert mean.tolist() == [[2.0]] and quantiles.shape == (0, 1, 1)
+
+    with pytest.raises(ValueError):
+        travel_times(GRAPH, [], [0], [2])
+    with pytest.raises(ValueError):
+        travel_times(GRAPH, SAMPLES, [0], [2], percentiles=[101])
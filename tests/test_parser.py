@@ -0,0 +1,74 @@
+import io
+from pathlib import Path
+from typing import Any, List, Tuple
+
+from benchmark.generator import generate
+from main import read_waze, read_latest_speeds, read_queries
+import parser
+
+import pytest
+
+
+# entradas com os casos que terminam cada seção
+INPUTS = {
+    'blank line': b'40\na b 1\nb c 1 20\n\na b 10 15\nb c 0\na\nc\n',
+    'one field': b'40\na b 1\nb c 1\nx\na b 10\na\nc\nc a\n',
+    'invalid number': b'40\na b 1\nb c one\na b 10\na b 12\na\nb\n',
+    'invalid speed': b'40\na b 1\nb c 1\n\na b 10\nb c fast\nc\n',
+    'no speeds': b'40\na b 1\nb c 1\n\na b\nb c 30\na\nc\n',
+    'end of input': b'40\na b 1\nb c 1\n\na b 10',
+    'repeated': b'40\na b 1\nb c 1\na b 2 60\n\na b 10\na b 12 14\na\nc\n',
+    'crlf': b'40\r\na b 1\r\nb c 1 20\r\n\r\nb c 5\r\na\r\nc\r\nc a\r\n',
+    'whitespace': b'40\na b 1\nb c 1\n   \nb c 5 7\n \t \na\n',
+    'queries': b'40\na b 1\nb c 1\n\na b 10\na\nc\n\nb c\nc a\n\n',
+}
+
+
+def legacy(data: bytes) -> Tuple[Any, str, str, List[Tuple[str, str]]]:
+    """o grafo, a origem, o destino e as consultas, como em main.main"""
+    file = io.TextIOWrapper(io.BytesIO(data))
+    waze = read_waze(file=file)
+    source, destination = read_latest_speeds(waze, file=file)
+    return waze.compile(), source, destination, read_queries(source, destination,
+                                                             file=file)
+
+
+def check(parsed: parser.Parsed, data: bytes) -> None:
+    graph, source, destination, rest = parsed
+    expected, exp_source, exp_destination, queries = legacy(data)
+
+    assert (source, destination) == (exp_source, exp_destination)
+    assert read_queries(source, destination, file=io.StringIO(rest.decode())) == queries
+    assert list(graph.names) == list(expected.names)
+    for column in ('offsets', 'targets', 'distance', 'max_speed',
+                   'obs_offsets', 'observations'):
+        assert list(getattr(graph, column)) == list(getattr(expected, column)), column
+
+
+@pytest.mark.parametrize('name', INPUTS)
+def test_parse_matches_legacy_readers(name: str) -> None:
+    data = INPUTS[name]
+    check(parser.parse(data), data)
+    check(parser.parse(memoryview(data)), data)
+
+
+@pytest.mark.parametrize('name', INPUTS)
+def test_load_matches_legacy_readers(name: str, tmp_path: Path,
+                                     monkeypatch: pytest.MonkeyPatch) -> None:
+    # blocos pequenos, para que as linhas passem de um bloco a outro
+    monkeypatch.setattr(parser, 'CHUNK', 5)
+    data = INPUTS[name]
+    path = tmp_path / 'input.txt'
+    path.write_bytes(data)
+    check(parser.load(str(path)), data)
+
+
+@pytest.mark.parametrize('kind, seed', [('grid', 3), ('road', 8)])
+def test_parse_matches_legacy_readers_on_generated_maps(kind: str, seed: int,
+                                                        tmp_path: Path) -> None:
+    data = generate(2000, kind, density=0.2, closed=0.05, seed=seed)
+    check(parser.parse(data), data)
+
+    path = tmp_path / 'input.txt'
+    path.write_bytes(data)
+    check(parser.load(str(path)), data)
@@ -0,0 +1,85 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+from parser import parse
+from server import RoutingServer
+from shared import SharedWaze
+
+import pytest
+
+
+MAP = b'40\na b 1\nb c 1\na c 3\n\na c 20\na\nc\n'
+
+
+async def exchange(server: RoutingServer, path: str,
+                   messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """envia as mensagens uma de cada vez e espera cada resposta"""
+    ready = asyncio.Event()
+    serving = asyncio.create_task(server.serve(path=path, ready=ready.set))
+    await ready.wait()
+
+    reader, writer = await asyncio.open_unix_connection(path)
+    responses = []
+    for message in messages:
+        writer.write(json.dumps(message).encode() + b'\n')
+        await writer.drain()
+        responses.append(json.loads(await reader.readline()))
+    writer.close()
+    serving.cancel()
+    return responses
+
+
+@pytest.mark.parametrize('refresh, updates', [(60.0, 1), (0.0, 2)])
+def test_observations_are_published_at_most_once_per_interval(
+    refresh: float, updates: int, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    published = []
+    update = SharedWaze.update
+    monkeypatch.setattr(SharedWaze, 'update',
+                        lambda self, graph: (published.append(graph), update(self, graph)))
+
+    graph, *_ = parse(MAP)
+    route = {'op': 'route', 'source': 'a', 'dest': 'c', 'runs': 5}
+    messages = [
+        {'op': 'observe', 'id': 1, 'lines': ['a b 30']},
+        {'op': 'observe', 'id': 2, 'lines': ['b c 30']},
+        dict(route, id=3),
+        {'op': 'observe', 'id': 4, 'lines': ['a b 35']},
+        dict(route, id=5),
+    ]
+    with RoutingServer(graph, POOLSIZE=1, CHUNKSIZE=5, REFRESH=refresh) as server:
+        responses = asyncio.run(exchange(server, str(tmp_path / 'server.sock'), messages))
+
+    assert [response['ok'] for response in responses] == [True] * len(messages)
+    # as duas primeiras observações entram juntas, na primeira consulta
+    assert len(published) == updates
+    assert sorted(published[0].observations) == [20.0, 30.0, 30.0]
+
+
+def test_oversized_message_is_answered_and_frees_its_slot(tmp_path: Path) -> None:
+    graph, *_ = parse(MAP)
+    messages = [
+        {'op': 'observe', 'id': 1, 'lines': ['a b 30'] * 8000},
+        {'op': 'route', 'id': 2, 'source': 'a', 'dest': 'c', 'runs': 5},
+        {'op': 'observe', 'id': 3, 'lines': ['a b 30']},
+    ]
+    # com uma vaga só, uma vaga perdida trava a conexão
+    with RoutingServer(graph, MAXPENDING=1, MAXLINE=4096, POOLSIZE=1, CHUNKSIZE=5) as server:
+        responses = asyncio.run(asyncio.wait_for(
+            exchange(server, str(tmp_path / 'server.sock'), messages), 30
+        ))
+
+    assert responses[0]['ok'] is False and 'longer than 4096' in responses[0]['error']
+    assert [response['ok'] for response in responses[1:]] == [True, True]
+    assert [response['id'] for response in responses[1:]] == [2, 3]
+
+
+def test_bulk_observations_fit_the_default_limit(tmp_path: Path) -> None:
+    graph, *_ = parse(MAP)
+    messages = [{'op': 'observe', 'id': 1, 'lines': ['a b 30'] * 8000}]
+    with RoutingServer(graph, POOLSIZE=1) as server:
+        responses = asyncio.run(exchange(server, str(tmp_path / 'server.sock'), messages))
+
+    assert responses[0]['ok'] is True and responses[0]['received'] == 8000